@@ -1,5 +1,6 @@
 from celery import Celery
 import os
+from .services.tracing import install_celery_tracing
 
 # Connect to Redis.
 # If running in Docker, hostname might be 'redis', but locally it's 'localhost'.
@@ -9,7 +10,7 @@ celery_app = Celery(
     "jarvis_worker",
     broker=REDIS_URL,
     backend=REDIS_URL,
-    include=["backend.app.tasks"]
+    include=["backend.app.tasks", "backend.app.chat_tasks"]
 )
 
 celery_app.conf.update(
@@ -18,6 +19,8 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Chat turns go to the orchestrator worker pool (CHAT_EXECUTION=celery)
+    task_routes={"backend.app.chat_tasks.run_chat_turn": {"queue": os.getenv("CHAT_TURN_QUEUE", "chat_turns")}},
 )
 
 # Periodic Tasks
@@ -28,3 +31,5 @@ celery_app.conf.beat_schedule = {
     # },
 }
 
+# Carry the API request's trace id into tasks and time each task run
+install_celery_tracing()
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import CancelledError as FutureCancelledError
+import redis
+from .celery_app import celery_app
+from .services.turn_events import REDIS_URL, CANCEL_CHANNEL, CHAT_TURN_TIMEOUT, TurnEventPublisher
+from .services.warmup import run_warmup
+
+# Chat turns executed on orchestrator workers (CHAT_EXECUTION=celery). Run them with
+# a thread pool so one worker process serves several turns on its event loop:
+#
+#   celery -A backend.app.celery_app worker -Q chat_turns --pool=threads --concurrency=8
+
+# First wait before resubscribing to cancel requests after a Redis error; doubles up to the max
+CANCEL_LISTENER_RETRY_SECONDS = float(os.getenv("CANCEL_LISTENER_RETRY_SECONDS", "1"))
+CANCEL_LISTENER_MAX_RETRY_SECONDS = float(os.getenv("CANCEL_LISTENER_MAX_RETRY_SECONDS", "30"))
+
+
+class OrchestratorRuntime:
+    """
+    One JarvisOrchestrator per worker process, running on its own event loop thread.
+    Celery task threads hand turns to that loop and block until they finish.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.orchestrator = None
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="orchestrator-loop")
+        self._thread.start()
+
+    def start(self):
+        # Imported here so workers that only run the other tasks don't load the orchestrator
+        from .services.orchestrator import JarvisOrchestrator
+
+        async def _start():
+            orchestrator = JarvisOrchestrator()
+            await orchestrator.start()
+            return orchestrator
+
+        self.orchestrator = asyncio.run_coroutine_threadsafe(_start(), self.loop).result()
+        asyncio.run_coroutine_threadsafe(run_warmup(self.orchestrator), self.loop).result()
+        threading.Thread(target=self._listen_for_cancels, daemon=True, name="turn-cancel-listener").start()
+        print("OrchestratorRuntime: orchestrator started")
+
+    def run_turn(self, user_input, user_id, chat_id, listener, timeout):
+        async def _run():
+            return await self.orchestrator.start_turn(user_input, user_id, chat_id, listener=listener)
+
+        future = asyncio.run_coroutine_threadsafe(_run(), self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    @staticmethod
+    def _open_cancel_subscription():
+        pubsub = redis.Redis.from_url(REDIS_URL).pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CANCEL_CHANNEL)
+        return pubsub
+
+    def _listen_for_cancels(self, retry_seconds=CANCEL_LISTENER_RETRY_SECONDS,
+                            max_retry_seconds=CANCEL_LISTENER_MAX_RETRY_SECONDS):
+        """
+        Cancels turns on request from any API node; only the worker running the turn has it.
+        Resubscribes with backoff when Redis goes away (restart, connection reset).
+        """
+        delay = retry_seconds
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._open_cancel_subscription()
+                delay = retry_seconds
+                for message in pubsub.listen():
+                    try:
+                        request = json.loads(message["data"])
+                        self.loop.call_soon_threadsafe(self.orchestrator.cancel_turn, request["user_id"], request["chat_id"])
+                    except Exception as e:
+                        print(f"OrchestratorRuntime: bad cancel request {message}: {e}")
+                print("OrchestratorRuntime: cancel subscription ended, resubscribing")
+            except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+                print(f"OrchestratorRuntime: cancel listener lost Redis ({e}), resubscribing in {delay:.0f}s")
+            except Exception as e:
+                print(f"OrchestratorRuntime: cancel listener failed ({type(e).__name__}: {e}), resubscribing in {delay:.0f}s")
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, max_retry_seconds)
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+_redis_client = None
+
+
+def get_runtime():
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            runtime = OrchestratorRuntime()
+            runtime.start()
+            _runtime = runtime
+    return _runtime
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+@celery_app.task(name="backend.app.chat_tasks.run_chat_turn")
+def run_chat_turn(turn_id: str, user_input: str, user_id: str, chat_id: str):
+    """
+    Runs one chat turn and publishes its progress and result on chat_turn:<turn_id>.
+    """
+    from .services.llm_scheduler import SchedulerSaturated
+
+    publisher = TurnEventPublisher(get_redis(), turn_id)
+    publisher.publish("started", worker=run_chat_turn.request.hostname)
+    try:
+        runtime = get_runtime()
+        response = runtime.run_turn(user_input, user_id, chat_id, publisher.listener, CHAT_TURN_TIMEOUT)
+    except SchedulerSaturated as e:
+        publisher.publish("error", status=429, message=str(e), queue_depth=e.queue_depth)
+        return {"status": "saturated"}
+    except (asyncio.CancelledError, FutureCancelledError):
+        publisher.publish("cancelled")
+        return {"status": "cancelled"}
+    except TimeoutError:
+        publisher.publish("error", status=504, message=f"Turn did not finish within {CHAT_TURN_TIMEOUT}s")
+        return {"status": "timeout"}
+    except Exception as e:
+        print(f"run_chat_turn failed: {e}")
+        publisher.publish("error", status=500, message=str(e))
+        return {"status": "error"}
+
+    mode = runtime.orchestrator.prompt_manager.get_state(user_id)["mode"]
+    publisher.publish("final", response=response, current_mode=mode)
+    return {"status": "ok"}
@@ -1,33 +1,111 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import asyncio
+import time
+import json
+import uuid
+from .services.startup import PROFILE, UP, WARM # First, so the profile starts before the heavy imports
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
-from typing import Annotated, List
+from typing import Annotated, Dict, List, Optional
 from datetime import timedelta
 
-from .services.orchestrator import JarvisOrchestrator
-from .services.auth import AuthService, ACCESS_TOKEN_EXPIRE_MINUTES
+from .services.orchestrator import JarvisOrchestrator, ApiServices
+from .services.llm_scheduler import SchedulerSaturated
+from .services.llm_pool import routing_stats
+from .services.llm_usage import get_usage_recorder
+from .services.turn_events import CHAT_EXECUTION, TurnSubscription, get_async_redis, request_cancel
+from .services.warmup import run_warmup
+from .services.clients import is_embedded
+from .services.circuit_breaker import CircuitOpenError, breaker_states, CLOSED, HALF_OPEN, OPEN
+from .services import tracing
+from .services.auth import AuthService, ACCESS_TOKEN_EXPIRE_MINUTES, is_admin
 from .services.chat_service import ChatService
 from .schemas.auth import UserCreate, UserLogin, Token, User, TokenData
 
 # Global Instances
 orchestrator = None
+warmup_results = {}
 auth_service = AuthService()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global orchestrator
-    orchestrator = JarvisOrchestrator()
-    await orchestrator.start()
+    PROFILE.record("import:app", 0.0, PROFILE.elapsed())
+    if CHAT_EXECUTION == "celery" and is_embedded():
+        print("Warning: STORAGE_BACKEND=embedded keeps Chroma and documents in this process; "
+              "Celery orchestrator workers can't share them. Use CHAT_EXECUTION=local.")
+    if CHAT_EXECUTION == "celery":
+        # Turns run on the orchestrator workers (backend/app/chat_tasks.py); this process only
+        # needs session state, modes, tones and memory, not the tool index, tool pool or MCP session
+        orchestrator = await asyncio.to_thread(PROFILE.run, "init:api_services", ApiServices)
+        print("Chat turns are executed by Celery orchestrator workers.")
+    else:
+        orchestrator = await asyncio.to_thread(PROFILE.run, "init:orchestrator", JarvisOrchestrator)
+        with PROFILE.phase("start:orchestrator"):
+            await orchestrator.start()
+        register_orchestrator_gauges(orchestrator)
+    register_process_gauges()
     print("Orchestrator started.")
+    # Serving from here on (/health); /ready waits for the warm-up below
+    PROFILE.mark(UP)
+    warm_task = asyncio.create_task(warm_up(orchestrator))
     yield
+    warm_task.cancel()
     await orchestrator.stop()
     print("Orchestrator stopped.")
 
+async def warm_up(orch):
+    global warmup_results
+    # In celery mode the orchestrator workers warm up (chat_tasks.py); this process runs no turns
+    warmup_results = await run_warmup(orch, steps=[] if CHAT_EXECUTION == "celery" else None)
+    PROFILE.mark(WARM)
+    PROFILE.print_summary()
+
+def register_orchestrator_gauges(orch):
+    # Only when turns run in this process (CHAT_EXECUTION=local)
+    tracing.register_gauge("jarvis_llm_queue_depth", "LLM calls waiting for a slot", lambda: orch.llm_scheduler.queue_depth)
+    tracing.register_gauge("jarvis_llm_active_calls", "LLM calls in flight", lambda: orch.llm_scheduler.stats()["active"])
+    tracing.register_gauge("jarvis_active_chat_turns", "Chat turns in progress", lambda: len(orch.active_turns))
+    tracing.register_gauge("jarvis_background_writes_pending", "Queued post-turn writes",
+                           lambda: orch.background_writer.stats()["pending"])
+    tracing.register_gauge("jarvis_tool_workers_idle", "Idle tool pool workers", lambda: orch.tool_pool.stats()["idle"])
+
+def register_process_gauges():
+    tracing.register_gauge("jarvis_startup_phase_seconds", "Duration of startup phases (init, imports)",
+                           lambda: {**{(p["name"],): p["duration_s"] for p in PROFILE.report()["phases"]},
+                                    **{(f"import:{m}",): s for m, s in PROFILE.imports.items()}},
+                           labels=("phase",))
+    circuit_values = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    tracing.register_gauge("jarvis_dependency_circuit_state", "Dependency circuit (0 closed, 1 half-open, 2 open)",
+                           lambda: {(name,): circuit_values[b["state"]] for name, b in breaker_states().items()},
+                           labels=("dependency",))
+
 app = FastAPI(lifespan=lifespan)
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Route template (e.g. /chat/{chat_id}/cancel) keeps label cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        tracing.HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method, path=path, status=status_code)
+
+@app.exception_handler(CircuitOpenError)
+async def dependency_unavailable(request: Request, exc: CircuitOpenError):
+    # A dependency's circuit is open and the endpoint has no fallback: fail fast instead of timing out
+    return JSONResponse(status_code=503, content={"detail": str(exc), "dependency": exc.dependency},
+                        headers={"Retry-After": str(max(1, round(exc.retry_in)))})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -116,18 +194,157 @@ class ModeRequest(BaseModel):
 class PersonaRequest(BaseModel):
     persona: str
 
+async def _cancel_on_disconnect(http_request: Request, turn: asyncio.Task, poll_interval=0.5):
+    """
+    Cancels the chat turn if the client goes away before it finishes.
+    """
+    while not turn.done():
+        if await http_request.is_disconnected():
+            print("DEBUG: Client disconnected, cancelling chat turn")
+            turn.cancel()
+            return
+        await asyncio.sleep(poll_interval)
+
+def _saturated_error(message, queue_depth):
+    return HTTPException(
+        status_code=429,
+        detail={"message": message, "queue_depth": queue_depth, "queue_position": queue_depth + 1},
+        headers={"Retry-After": "5"},
+    )
+
+async def _cancel_remote_on_disconnect(http_request: Request, user_id: str, chat_id: str, poll_interval: float = 0.5):
+    while True:
+        if await http_request.is_disconnected():
+            print("DEBUG: Client disconnected, cancelling remote chat turn")
+            await request_cancel(user_id, chat_id)
+            return
+        await asyncio.sleep(poll_interval)
+
+async def _remote_turn_events(message: str, user_id: str, chat_id: str):
+    """
+    Enqueues a turn for the orchestrator workers and yields its events from Redis pub/sub.
+    """
+    from .chat_tasks import run_chat_turn
+    turn_id = uuid.uuid4().hex
+    async with TurnSubscription(get_async_redis(), turn_id) as subscription:
+        # Subscribed first, so the worker cannot publish before we listen
+        await asyncio.to_thread(run_chat_turn.apply_async, args=[turn_id, message, user_id, chat_id])
+        yield {"turn_id": turn_id, "event": "queued"}
+        async for event in subscription.events():
+            yield event
+
+async def _local_turn_events(message: str, user_id: str, chat_id: str):
+    """
+    Runs a turn in this process and yields the same events as the remote path.
+    """
+    events = asyncio.Queue()
+    turn_id = uuid.uuid4().hex
+    try:
+        turn = orchestrator.start_turn(message, user_id=user_id, chat_id=chat_id,
+                                      listener=lambda event, data: events.put_nowait({"turn_id": turn_id, "event": event, **data}))
+    except SchedulerSaturated as e:
+        yield {"turn_id": turn_id, "event": "error", "status": 429, "message": str(e), "queue_depth": e.queue_depth}
+        return
+    turn.add_done_callback(lambda t: events.put_nowait(None))
+    try:
+        yield {"turn_id": turn_id, "event": "started"}
+        while (event := await events.get()) is not None:
+            yield event
+        if turn.cancelled():
+            yield {"turn_id": turn_id, "event": "cancelled"}
+        elif turn.exception() is not None:
+            yield {"turn_id": turn_id, "event": "error", "status": 500, "message": str(turn.exception())}
+        else:
+            yield {"turn_id": turn_id, "event": "final", "response": turn.result(),
+                   "current_mode": orchestrator.prompt_manager.get_state(user_id)["mode"]}
+    finally:
+        # Stream closed early (client went away)
+        if not turn.done():
+            turn.cancel()
+
+async def _chat_remote(request: ChatRequest, http_request: Request, user_id: str):
+    watcher = asyncio.create_task(_cancel_remote_on_disconnect(http_request, user_id, request.chat_id))
+    try:
+        async for event in _remote_turn_events(request.message, user_id, request.chat_id):
+            if event["event"] == "final":
+                return {"response": event["response"], "current_mode": event["current_mode"]}
+            if event["event"] == "cancelled":
+                return {"response": None, "cancelled": True,
+                        "current_mode": orchestrator.prompt_manager.get_state(user_id)["mode"]}
+            if event["event"] == "error":
+                if event.get("status") == 429:
+                    raise _saturated_error(event["message"], event.get("queue_depth", 0))
+                raise HTTPException(status_code=event.get("status", 500), detail=event.get("message"))
+    finally:
+        watcher.cancel()
+
 @app.post("/chat")
-async def chat(request: ChatRequest, current_user: Annotated[dict, Depends(get_current_user)]):
+async def chat(request: ChatRequest, http_request: Request, current_user: Annotated[dict, Depends(get_current_user)]):
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not ready")
+    if CHAT_EXECUTION == "celery":
+        return await _chat_remote(request, http_request, current_user["username"])
     
-    # process_message now takes user_id and chat_id
-    response = await orchestrator.process_message(
-        request.message, 
-        user_id=current_user["username"], 
-        chat_id=request.chat_id
-    )
-    return {"response": response, "current_mode": orchestrator.prompt_manager.mode}
+    # The turn runs as its own task so a disconnect or /chat/{chat_id}/cancel can abort it
+    try:
+        turn = orchestrator.start_turn(
+            request.message, 
+            user_id=current_user["username"], 
+            chat_id=request.chat_id
+        )
+    except SchedulerSaturated as e:
+        raise _saturated_error(str(e), e.queue_depth)
+    watcher = asyncio.create_task(_cancel_on_disconnect(http_request, turn))
+    try:
+        response = await turn
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            # This request itself is being torn down
+            turn.cancel()
+            raise
+        return {"response": None, "cancelled": True,
+                "current_mode": orchestrator.prompt_manager.get_state(current_user["username"])["mode"]}
+    finally:
+        watcher.cancel()
+    return {"response": response, "current_mode": orchestrator.prompt_manager.get_state(current_user["username"])["mode"]}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, current_user: Annotated[dict, Depends(get_current_user)]):
+    """
+    Server-sent events for a turn: started/queued, thinking, tool_start, tool_end, then final, error or cancelled.
+    """
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not ready")
+    user_id = current_user["username"]
+    if CHAT_EXECUTION == "celery":
+        events = _remote_turn_events(request.message, user_id, request.chat_id)
+    else:
+        events = _local_turn_events(request.message, user_id, request.chat_id)
+
+    async def sse():
+        finished = False
+        try:
+            async for event in events:
+                finished = event["event"] in ("final", "error", "cancelled")
+                yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            if not finished and CHAT_EXECUTION == "celery":
+                await request_cancel(user_id, request.chat_id)
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+@app.post("/chat/{chat_id}/cancel")
+async def cancel_chat_turn(chat_id: str, current_user: Annotated[dict, Depends(get_current_user)]):
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not ready")
+    if CHAT_EXECUTION == "celery":
+        # Only the worker running the turn acts on the request
+        if not await request_cancel(current_user["username"], chat_id):
+            raise HTTPException(status_code=503, detail="No orchestrator worker is listening for cancel requests")
+        return {"status": "cancelling"}
+    if not orchestrator.cancel_turn(current_user["username"], chat_id):
+        raise HTTPException(status_code=404, detail="No running turn for this chat")
+    return {"status": "cancelling"}
 
 @app.get("/chats")
 def get_chats(current_user: Annotated[dict, Depends(get_current_user)], mode: str = "Work"):
@@ -182,33 +399,34 @@ async def set_mode(request: ModeRequest, current_user: Annotated[dict, Depends(g
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not ready")
     
-    # This changes global mode... 
-    # We should probably pass user_id to set_mode if we want per-user mode?
-    # PromptManager is part of Orchestrator instance. 
-    # This reveals Orchestrator is a singleton.
-    # For this task, I will just proceed with the requested DB changes.
-    result = orchestrator.prompt_manager.set_mode(request.mode)
-    return {"status": result, "mode": orchestrator.prompt_manager.mode}
+    # Session state is per user and shared by all workers
+    user_id = current_user["username"]
+    result = orchestrator.prompt_manager.set_mode(user_id, request.mode)
+    return {"status": result, "mode": orchestrator.prompt_manager.get_state(user_id)["mode"]}
 
 @app.post("/persona")
 async def set_persona(request: PersonaRequest, current_user: Annotated[dict, Depends(get_current_user)]):
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not ready")
     
-    result = orchestrator.prompt_manager.set_persona(request.persona)
-    return {"status": result, "persona": orchestrator.prompt_manager.persona}
+    user_id = current_user["username"]
+    result = orchestrator.prompt_manager.set_persona(user_id, request.persona)
+    return {"status": result, "persona": orchestrator.prompt_manager.get_state(user_id)["persona"]}
 
 class CreateModeRequest(BaseModel):
     name: str
     description: str
     allowed_tools: List[str] = ["*"]
+    # Optional episodic retrieval parameters (half_life_days, relevance, recency, importance,
+    # min_score, overfetch); unset keys use the defaults
+    episode_ranking: Optional[Dict[str, float]] = None
 
 @app.post("/modes")
 async def create_mode(request: CreateModeRequest, current_user: Annotated[dict, Depends(get_current_user)]):
     if not orchestrator:
          raise HTTPException(status_code=503, detail="Orchestrator not ready")
     
-    result = orchestrator.mode_manager.create_mode(request.name, request.description, request.allowed_tools)
+    result = orchestrator.mode_manager.create_mode(request.name, request.description, request.allowed_tools, request.episode_ranking)
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     return result
@@ -218,7 +436,7 @@ async def get_modes(current_user: Annotated[dict, Depends(get_current_user)]):
     if not orchestrator:
          raise HTTPException(status_code=503, detail="Orchestrator not ready")
     modes = orchestrator.mode_manager.get_all_modes()
-    return {"modes": modes, "current_mode": orchestrator.prompt_manager.mode}
+    return {"modes": modes, "current_mode": orchestrator.prompt_manager.get_state(current_user["username"])["mode"]}
 
 @app.delete("/modes/{mode_name}")
 async def delete_mode(mode_name: str, current_user: Annotated[dict, Depends(get_current_user)]):
@@ -233,8 +451,8 @@ async def delete_mode(mode_name: str, current_user: Annotated[dict, Depends(get_
     orchestrator.semantic_memory.delete_mode(mode_name, user_id=current_user["username"])
     orchestrator.episodic_memory.delete_mode_memory(mode_name, user_id=current_user["username"])
     
-    if orchestrator.prompt_manager.mode == mode_name:
-        orchestrator.prompt_manager.set_mode("Work")
+    # Anyone still in the deleted mode goes back to the default
+    orchestrator.session_store.reset_value("mode", mode_name)
         
     return result
 
@@ -252,7 +470,7 @@ async def get_tones(current_user: Annotated[dict, Depends(get_current_user)]):
     if not orchestrator:
          raise HTTPException(status_code=503, detail="Orchestrator not ready")
     tones = orchestrator.tone_manager.get_all_tones()
-    return {"tones": tones, "current_tone": orchestrator.prompt_manager.tone}
+    return {"tones": tones, "current_tone": orchestrator.prompt_manager.get_state(current_user["username"])["tone"]}
 
 @app.post("/tones")
 async def create_tone(request: CreateToneRequest, current_user: Annotated[dict, Depends(get_current_user)]):
@@ -273,9 +491,8 @@ async def delete_tone(tone_name: str, current_user: Annotated[dict, Depends(get_
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     
-    # Reset to default if deleted tone was active
-    if orchestrator.prompt_manager.tone == tone_name:
-        orchestrator.prompt_manager.set_tone("Professional")
+    # Reset to default for anyone using the deleted tone
+    orchestrator.session_store.reset_value("tone", tone_name)
         
     return result
 
@@ -284,8 +501,21 @@ async def set_tone(request: ToneRequest, current_user: Annotated[dict, Depends(g
     if not orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not ready")
     
-    result = orchestrator.prompt_manager.set_tone(request.tone)
-    return {"status": result, "tone": orchestrator.prompt_manager.tone}
+    user_id = current_user["username"]
+    result = orchestrator.prompt_manager.set_tone(user_id, request.tone)
+    return {"status": result, "tone": orchestrator.prompt_manager.get_state(user_id)["tone"]}
+
+@app.get("/session")
+async def get_session_state(current_user: Annotated[dict, Depends(get_current_user)]):
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not ready")
+    return orchestrator.prompt_manager.get_state(current_user["username"])
+
+@app.get("/session/stats")
+async def get_session_state_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not ready")
+    return orchestrator.session_store.stats()
 
 @app.get("/memory/{mode_name}")
 async def get_memory(mode_name: str, current_user: Annotated[dict, Depends(get_current_user)]):
@@ -333,7 +563,111 @@ async def delete_episodic_memory(episode_id: str, mode: str, current_user: Annot
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    dependencies = breaker_states()
+    degraded = any(b["state"] != CLOSED for b in dependencies.values())
+    # startup: "up" = serving requests, "warm" = warm-up finished (see /ready)
+    return {"status": "degraded" if degraded else "ok", "startup": PROFILE.state, "dependencies": dependencies}
+
+@app.get("/ready")
+async def ready():
+    # 503 until the warm-up has run, so load balancers keep first requests off a cold worker
+    body = {"ready": PROFILE.state == WARM, "startup": PROFILE.state, "warmup": warmup_results}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+def require_local_turns():
+    """
+    For endpoints about in-process chat turns (tool pool, scheduler, loop guard...). In celery
+    mode those run on the orchestrator workers, so this process has nothing to report.
+    """
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not ready")
+    if not orchestrator.runs_turns:
+        raise HTTPException(status_code=404, detail="Chat turns run on the Celery orchestrator workers (CHAT_EXECUTION=celery)")
+
+@app.get("/startup/profile")
+async def get_startup_profile(current_user: Annotated[dict, Depends(get_current_user)]):
+    # Import timings and init phases describe the deployment, not the caller
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="The startup profile requires an admin account")
+    return PROFILE.report()
+
+@app.get("/tools/retrieval/stats")
+async def get_tool_retrieval_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    require_local_turns()
+    return orchestrator.tool_retriever.cache.stats()
+
+@app.get("/persistence/stats")
+async def get_persistence_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    require_local_turns()
+    return orchestrator.background_writer.stats()
+
+@app.get("/tools/pool/stats")
+async def get_tool_pool_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    require_local_turns()
+    return orchestrator.tool_pool.stats()
+
+@app.get("/llm/scheduler/stats")
+async def get_llm_scheduler_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    require_local_turns()
+    stats = orchestrator.llm_scheduler.stats()
+    stats["your_queue_position"] = orchestrator.llm_scheduler.queue_position(current_user["username"])
+    return stats
+
+@app.get("/tools/loop/stats")
+async def get_tool_loop_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    require_local_turns()
+    return dict(orchestrator.loop_stats)
+
+@app.get("/tools/output/stats")
+async def get_tool_output_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    require_local_turns()
+    return orchestrator.tool_output_store.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus scrape endpoint
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
+def scoped_user_id(current_user, all_users):
+    """
+    user_id to filter traces/usage by: the caller's own, or None (everyone) for admins asking for all_users.
+    """
+    if not all_users:
+        return current_user["username"]
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="all_users requires an admin account")
+    return None
+
+@app.get("/traces/recent")
+async def get_recent_traces(current_user: Annotated[dict, Depends(get_current_user)], limit: int = 20, min_duration_ms: float = 0, all_users: bool = False):
+    user_id = scoped_user_id(current_user, all_users)
+    return tracing.recent_traces(limit=limit, min_duration_ms=min_duration_ms, user_id=user_id)
+
+@app.get("/llm/pool/stats")
+async def get_llm_pool_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    return routing_stats()
+
+# --- LLM Usage Routes ---
+# Aggregates over the llm_usage log; scoped to the caller unless an admin passes all_users=true
+
+@app.get("/llm/usage/daily")
+async def get_llm_usage_daily(current_user: Annotated[dict, Depends(get_current_user)], days: int = 7, all_users: bool = False):
+    user_id = scoped_user_id(current_user, all_users)
+    return await asyncio.to_thread(get_usage_recorder().usage_by_user_day, days, user_id)
+
+@app.get("/llm/usage/modes")
+async def get_llm_usage_by_mode(current_user: Annotated[dict, Depends(get_current_user)], days: int = 7, all_users: bool = False):
+    user_id = scoped_user_id(current_user, all_users)
+    return await asyncio.to_thread(get_usage_recorder().usage_by_mode, days, user_id)
+
+@app.get("/llm/usage/tools")
+async def get_llm_usage_by_tool(current_user: Annotated[dict, Depends(get_current_user)], days: int = 7, limit: int = 10, all_users: bool = False):
+    user_id = scoped_user_id(current_user, all_users)
+    return await asyncio.to_thread(get_usage_recorder().top_tools, days, limit, user_id)
+
+@app.get("/llm/usage/stats")
+async def get_llm_usage_stats(current_user: Annotated[dict, Depends(get_current_user)]):
+    return get_usage_recorder().stats()
 
 # --- File Monitor Routes ---
 
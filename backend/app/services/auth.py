@@ -3,7 +3,8 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from pymongo import MongoClient
+from .circuit_breaker import guard_mongo
+from .clients import get_mongo_client
 import os
 from dotenv import load_dotenv
 
@@ -13,15 +14,21 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey") # Change in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+# Usernames allowed to read other users' traces and usage (besides users stored with role "admin")
+ADMIN_USERS = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()}
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+
+def is_admin(user):
+    return user.get("role") == "admin" or user.get("username") in ADMIN_USERS
+
+
 class AuthService:
     def __init__(self):
-        self.client = MongoClient(MONGO_URI)
+        self.client = get_mongo_client()
         self.db = self.client["jarvis_db"]
-        self.users = self.db["users"]
+        self.users = guard_mongo(self.db["users"])
 
     def verify_password(self, plain_password, hashed_password):
         return pwd_context.verify(plain_password, hashed_password)
@@ -0,0 +1,112 @@
+import os
+import asyncio
+from . import tracing
+
+MAX_PENDING_WRITES = int(os.getenv("BACKGROUND_WRITER_MAX_PENDING", "1000"))
+MAX_WRITE_RETRIES = int(os.getenv("BACKGROUND_WRITER_MAX_RETRIES", "3"))
+
+
+class BackgroundWriter:
+    """
+    Bounded queue of post-response side effects (episodic memory). Chat messages are not
+    queued: their order must hold across workers, and a retry could store one twice.
+
+    Jobs are plain blocking callables; a single worker runs them in a thread in FIFO
+    order. A job fails if it raises or
+    returns False, and is retried with exponential backoff. When the queue is full the
+    job is dropped. Drops and failures are counted in stats().
+    """
+
+    def __init__(self, max_pending=MAX_PENDING_WRITES, max_retries=MAX_WRITE_RETRIES, retry_backoff=0.5):
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = None
+        self._worker = None
+        self.counters = {"enqueued": 0, "written": 0, "retried": 0, "failed": 0, "dropped": 0}
+
+    async def start(self):
+        if self._worker is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._worker = asyncio.create_task(self._run())
+        print("BackgroundWriter: started")
+
+    async def stop(self, timeout=10):
+        """
+        Drains pending writes (up to timeout seconds) and stops the worker.
+        """
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"BackgroundWriter: {self.queue.qsize()} writes still pending at shutdown")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        print(f"BackgroundWriter: stopped {self.stats()}")
+
+    def submit(self, name, func, *args, **kwargs):
+        """
+        Queues a write. Runs it inline if the writer was never started.
+        Returns False if the write was dropped because the queue is full.
+        """
+        if self._worker is None:
+            return self._execute_inline(name, func, args, kwargs)
+
+        try:
+            # Carry the request's trace so the write shows up as a span of it
+            self.queue.put_nowait((name, func, args, kwargs, tracing.current_trace()))
+            self.counters["enqueued"] += 1
+            return True
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            print(f"BackgroundWriter: queue full, dropped write '{name}'")
+            return False
+
+    def _execute_inline(self, name, func, args, kwargs):
+        try:
+            ok = func(*args, **kwargs) is not False
+        except Exception as e:
+            print(f"BackgroundWriter: write '{name}' failed: {e}")
+            ok = False
+        self.counters["written" if ok else "failed"] += 1
+        return ok
+
+    async def _run(self):
+        while True:
+            name, func, args, kwargs, trace = await self.queue.get()
+            try:
+                with tracing.use_trace(trace), tracing.span("persistence", job=name):
+                    await self._write_with_retry(name, func, args, kwargs)
+            finally:
+                self.queue.task_done()
+
+    async def _write_with_retry(self, name, func, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if await asyncio.to_thread(func, *args, **kwargs) is not False:
+                    self.counters["written"] += 1
+                    return True
+                error = "returned False"
+            except Exception as e:
+                error = e
+
+            if attempt < self.max_retries:
+                self.counters["retried"] += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+        self.counters["failed"] += 1
+        print(f"BackgroundWriter: write '{name}' failed after {self.max_retries + 1} attempts: {error}")
+        return False
+
+    def stats(self):
+        return {
+            **self.counters,
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "max_pending": self.max_pending
+        }
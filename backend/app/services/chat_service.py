@@ -1,18 +1,17 @@
 import os
 from datetime import datetime
-from pymongo import MongoClient
 from bson.objectid import ObjectId
-
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+from .circuit_breaker import guard_mongo
+from .clients import get_mongo_client
 
 class ChatService:
     def __init__(self):
         self.client = None
         self.collection = None
         try:
-            self.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            self.client = get_mongo_client()
             self.db = self.client["jarvis_db"]
-            self.collection = self.db["chats"]
+            self.collection = guard_mongo(self.db["chats"])
             print("ChatService: Connected to MongoDB")
         except Exception as e:
             print(f"ChatService: Error connecting to MongoDB: {e}")
@@ -43,6 +42,20 @@ class ChatService:
             chats.append(doc)
         return chats
 
+    def recent_sessions(self, limit=20):
+        """
+        Distinct (user_id, mode) pairs of the most recently created chats, newest first.
+        """
+        if self.collection is None:
+            return []
+        sessions = []
+        cursor = self.collection.find({}, {"user_id": 1, "mode": 1}).sort("created_at", -1).limit(limit * 5)
+        for doc in cursor:
+            session = (doc.get("user_id"), doc.get("mode") or "Work")
+            if session[0] and session not in sessions:
+                sessions.append(session)
+        return sessions[:limit]
+
     def get_chat(self, chat_id, user_id):
         if self.collection is None:
             return None
@@ -0,0 +1,289 @@
+import os
+import time
+import threading
+
+# Consecutive connection failures before a dependency's circuit opens
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+# Seconds an open circuit fails fast before letting a probe call through (half-open)
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "10"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, dependency, retry_in):
+        super().__init__(f"{dependency} unavailable (circuit open, retry in {retry_in:.1f}s)")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+def _connection_error_classes():
+    """
+    The client libraries' "dependency unreachable" exceptions, as opposed to application
+    errors (a duplicate key, a missing collection, a file not found). Libraries that
+    are not installed are skipped.
+    """
+    classes = [CircuitOpenError, ConnectionError]
+    try:
+        from pymongo.errors import ServerSelectionTimeoutError, AutoReconnect
+        classes += [ServerSelectionTimeoutError, AutoReconnect] # AutoReconnect covers NetworkTimeout
+    except ImportError:
+        pass
+    try:
+        from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+        classes += [RedisConnectionError, RedisTimeoutError]
+    except ImportError:
+        pass
+    try:
+        import httpx # chromadb's HTTP client
+        classes += [httpx.ConnectError, httpx.ConnectTimeout]
+    except ImportError:
+        pass
+    try:
+        from kombu.exceptions import OperationalError as BrokerUnreachable # Celery publish with the broker down
+        classes.append(BrokerUnreachable)
+    except ImportError:
+        pass
+    return tuple(classes)
+
+
+CONNECTION_ERRORS = _connection_error_classes()
+
+
+def is_connection_error(exc):
+    """
+    True if exc (or what caused it) means the dependency could not be reached.
+    """
+    seen = 0
+    while exc is not None and seen < 5:
+        if isinstance(exc, CONNECTION_ERRORS):
+            return True
+        exc = exc.__cause__ or exc.__context__
+        seen += 1
+    return False
+
+
+class CircuitBreaker:
+    """
+    Per-dependency circuit breaker.
+
+    closed: calls go through; consecutive connection failures are counted.
+    open: after failure_threshold of them, calls fail immediately with CircuitOpenError.
+    half_open: after reset_seconds one probe call is let through; success closes the
+    circuit, failure opens it again for another reset_seconds.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self):
+        """
+        Returns True if a call may go to the dependency now (and claims the probe slot when half-open).
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"CircuitBreaker[{self.name}]: dependency is back, circuit closed")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, exc):
+        with self._lock:
+            self.counters["failures"] += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"[:300]
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters["opened"] += 1
+                    print(f"CircuitBreaker[{self.name}]: circuit open for {self.reset_seconds}s ({self.last_error})")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls func through the breaker. Raises CircuitOpenError without calling it while the circuit is open.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+        self.counters["calls"] += 1
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_connection_error(e):
+                self.record_failure(e)
+            else:
+                # The dependency answered; the error is the caller's
+                self.record_success()
+            raise
+        else:
+            self.record_success()
+        finally:
+            # Also when func was interrupted (KeyboardInterrupt, SystemExit), so a half-open
+            # circuit does not wait forever for a probe that never reports back
+            with self._lock:
+                self._probe_in_flight = False
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_s": round(self.retry_in(), 2) if self.state != CLOSED else 0,
+                "last_error": self.last_error,
+                **self.counters
+            }
+
+
+class GuardedProxy:
+    """
+    Wraps a client object (Mongo collection, Chroma client/collection, Redis client) so
+    every method call goes through a breaker. wrap_result may wrap returned objects
+    (e.g. Chroma collections, Mongo cursors) so calls on them are guarded too.
+    """
+
+    def __init__(self, target, breaker, wrap_result=None, passthrough=()):
+        self._target = target
+        self._breaker = breaker
+        self._wrap_result = wrap_result
+        # Methods that only build an object locally (a lazy cursor, a pipeline); they
+        # must not count as a successful half-open probe
+        self._passthrough = frozenset(passthrough)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in self._passthrough:
+            def local(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                return self._wrap_result(result) if self._wrap_result else result
+            return local
+
+        def guarded(*args, **kwargs):
+            result = self._breaker.call(attr, *args, **kwargs)
+            return self._wrap_result(result) if self._wrap_result else result
+        return guarded
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"<guarded {self._breaker.name} {self._target!r}>"
+
+
+class GuardedCursor:
+    """
+    Mongo cursor whose results are fetched through the breaker when iterated.
+    Chaining methods (sort, limit, skip, ...) keep it guarded.
+    """
+
+    def __init__(self, cursor, breaker):
+        self._cursor = cursor
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return GuardedCursor(result, self._breaker) if result is self._cursor else result
+        return chained
+
+    def __iter__(self):
+        return iter(self._breaker.call(list, self._cursor))
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_states():
+    return {name: breaker.stats() for name, breaker in sorted(_breakers.items())}
+
+
+def _wrap_mongo_result(result):
+    if type(result).__name__ in ("Cursor", "CommandCursor"):
+        return GuardedCursor(result, get_breaker("mongo"))
+    return result
+
+
+def _wrap_chroma_result(result):
+    # Collections returned by get_or_create_collection etc.
+    if type(result).__module__.startswith("chromadb") and hasattr(result, "query"):
+        return GuardedProxy(result, get_breaker("chroma"))
+    return result
+
+
+class GuardedPipeline:
+    """
+    Redis pipeline: commands are buffered locally, execute() goes through the breaker.
+    """
+
+    def __init__(self, pipeline, breaker):
+        self._pipeline = pipeline
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+    def execute(self, *args, **kwargs):
+        return self._breaker.call(self._pipeline.execute, *args, **kwargs)
+
+
+def _wrap_redis_result(result):
+    if type(result).__name__ == "Pipeline":
+        return GuardedPipeline(result, get_breaker("redis"))
+    return result
+
+
+def guard_mongo(collection):
+    return GuardedProxy(collection, get_breaker("mongo"), _wrap_mongo_result, passthrough=("find",))
+
+
+def guard_chroma(client):
+    return GuardedProxy(client, get_breaker("chroma"), _wrap_chroma_result)
+
+
+def guard_redis(client):
+    return GuardedProxy(client, get_breaker("redis"), _wrap_redis_result, passthrough=("pipeline", "pubsub"))
@@ -0,0 +1,109 @@
+import os
+import threading
+from .circuit_breaker import guard_chroma
+from .startup import PROFILE
+
+from dotenv import load_dotenv
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+CHROMA_HOST = "localhost"
+CHROMA_PORT = 8000
+# "networked": Mongo and the Chroma server over TCP/HTTP. "embedded": single-node profile
+# with Chroma's PersistentClient and the SQLite-backed document store in this process
+# (one API process only; see docstore.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "networked")
+EMBEDDED_DATA_DIR = os.getenv("EMBEDDED_DATA_DIR", "./data")
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", os.path.join(EMBEDDED_DATA_DIR, "chroma"))
+DOCUMENT_DB_PATH = os.getenv("DOCUMENT_DB_PATH", os.path.join(EMBEDDED_DATA_DIR, "documents.sqlite3"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Cross-encoder for reranking episode/document search results, e.g.
+# "cross-encoder/ms-marco-MiniLM-L-6-v2" (empty = no reranking; see hybrid_search.py)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")
+
+# Process-wide clients. MongoClient and the Chroma HTTP client are thread-safe and
+# pool their connections, so every service shares one of each instead of opening its
+# own; the embedding model is loaded once for search, ingest and the Celery tasks.
+# Heavy libraries (pymongo, chromadb, sentence_transformers/torch) are imported on
+# first use, not when the services are imported.
+
+_clients = {}
+_locks = {name: threading.Lock() for name in ("mongo", "chroma", "embedding_model", "rerank_model")}
+
+
+def _shared(name, factory):
+    if name in _clients:
+        return _clients[name]
+    # Concurrent callers during parallel init wait for the one doing the work
+    with _locks[name]:
+        if name not in _clients:
+            _clients[name] = PROFILE.run(f"client:{name}", factory)
+        return _clients[name]
+
+
+def is_embedded():
+    return STORAGE_BACKEND == "embedded"
+
+
+def get_mongo_client():
+    """
+    MongoClient, or the embedded document store (same API subset) when STORAGE_BACKEND=embedded.
+    """
+    def factory():
+        if is_embedded():
+            from .docstore import EmbeddedDocumentClient
+            print(f"Using embedded document store at {DOCUMENT_DB_PATH}")
+            return EmbeddedDocumentClient(DOCUMENT_DB_PATH)
+        pymongo = PROFILE.import_module("pymongo")
+        return pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    return _shared("mongo", factory)
+
+
+def get_chroma_client():
+    """
+    Raises if Chroma is unreachable (nothing is cached, so the next call tries again).
+    """
+    def factory():
+        chromadb = PROFILE.import_module("chromadb")
+        if is_embedded():
+            print(f"Using embedded Chroma at {CHROMA_DB_PATH}")
+            return guard_chroma(chromadb.PersistentClient(path=CHROMA_DB_PATH))
+        return guard_chroma(chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT))
+    return _shared("chroma", factory)
+
+
+def get_embedding_model():
+    """
+    The shared SentenceTransformer, or None if it could not be loaded (not retried).
+    """
+    def factory():
+        try:
+            print(f"Loading embedding model '{EMBEDDING_MODEL}'...")
+            sentence_transformers = PROFILE.import_module("sentence_transformers")
+            return sentence_transformers.SentenceTransformer(EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"Error loading embedding model: {e}")
+            return None
+    return _shared("embedding_model", factory)
+
+
+def embedding_model_loaded():
+    return _clients.get("embedding_model") is not None
+
+
+def get_rerank_model():
+    """
+    The shared CrossEncoder (runs on CPU), or None if RERANK_MODEL is unset or it failed to load.
+    """
+    if not RERANK_MODEL:
+        return None
+
+    def factory():
+        try:
+            print(f"Loading rerank model '{RERANK_MODEL}'...")
+            sentence_transformers = PROFILE.import_module("sentence_transformers")
+            return sentence_transformers.CrossEncoder(RERANK_MODEL, device="cpu")
+        except Exception as e:
+            print(f"Error loading rerank model: {e}")
+            return None
+    return _shared("rerank_model", factory)
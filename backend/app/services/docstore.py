@@ -0,0 +1,596 @@
+import re
+import copy
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+try:
+    from bson.objectid import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+class EmbeddedDocumentClient:
+    """
+    In-process document store for single-node deployments (STORAGE_BACKEND=embedded).
+
+    Implements the part of the pymongo API the services use (CRUD, find with
+    projection/sort/limit, the query operators and update operators we use, and a
+    small aggregate) on a SQLite file. Each collection is held in memory and written
+    through to SQLite, so reads never leave the process. Writes committed by another
+    process (e.g. a Celery task) are noticed through PRAGMA data_version and the
+    in-memory copies are reloaded.
+
+        client = EmbeddedDocumentClient("./data/documents.sqlite3")
+        chats = client["jarvis_db"]["chats"]
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_external_writes(self):
+        # Called with the lock held before every operation
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            for collection in self._collections.values():
+                collection._docs = None
+
+    def __getitem__(self, name):
+        return EmbeddedDatabase(self, name)
+
+    def get_database(self, name):
+        return self[name]
+
+    def _collection(self, db_name, name):
+        with self._lock:
+            key = f"{db_name}.{name}"
+            if key not in self._collections:
+                self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{key}" (id TEXT PRIMARY KEY, doc TEXT NOT NULL)')
+                self._collections[key] = EmbeddedCollection(self, key)
+            return self._collections[key]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddedDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, name):
+        return self.client._collection(self.name, name)
+
+    def get_collection(self, name):
+        return self[name]
+
+
+# --- JSON encoding (ObjectId and datetime survive the round trip) ---
+
+def _encode(value):
+    if ObjectId is not None and isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1:
+        if "$oid" in obj and ObjectId is not None:
+            return ObjectId(obj["$oid"])
+        if "$date" in obj:
+            return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+def _dumps(doc):
+    return json.dumps(doc, default=_encode, separators=(",", ":"))
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_decode)
+
+
+def _id_key(value):
+    return json.dumps(value, default=_encode, sort_keys=True)
+
+
+def _new_id():
+    return ObjectId() if ObjectId is not None else uuid.uuid4().hex[:24]
+
+
+# --- Queries ---
+
+_MISSING = object()
+
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _candidates(value):
+    # A query on an array field matches if any element matches (or the array itself)
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _compare(a, b, op):
+    try:
+        if op == "$gt":
+            return a > b
+        if op == "$gte":
+            return a >= b
+        if op == "$lt":
+            return a < b
+        return a <= b
+    except TypeError:
+        return False
+
+
+def _match_operator(value, op, arg):
+    present = value is not _MISSING
+    if op == "$eq":
+        return any(c == arg for c in _candidates(value if present else None))
+    if op == "$ne":
+        return not _match_operator(value, "$eq", arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        return present and value is not None and any(_compare(c, arg, op) for c in _candidates(value))
+    if op == "$in":
+        return any(c in arg for c in _candidates(value if present else None))
+    if op == "$nin":
+        return not _match_operator(value, "$in", arg)
+    if op == "$exists":
+        return present == bool(arg)
+    if op == "$regex":
+        return present and any(isinstance(c, str) and arg.search(c) for c in _candidates(value))
+    raise NotImplementedError(f"Query operator {op} is not supported by the embedded store")
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        flags = 0
+        for letter in condition.get("$options", ""):
+            flags |= {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}.get(letter, 0)
+        for op, arg in condition.items():
+            if op == "$options":
+                continue
+            if op == "$regex":
+                arg = re.compile(arg, flags) if isinstance(arg, str) else arg
+            if not _match_operator(value, op, arg):
+                return False
+        return True
+    if isinstance(condition, re.Pattern):
+        return _match_operator(value, "$regex", condition)
+    return _match_operator(value, "$eq", condition)
+
+
+def matches(doc, query):
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, q) for q in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+_TYPE_ORDER = {type(None): 0, int: 1, float: 1, str: 2, dict: 3, list: 4, bool: 6, datetime: 7}
+
+
+def _sort_value(value):
+    if value is _MISSING or value is None:
+        return (0, 0)
+    rank = _TYPE_ORDER.get(type(value), 5) # ObjectId sits between arrays and booleans, as in Mongo
+    if isinstance(value, (dict, list)):
+        return (rank, _dumps(value))
+    if rank == 5:
+        return (rank, str(value))
+    return (rank, value)
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def sort_documents(docs, spec):
+    docs = list(docs)
+    # Stable sorts from the least significant key
+    for key, direction in reversed(spec):
+        docs.sort(key=lambda d: _sort_value(_get_path(d, key)), reverse=direction < 0)
+    return docs
+
+
+def _project(doc, projection):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+# --- Updates ---
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def apply_update(doc, update, inserting=False):
+    if not any(k.startswith("$") for k in update):
+        # Replacement document
+        replaced = copy.deepcopy(update)
+        replaced["_id"] = doc["_id"]
+        doc.clear()
+        doc.update(replaced)
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = _get_path(doc, path)
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op in ("$push", "$addToSet"):
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                array = [] if current is _MISSING else current
+                for item in items:
+                    if op == "$push" or item not in array:
+                        array.append(copy.deepcopy(item))
+                _set_path(doc, path, array)
+            elif op == "$pull":
+                if isinstance(current, list):
+                    _set_path(doc, path, [v for v in current if not _match_condition(v, arg)])
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the embedded store")
+
+
+# --- Aggregation ($match, $group, $sort, $limit, $skip, $project) ---
+
+def _eval(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get_path(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            (op, args), = expr.items()
+            if op == "$cond":
+                if isinstance(args, dict):
+                    args = [args["if"], args["then"], args["else"]]
+                return _eval(args[1], doc) if _eval(args[0], doc) else _eval(args[2], doc)
+            if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+                a, b = (_eval(arg, doc) for arg in args)
+                if op == "$eq":
+                    return a == b
+                if op == "$ne":
+                    return a != b
+                return _compare(a, b, op)
+            if op == "$ifNull":
+                value = _eval(args[0], doc)
+                return value if value is not None else _eval(args[1], doc)
+        return {k: _eval(v, doc) for k, v in expr.items()}
+    return expr
+
+
+def _group(docs, spec):
+    groups = {}
+    accumulators = {k: v for k, v in spec.items() if k != "_id"}
+    for doc in docs:
+        key = _eval(spec["_id"], doc)
+        state = groups.setdefault(_id_key(key), {"_id": key, "_n": {}})
+        for field, acc in accumulators.items():
+            (op, expr), = acc.items()
+            value = _eval(expr, doc)
+            if op == "$sum":
+                state[field] = state.get(field, 0) + (value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0)
+            elif op == "$avg":
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    state[field] = state.get(field, 0) + value
+                    state["_n"][field] = state["_n"].get(field, 0) + 1
+                else:
+                    state.setdefault(field, 0)
+            elif op in ("$min", "$max"):
+                if value is not None and (field not in state or _compare(value, state[field], "$lt" if op == "$min" else "$gt")):
+                    state[field] = value
+            elif op == "$push":
+                state.setdefault(field, []).append(value)
+            elif op == "$first":
+                state.setdefault(field, value)
+            elif op == "$last":
+                state[field] = value
+            else:
+                raise NotImplementedError(f"Accumulator {op} is not supported by the embedded store")
+    results = []
+    for state in groups.values():
+        counts = state.pop("_n")
+        for field, acc in accumulators.items():
+            if "$avg" in acc:
+                state[field] = state[field] / counts[field] if counts.get(field) else None
+        results.append(state)
+    return results
+
+
+def aggregate_documents(docs, pipeline):
+    for stage in pipeline:
+        (op, arg), = stage.items()
+        if op == "$match":
+            docs = [d for d in docs if matches(d, arg)]
+        elif op == "$group":
+            docs = _group(docs, arg)
+        elif op == "$sort":
+            docs = sort_documents(docs, _normalize_sort(arg))
+        elif op == "$limit":
+            docs = docs[:arg]
+        elif op == "$skip":
+            docs = docs[arg:]
+        elif op == "$project":
+            docs = [_project(d, arg) for d in docs]
+        else:
+            raise NotImplementedError(f"Aggregation stage {op} is not supported by the embedded store")
+    return docs
+
+
+class EmbeddedCursor:
+    """
+    Lazily evaluated find(): sort/skip/limit can be chained before iterating.
+    """
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        docs = self._collection._select(self._query)
+        if self._sort:
+            docs = sort_documents(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return iter([_project(copy.deepcopy(d), self._projection) for d in docs])
+
+
+class EmbeddedCollection:
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._docs = None # id key -> document, loaded on first use
+
+    @property
+    def name(self):
+        return self._table.split(".", 1)[1]
+
+    def _all(self):
+        # Lock held by callers
+        self._client._check_external_writes()
+        if self._docs is None:
+            rows = self._client._conn.execute(f'SELECT id, doc FROM "{self._table}" ORDER BY rowid').fetchall()
+            self._docs = {key: _loads(doc) for key, doc in rows}
+        return self._docs
+
+    def _select(self, query, limit=0):
+        with self._client._lock:
+            docs = self._all()
+            if query and set(query) == {"_id"} and not isinstance(query["_id"], dict):
+                doc = docs.get(_id_key(query["_id"]))
+                return [doc] if doc is not None else []
+            if query and "_id" in query and not isinstance(query["_id"], dict):
+                doc = docs.get(_id_key(query["_id"]))
+                return [doc] if doc is not None and matches(doc, query) else []
+            found = []
+            for doc in docs.values():
+                if matches(doc, query):
+                    found.append(doc)
+                    if limit and len(found) >= limit:
+                        break
+            return found
+
+    def _write(self, docs, deleted=()):
+        # Lock held by callers. One transaction per operation; our own commits don't change data_version.
+        if not docs and not deleted:
+            return
+        conn = self._client._conn
+        conn.execute("BEGIN")
+        try:
+            if deleted:
+                conn.executemany(f'DELETE FROM "{self._table}" WHERE id = ?', [(k,) for k in deleted])
+            if docs:
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO "{self._table}" (id, doc) VALUES (?, ?)',
+                    [(_id_key(d["_id"]), _dumps(d)) for d in docs]
+                )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- pymongo API ---
+
+    def insert_one(self, document):
+        return SimpleNamespace(inserted_id=self.insert_many([document]).inserted_ids[0], acknowledged=True)
+
+    def insert_many(self, documents, ordered=True):
+        with self._client._lock:
+            docs = self._all()
+            new_docs = []
+            for document in documents:
+                if "_id" not in document:
+                    document["_id"] = _new_id() # pymongo also sets _id on the caller's dict
+                key = _id_key(document["_id"])
+                if key in docs or any(_id_key(d["_id"]) == key for d in new_docs):
+                    raise ValueError(f"E11000 duplicate key error: _id {document['_id']}")
+                new_docs.append(copy.deepcopy(document))
+            self._write(new_docs)
+            for doc in new_docs:
+                docs[_id_key(doc["_id"])] = doc
+        return SimpleNamespace(inserted_ids=[d["_id"] for d in new_docs], acknowledged=True)
+
+    def find(self, filter=None, projection=None):
+        return EmbeddedCursor(self, filter or {}, projection)
+
+    def find_one(self, filter=None, projection=None):
+        found = self._select(filter or {}, limit=1)
+        return _project(copy.deepcopy(found[0]), projection) if found else None
+
+    def count_documents(self, filter, **kwargs):
+        return len(self._select(filter))
+
+    def estimated_document_count(self):
+        with self._client._lock:
+            return len(self._all())
+
+    def distinct(self, key, filter=None):
+        values = []
+        for doc in self._select(filter or {}):
+            value = _get_path(doc, key)
+            for item in (value if isinstance(value, list) else [value]):
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    def _update(self, filter, update, upsert, many):
+        with self._client._lock:
+            targets = self._select(filter, limit=0 if many else 1)
+            if not targets and upsert:
+                doc = {k: copy.deepcopy(v) for k, v in filter.items()
+                       if not k.startswith("$") and not (isinstance(v, dict) and any(x.startswith("$") for x in v))}
+                doc.setdefault("_id", _new_id())
+                apply_update(doc, update, inserting=True)
+                self._write([doc])
+                self._all()[_id_key(doc["_id"])] = doc
+                return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"], acknowledged=True), None, doc
+            changed = []
+            before = copy.deepcopy(targets[0]) if targets else None
+            for doc in targets:
+                updated = copy.deepcopy(doc)
+                apply_update(updated, update)
+                if updated != doc:
+                    changed.append(updated)
+            self._write(changed)
+            docs = self._all()
+            for doc in changed:
+                docs[_id_key(doc["_id"])] = doc
+            after = docs.get(_id_key(targets[0]["_id"])) if targets else None
+            result = SimpleNamespace(matched_count=len(targets), modified_count=len(changed), upserted_id=None, acknowledged=True)
+            return result, before, after
+
+    def update_one(self, filter, update, upsert=False):
+        return self._update(filter, update, upsert, many=False)[0]
+
+    def update_many(self, filter, update, upsert=False):
+        return self._update(filter, update, upsert, many=True)[0]
+
+    def replace_one(self, filter, replacement, upsert=False):
+        return self._update(filter, replacement, upsert, many=False)[0]
+
+    def find_one_and_update(self, filter, update, projection=None, upsert=False, return_document=False, **kwargs):
+        # return_document: pymongo's ReturnDocument.BEFORE is False, AFTER is True
+        result, before, after = self._update(filter, update, upsert, many=False)
+        doc = after if return_document else before
+        return _project(copy.deepcopy(doc), projection) if doc is not None else None
+
+    def _delete(self, filter, many):
+        with self._client._lock:
+            targets = self._select(filter, limit=0 if many else 1)
+            keys = [_id_key(d["_id"]) for d in targets]
+            self._write([], deleted=keys)
+            docs = self._all()
+            for key in keys:
+                docs.pop(key, None)
+        return SimpleNamespace(deleted_count=len(keys), acknowledged=True)
+
+    def delete_one(self, filter):
+        return self._delete(filter, many=False)
+
+    def delete_many(self, filter):
+        return self._delete(filter, many=True)
+
+    def aggregate(self, pipeline, **kwargs):
+        with self._client._lock:
+            docs = list(self._all().values())
+        # Stored documents are never mutated in place, so the pipeline can run outside the lock
+        return iter(copy.deepcopy(aggregate_documents(docs, pipeline)))
+
+    def create_index(self, keys, **kwargs):
+        # Collections are scanned in memory; indexes are accepted and ignored
+        spec = _normalize_sort(keys)
+        return "_".join(f"{k}_{d}" for k, d in spec)
+
+    def drop(self):
+        with self._client._lock:
+            self._client._conn.execute(f'DELETE FROM "{self._table}"')
+            self._docs = {}
@@ -3,38 +3,31 @@ import uuid
 import json
 import io
 from pathlib import Path
-import chromadb
-from chromadb.utils import embedding_functions
+from .clients import get_chroma_client
+from .hybrid_search import HybridRetriever, HYBRID_SEARCH, default_reranker
 
-# Optional libraries for file processing
-try:
-    import pypdf
-    import docx
-    from PIL import Image
-    import pytesseract
-except ImportError as e:
-    print(f"Warning: Missing document processing dependencies: {e}")
+# Optional libraries for file processing (pypdf, python-docx, Pillow, pytesseract) are
+# imported by _extract_text when a file of that type is ingested
 
 # Load env
 from dotenv import load_dotenv
 load_dotenv()
 
-CHROMA_HOST = "localhost"
-CHROMA_PORT = 8000
-
 class DocumentManager:
     def __init__(self):
         self.client = None
         self.collection = None
+        self.retriever = None
         
         try:
             print("Connecting to ChromaDB for Documents...")
-            self.client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+            self.client = get_chroma_client()
             # Use 'documents' collection
             self.collection = self.client.get_or_create_collection(
                 name="documents",
                 metadata={"hnsw:space": "cosine"}
             )
+            self.retriever = HybridRetriever(self.collection, reranker=default_reranker(), metadata_fields=("filename",))
             print("Connected to ChromaDB 'documents' collection.")
         except Exception as e:
             print(f"Warning: Could not connect to ChromaDB for documents: {e}")
@@ -72,6 +65,7 @@ class DocumentManager:
                 documents=chunks,
                 metadatas=metadatas
             )
+            self.retriever.add(ids, chunks, metadatas)
             
             return f"Successfully ingested '{path.name}'. Created {len(chunks)} chunks."
             
@@ -86,6 +80,11 @@ class DocumentManager:
             return []
             
         try:
+            if HYBRID_SEARCH:
+                # Vector + keyword: exact file names, identifiers and error strings rank too
+                hits = self.retriever.search(query, n_results, query_texts=[query])
+                return [f"[File: {hit['metadata'].get('filename')}]\n{hit['document']}" for hit in hits]
+
             results = self.collection.query(
                 query_texts=[query],
                 n_results=n_results
@@ -102,11 +101,23 @@ class DocumentManager:
             print(f"Error searching documents: {e}")
             return []
 
+    def warm_up(self):
+        """
+        Runs one query so the query embedding function and the collection's index are loaded.
+        """
+        if not self.collection:
+            return 0
+        self.collection.query(query_texts=["warm up"], n_results=1)
+        if HYBRID_SEARCH:
+            self.retriever.sync(force=True)
+        return 1
+
     def _extract_text(self, path: Path):
         ext = path.suffix.lower()
         
         if ext == ".pdf":
             try:
+                import pypdf
                 reader = pypdf.PdfReader(str(path))
                 text = ""
                 for i, page in enumerate(reader.pages):
@@ -117,6 +128,8 @@ class DocumentManager:
                         # Try OCR on images
                         try:
                             if hasattr(page, 'images'):
+                                from PIL import Image
+                                import pytesseract
                                 for image_file in page.images:
                                     image_data = image_file.data
                                     img = Image.open(io.BytesIO(image_data))
@@ -134,6 +147,7 @@ class DocumentManager:
                 
         elif ext == ".docx":
             try:
+                import docx
                 doc = docx.Document(str(path))
                 text_parts = []
                 
@@ -171,6 +185,8 @@ class DocumentManager:
             try:
                 # Requires Tesseract OCR installed on system
                 # If tesseract is not in PATH, this raises TesseractNotFoundError
+                from PIL import Image
+                import pytesseract
                 image = Image.open(path)
                 text = pytesseract.image_to_string(image)
                 return text
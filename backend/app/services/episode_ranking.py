@@ -0,0 +1,150 @@
+import os
+import re
+import math
+import datetime
+
+# Episodic retrieval over-fetches candidates and re-ranks them by
+#   relevance * w_relevance + recency * w_recency + importance * w_importance
+# where relevance is the search score min-max normalised over the candidates, recency
+# decays exponentially with the episode's age (1.0 now, 0.5 after half_life_days) and
+# importance (0-1) is scored once at ingest. Before that, candidates whose similarity to
+# the query is under min_score are dropped: normalised relevance can't tell a weak
+# best match from a strong one, so a turn gets fewer than n episodes rather than
+# unrelated ones that are merely recent.
+DEFAULT_RANKING = {
+    "overfetch": float(os.getenv("EPISODE_OVERFETCH", "4")),  # candidates fetched = n * overfetch
+    "half_life_days": float(os.getenv("EPISODE_HALF_LIFE_DAYS", "30")),
+    "relevance": float(os.getenv("EPISODE_WEIGHT_RELEVANCE", "1.0")),
+    "recency": float(os.getenv("EPISODE_WEIGHT_RECENCY", "0.5")),
+    "importance": float(os.getenv("EPISODE_WEIGHT_IMPORTANCE", "0.3")),
+    "min_score": float(os.getenv("EPISODE_MIN_SCORE", "0.3")),  # minimum similarity, see similarity()
+}
+
+# Built-in per-mode overrides; a mode document's "episode_ranking" field overrides these.
+# Work context goes stale quickly; personal preferences and facts stay relevant for months.
+MODE_RANKING_DEFAULTS = {
+    "Work": {"half_life_days": 14},
+    "Personal": {"half_life_days": 180, "importance": 0.5},
+}
+
+_IMPORTANCE_CUES = re.compile(
+    r"\b(remember|important|always|never|prefer|prefers|preference|decided|decision|agreed|deadline|due|"
+    r"birthday|anniversary|allergic|address|my name|i am|i'm|don't|must|promise|plan|goal|saved)\b",
+    re.IGNORECASE
+)
+_DATE_OR_NUMBER = re.compile(
+    r"\b(\d{1,4}[-/.]\d{1,2}([-/.]\d{1,4})?|\d+(\.\d+)?\s?(%|am|pm|eur|usd|\$|km|kg)|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|january|february|march|april|may|june|july|"
+    r"august|september|october|november|december|tomorrow|next week)\b",
+    re.IGNORECASE
+)
+_IDENTIFIER = re.compile(r"\b\w+[_.]\w+\b|\b[A-Za-z]+\d+\w*\b")
+_SMALL_TALK = re.compile(r"^\W*(hi|hello|hey|thanks|thank you|ok|okay|cool|great|bye|good (morning|night))\W*$", re.IGNORECASE)
+
+
+def importance_score(content):
+    """
+    Cheap 0-1 estimate of how worth remembering an episode is, computed once at ingest:
+    explicit memory cues (preferences, decisions, deadlines), dates and amounts, and
+    exact identifiers raise it; small talk lowers it.
+    """
+    user_part = (content or "").split("\nJarvis:", 1)[0]
+    if user_part.startswith("User:"):
+        user_part = user_part[len("User:"):]
+    user_part = user_part.strip()
+    if not user_part or _SMALL_TALK.match(user_part):
+        return 0.1
+
+    score = 0.3
+    score += min(0.4, 0.2 * len(_IMPORTANCE_CUES.findall(user_part)))
+    if _DATE_OR_NUMBER.search(user_part):
+        score += 0.15
+    if _IDENTIFIER.search(user_part):
+        score += 0.1
+    if len(user_part.split()) < 4:
+        score -= 0.1
+    return round(min(1.0, max(0.0, score)), 3)
+
+
+def resolve_ranking(mode, overrides=None):
+    """Defaults, then the built-in overrides for the mode, then the mode document's own."""
+    ranking = dict(DEFAULT_RANKING)
+    ranking.update(MODE_RANKING_DEFAULTS.get(mode, {}))
+    for key, value in (overrides or {}).items():
+        if key in ranking:
+            ranking[key] = float(value)
+    return ranking
+
+
+def validate_ranking(overrides):
+    """Returns an error message for an invalid 'episode_ranking' mode setting, else None."""
+    unknown = set(overrides) - set(DEFAULT_RANKING)
+    if unknown:
+        return f"Unknown episode_ranking keys: {sorted(unknown)} (allowed: {sorted(DEFAULT_RANKING)})"
+    for key, value in overrides.items():
+        if not isinstance(value, (int, float)) or value < 0:
+            return f"episode_ranking.{key} must be a non-negative number"
+    if overrides.get("half_life_days") == 0 or overrides.get("overfetch", 1) < 1:
+        return "episode_ranking: half_life_days must be > 0 and overfetch >= 1"
+    return None
+
+
+def _age_days(timestamp, now):
+    try:
+        created = datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (now - created).total_seconds() / 86400)
+
+
+def similarity(hit):
+    """
+    Absolute similarity of a hit to the query: 1 - distance / 2, which for the normalised
+    sentence embeddings in Chroma's default squared-L2 space is their cosine similarity.
+    None for keyword-only hits, which have no distance.
+    """
+    distance = hit.get("distance")
+    return None if distance is None else 1.0 - distance / 2
+
+
+def _above_floor(hit, min_score):
+    # An exact keyword match (an identifier, an error string) counts however far apart
+    # the embeddings are; so do keyword-only hits, which have no similarity
+    if hit.get("keyword_rank") is not None:
+        return True
+    score = similarity(hit)
+    return score is None or score >= min_score
+
+
+def rank_episodes(hits, ranking, now=None):
+    """
+    Re-ranks search hits ({"document", "metadata", "score", "distance"}, higher score =
+    more relevant, or "rerank_score" when every hit has one) and returns them best first,
+    with "relevance", "recency", "importance" and "final_score" set. Hits with a
+    similarity under min_score are dropped first unless the keyword search matched
+    them ("keyword_rank"). Episodes stored before importance was recorded are scored
+    from their text.
+    """
+    hits = [hit for hit in hits if _above_floor(hit, ranking["min_score"])]
+    if not hits:
+        return []
+    now = now or datetime.datetime.now()
+    key = "rerank_score" if all("rerank_score" in hit for hit in hits) else "score"
+    scores = [hit.get(key, 0.0) for hit in hits]
+    low, high = min(scores), max(scores)
+
+    ranked = []
+    for hit, score in zip(hits, scores):
+        metadata = hit.get("metadata") or {}
+        age = _age_days(metadata.get("timestamp"), now)
+        importance = metadata.get("importance")
+        if importance is None:
+            importance = importance_score(hit.get("document"))
+        relevance = (score - low) / (high - low) if high > low else 1.0
+        recency = math.pow(0.5, age / ranking["half_life_days"]) if age is not None else 0.0
+        final = (ranking["relevance"] * relevance + ranking["recency"] * recency
+                 + ranking["importance"] * float(importance))
+        ranked.append(dict(hit, relevance=relevance, recency=recency, importance=float(importance), final_score=final))
+
+    ranked.sort(key=lambda hit: hit["final_score"], reverse=True)
+    return ranked
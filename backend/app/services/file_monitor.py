@@ -1,24 +1,23 @@
 
 import os
 import datetime
-from pymongo import MongoClient
 import json
 from pathlib import Path
+from .circuit_breaker import guard_mongo
+from .clients import get_mongo_client
 
 # Load env (though usually loaded by main)
 from dotenv import load_dotenv
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-
 class FileMonitorService:
     def __init__(self):
         self.client = None
         self.collection = None
         try:
-            self.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            self.client = get_mongo_client()
             self.db = self.client["jarvis_db"]
-            self.collection = self.db["monitored_directories"]
+            self.collection = guard_mongo(self.db["monitored_directories"])
             print("Connected to MongoDB (FileMonitor)")
         except Exception as e:
             print(f"Error connecting to MongoDB (FileMonitor): {e}")
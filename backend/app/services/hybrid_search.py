@@ -0,0 +1,308 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import defaultdict, Counter
+from .clients import get_rerank_model, RERANK_MODEL
+
+# Keyword + vector retrieval for episodes and documents. Pure vector top-k misses exact
+# identifiers, file names and error strings; a BM25 index kept next to each Chroma
+# collection catches those, and the two rankings are merged with reciprocal-rank fusion.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # fetched from each side before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+# How often (seconds) a search checks the collection's count for writes made by other
+# processes (Celery workers); a mismatch rebuilds the keyword index from the collection
+HYBRID_SYNC_INTERVAL = float(os.getenv("HYBRID_SYNC_INTERVAL", "5"))
+# Optional cross-encoder pass over the fused candidates (enabled by setting RERANK_MODEL)
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "12"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "4"))
+
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[._\-/:@#][^\W_]+)*")
+_CAMEL_RE = re.compile(r"[A-Z0-9]+(?=[A-Z][a-z])|[A-Z]?[a-z0-9]+|[A-Z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from had has have how i in is it its me my "
+    "of on or so that the this to was we were what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercased terms for BM25. Compound identifiers are kept whole and also split, so
+    'ERR_CONN_RESET', 'report_2024.pdf' or 'parseConfig' match both exactly and by part.
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(text or ""):
+        token = match.group(0)
+        parts = [
+            part for piece in re.split(r"[._\-/:@#]", token)
+            for part in (_CAMEL_RE.findall(piece) if piece.isascii() else [piece])
+        ]
+        lowered = token.lower()
+        if lowered not in STOPWORDS:
+            terms.append(lowered)
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts if p.lower() not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring. Also keeps each entry's text and
+    metadata so keyword-only hits can be returned without another round trip.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.doc_lengths = {}
+        self.doc_terms = {}  # doc_id -> indexed terms, for removal
+        self.entries = {}  # doc_id -> (document, metadata)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def add(self, ids, documents, metadatas=None, texts=None):
+        """texts, if given, are what gets indexed for each entry (defaults to the documents)."""
+        metadatas = metadatas or [None] * len(ids)
+        texts = texts or documents
+        for doc_id, document, metadata, text in zip(ids, documents, metadatas, texts):
+            if doc_id in self.doc_lengths:
+                self.remove([doc_id])
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self.postings[term][doc_id] = tf
+            length = sum(terms.values())
+            self.doc_lengths[doc_id] = length
+            self.doc_terms[doc_id] = tuple(terms)
+            self._total_length += length
+            self.entries[doc_id] = (document, metadata or {})
+
+    def remove(self, ids):
+        for doc_id in ids:
+            if doc_id not in self.doc_lengths:
+                continue
+            del self.entries[doc_id]
+            for term in self.doc_terms.pop(doc_id):
+                del self.postings[term][doc_id]
+                if not self.postings[term]:
+                    del self.postings[term]
+            self._total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query, n=10):
+        """Returns [(doc_id, score)] best first; documents sharing no term are not returned."""
+        if not self.doc_lengths:
+            return []
+        n_docs = len(self.doc_lengths)
+        avg_length = self._total_length / n_docs or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Merges ranked id lists: score(id) = sum of 1 / (k + rank) over the lists it appears in.
+    Returns [(id, score)] best first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class CrossEncoderReranker:
+    """
+    Rescores the top fused candidates with a cross-encoder on CPU, within a latency budget.
+
+    Candidates are scored in small batches, best fused first; once the next batch would
+    overrun the budget (judged by the measured per-pair cost) scoring stops, the scored
+    prefix is reordered and the rest keep their fused order.
+    """
+
+    def __init__(self, model_loader=get_rerank_model, budget_ms=RERANK_BUDGET_MS, top_n=RERANK_TOP_N,
+                 batch_size=RERANK_BATCH_SIZE):
+        self.model_loader = model_loader
+        self.budget_ms = budget_ms
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.pair_ms = None  # moving average of the cost of scoring one pair
+        self.reranked = 0
+        self.truncated = 0  # reranks that stopped early on the budget
+
+    def rerank(self, query, hits):
+        model = self.model_loader()
+        if model is None or len(hits) < 2:
+            return hits
+        head, tail = hits[:self.top_n], hits[self.top_n:]
+        started = time.perf_counter()
+        scored = 0
+        while scored < len(head):
+            batch = head[scored:scored + self.batch_size]
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if self.pair_ms is not None and elapsed_ms + self.pair_ms * len(batch) > self.budget_ms:
+                break
+            batch_started = time.perf_counter()
+            scores = model.predict([(query, hit["document"] or "") for hit in batch])
+            cost = (time.perf_counter() - batch_started) * 1000 / len(batch)
+            self.pair_ms = cost if self.pair_ms is None else 0.8 * self.pair_ms + 0.2 * cost
+            for hit, score in zip(batch, scores):
+                hit["rerank_score"] = float(score)
+            scored += len(batch)
+
+        self.reranked += 1
+        if scored < len(head):
+            self.truncated += 1
+        ranked = sorted(head[:scored], key=lambda hit: hit["rerank_score"], reverse=True)
+        return ranked + head[scored:] + tail
+
+    def stats(self):
+        return {
+            "reranked": self.reranked,
+            "truncated": self.truncated,
+            "pair_ms": round(self.pair_ms, 2) if self.pair_ms is not None else None
+        }
+
+
+_default_reranker = None
+
+
+def default_reranker():
+    """The shared reranker, or None when RERANK_MODEL is not set."""
+    global _default_reranker
+    if RERANK_MODEL and _default_reranker is None:
+        _default_reranker = CrossEncoderReranker()
+    return _default_reranker
+
+
+class HybridRetriever:
+    """
+    Hybrid BM25 + vector search over one Chroma collection.
+
+    The keyword index is built from the collection on first use and kept current by
+    add()/remove() from this process' own writes. Writes from other processes (episodes
+    stored by Celery) are picked up by comparing the collection's count with the index at
+    most every sync_interval seconds and rebuilding on a mismatch. If the keyword side
+    fails, results are vector-only. metadata_fields are indexed along with the text
+    (e.g. the file name of a document chunk).
+    """
+
+    def __init__(self, collection, reranker=None, candidates=HYBRID_CANDIDATES, rrf_k=RRF_K,
+                 sync_interval=HYBRID_SYNC_INTERVAL, metadata_fields=()):
+        self.collection = collection
+        self.metadata_fields = metadata_fields
+        self.reranker = reranker
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.sync_interval = sync_interval
+        self.index = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _texts(self, documents, metadatas):
+        if not self.metadata_fields:
+            return documents
+        metadatas = metadatas or [None] * len(documents)
+        return [
+            " ".join([str((metadata or {}).get(field, "")) for field in self.metadata_fields] + [document])
+            for document, metadata in zip(documents, metadatas)
+        ]
+
+    def add(self, ids, documents, metadatas=None):
+        with self._lock:
+            if self.index is not None:
+                self.index.add(ids, documents, metadatas, texts=self._texts(documents, metadatas))
+
+    def remove(self, ids):
+        with self._lock:
+            if self.index is not None:
+                self.index.remove(ids)
+
+    def sync(self, force=False):
+        """Rebuilds the keyword index if the collection changed elsewhere. Returns True if it did."""
+        now = time.monotonic()
+        if not force and self.index is not None and now - self._checked_at < self.sync_interval:
+            return False
+        self._checked_at = now
+        if not force and self.index is not None and self.collection.count() == len(self.index):
+            return False
+
+        index = BM25Index()
+        offset, page = 0, 1000
+        while True:
+            batch = self.collection.get(include=["documents", "metadatas"], limit=page, offset=offset)
+            if not batch["ids"]:
+                break
+            documents = [d or "" for d in batch["documents"]]
+            index.add(batch["ids"], documents, batch["metadatas"], texts=self._texts(documents, batch["metadatas"]))
+            offset += len(batch["ids"])
+            if len(batch["ids"]) < page:
+                break
+        with self._lock:
+            self.index = index
+        return True
+
+    def keyword_search(self, query, n):
+        try:
+            self.sync()
+        except Exception as e:
+            print(f"Keyword index sync failed, using vector results only: {e}")
+            if self.index is None:
+                return []
+        with self._lock:
+            return [
+                {"id": doc_id, "document": self.index.entries[doc_id][0], "metadata": self.index.entries[doc_id][1]}
+                for doc_id, _ in self.index.search(query, n)
+            ]
+
+    def vector_search(self, n, **query_kwargs):
+        results = self.collection.query(n_results=n, **query_kwargs)
+        if not results["ids"] or not results["ids"][0]:
+            return []
+        metadatas = results.get("metadatas") or [[None] * len(results["ids"][0])]
+        distances = results.get("distances") or [[None] * len(results["ids"][0])]
+        return [
+            {"id": doc_id, "document": document, "metadata": metadata or {}, "distance": distance}
+            for doc_id, document, metadata, distance in zip(results["ids"][0], results["documents"][0], metadatas[0], distances[0])
+        ]
+
+    def search(self, query, n_results=3, **query_kwargs):
+        """
+        query_kwargs go to the vector query (query_embeddings=... or query_texts=...).
+        Returns [{"id", "document", "metadata", "score"}] best first. Vector hits also
+        have "distance"; hits the keyword index matched have "keyword_rank" (1 = best).
+        """
+        n_candidates = max(self.candidates, n_results)
+        vector_hits = self.vector_search(n_candidates, **query_kwargs)
+        keyword_hits = self.keyword_search(query, n_candidates)
+
+        by_id = {hit["id"]: hit for hit in keyword_hits}
+        by_id.update({hit["id"]: hit for hit in vector_hits})
+        fused = reciprocal_rank_fusion(
+            [[hit["id"] for hit in vector_hits], [hit["id"] for hit in keyword_hits]], k=self.rrf_k
+        )
+        keyword_ranks = {hit["id"]: rank for rank, hit in enumerate(keyword_hits, 1)}
+        hits = []
+        for doc_id, score in fused:
+            hit = dict(by_id[doc_id], score=score)
+            if doc_id in keyword_ranks:
+                hit["keyword_rank"] = keyword_ranks[doc_id]
+            hits.append(hit)
+        if self.reranker is not None:
+            hits = self.reranker.rerank(query, hits)
+        return hits[:n_results]
@@ -0,0 +1,311 @@
+import os
+import re
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from types import SimpleNamespace
+from .circuit_breaker import guard_redis
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+# Tasks whose responses are cached on an exact prompt match. Not codegen by default:
+# responses are stored before the generated tool is validated, so a retry with the same
+# prompt would get the same broken code back
+LLM_CACHE_TASKS = [t.strip() for t in os.getenv("LLM_CACHE_TASKS", "title").split(",") if t.strip()]
+# Subset that may also be served from a near-identical prompt (cosine similarity of the last user message)
+LLM_SEMANTIC_CACHE_TASKS = [t.strip() for t in os.getenv("LLM_SEMANTIC_CACHE_TASKS", "title").split(",") if t.strip()]
+LLM_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# "memory" or "redis"; redis falls back to memory if it is not reachable
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "redis")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+def _normalise_text(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def cache_key(task, model, messages, tools=None):
+    """
+    Exact-match key over the normalised conversation, model and tool schemas.
+    """
+    payload = {
+        "task": task,
+        "model": model,
+        "messages": [
+            {"role": m.get("role"), "content": _normalise_text(m.get("content"))}
+            for m in messages
+        ],
+        "tools": tools or []
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cached_response(content):
+    """
+    Minimal stand-in for a litellm ModelResponse; call sites only read choices[0].message.content.
+    """
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], cached=True)
+
+
+class MemoryCacheStore:
+    """
+    Per-process LRU store with expiry. Also holds the semantic index.
+    """
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._index = {} # namespace -> OrderedDict(key -> embedding)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def index_add(self, namespace, key, embedding):
+        index = self._index.setdefault(namespace, OrderedDict())
+        index[key] = embedding
+        while len(index) > self.max_entries:
+            index.popitem(last=False)
+
+    def index_items(self, namespace):
+        return list(self._index.get(namespace, {}).items())
+
+    def index_remove(self, namespace, key):
+        self._index.get(namespace, {}).pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheStore:
+    """
+    Shared store so every API worker sees the same cache. Values expire via Redis TTLs;
+    a sorted set of last-access times bounds the number of entries (oldest evicted).
+    """
+
+    def __init__(self, client, prefix="llm_cache", max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.client = client
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self._lru_key = f"{prefix}:lru"
+
+    def _key(self, key):
+        return f"{self.prefix}:v:{key}"
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        if value is None:
+            self.client.zrem(self._lru_key, key)
+            return None
+        self.client.zadd(self._lru_key, {key: time.time()})
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), value, ex=ttl)
+        pipe.zadd(self._lru_key, {key: time.time()})
+        pipe.execute()
+
+        overflow = self.client.zcard(self._lru_key) - self.max_entries
+        if overflow > 0:
+            evicted = self.client.zrange(self._lru_key, 0, overflow - 1)
+            if evicted:
+                evicted = [k.decode("utf-8") if isinstance(k, bytes) else k for k in evicted]
+                pipe = self.client.pipeline()
+                pipe.delete(*[self._key(k) for k in evicted])
+                pipe.zrem(self._lru_key, *evicted)
+                pipe.execute()
+
+    def index_add(self, namespace, key, embedding):
+        index_key = f"{self.prefix}:idx:{namespace}"
+        self.client.hset(index_key, key, json.dumps(embedding))
+        if self.client.hlen(index_key) > self.max_entries:
+            # Drop index entries whose values have expired or been evicted
+            for k in self.client.hkeys(index_key):
+                k = k.decode("utf-8") if isinstance(k, bytes) else k
+                if not self.client.exists(self._key(k)):
+                    self.client.hdel(index_key, k)
+
+    def index_items(self, namespace):
+        raw = self.client.hgetall(f"{self.prefix}:idx:{namespace}")
+        items = []
+        for key, embedding in raw.items():
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            items.append((key, json.loads(embedding)))
+        return items
+
+    def index_remove(self, namespace, key):
+        self.client.hdel(f"{self.prefix}:idx:{namespace}", key)
+
+    def size(self):
+        return self.client.zcard(self._lru_key)
+
+
+class LLMResponseCache:
+    """
+    Response cache in front of LLM completion for repeatable auxiliary prompts.
+
+    Exact hits are keyed by task, model, normalised messages and tools. For tasks in
+    semantic_tasks, a miss falls back to the closest earlier prompt of the same task
+    and model whose last user message has cosine similarity >= semantic_threshold.
+    Only plain text responses (no tool calls) are stored.
+    """
+
+    def __init__(self, store=None, ttl=LLM_CACHE_TTL, tasks=LLM_CACHE_TASKS,
+                 semantic_tasks=LLM_SEMANTIC_CACHE_TASKS, semantic_threshold=LLM_SEMANTIC_CACHE_THRESHOLD,
+                 embedding_function=None):
+        self.store = store if store is not None else MemoryCacheStore()
+        self.ttl = ttl
+        self.tasks = set(tasks)
+        self.semantic_tasks = set(semantic_tasks) & self.tasks
+        self.semantic_threshold = semantic_threshold
+        self._embedding_function = embedding_function
+        self.counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def enabled_for(self, task):
+        return task in self.tasks and self.ttl > 0
+
+    def _embed(self, text):
+        if self._embedding_function is None:
+            from chromadb.utils import embedding_functions
+            self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return [float(x) for x in self._embedding_function([text])[0]]
+
+    @staticmethod
+    def _cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = sum(x * x for x in a) ** 0.5
+        norm_b = sum(y * y for y in b) ** 0.5
+        return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+    @staticmethod
+    def _semantic_text(messages):
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return _normalise_text(message.get("content"))
+        return ""
+
+    def lookup(self, task, model, messages, tools=None):
+        """
+        Returns a cached response object, or None on a miss.
+        """
+        if not self.enabled_for(task):
+            return None
+        try:
+            key = cache_key(task, model, messages, tools)
+            content = self.store.get(key)
+            if content is not None:
+                self.counters["hits"] += 1
+                return cached_response(content)
+
+            if task in self.semantic_tasks and not tools:
+                content = self._semantic_lookup(task, model, messages)
+                if content is not None:
+                    self.counters["semantic_hits"] += 1
+                    return cached_response(content)
+        except Exception as e:
+            # The cache must never break a completion
+            self.counters["errors"] += 1
+            print(f"LLMResponseCache: lookup failed: {e}")
+
+        self.counters["misses"] += 1
+        return None
+
+    def _semantic_lookup(self, task, model, messages):
+        text = self._semantic_text(messages)
+        if not text:
+            return None
+        embedding = self._embed(text)
+        namespace = f"{task}:{model}"
+        best_key, best_score = None, self.semantic_threshold
+        for key, candidate in self.store.index_items(namespace):
+            score = self._cosine(embedding, candidate)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        content = self.store.get(best_key)
+        if content is None:
+            # Entry expired or was evicted
+            self.store.index_remove(namespace, best_key)
+        return content
+
+    def store_response(self, task, model, messages, response, tools=None):
+        if not self.enabled_for(task):
+            return
+        try:
+            message = response.choices[0].message
+            if getattr(message, "tool_calls", None) or not message.content:
+                return
+            key = cache_key(task, model, messages, tools)
+            self.store.set(key, message.content, self.ttl)
+            if task in self.semantic_tasks and not tools:
+                text = self._semantic_text(messages)
+                if text:
+                    self.store.index_add(f"{task}:{model}", key, self._embed(text))
+            self.counters["stores"] += 1
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"LLMResponseCache: store failed: {e}")
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+        try:
+            size = self.store.size()
+        except Exception:
+            size = None
+        return {
+            **self.counters,
+            "hit_rate": round((self.counters["hits"] + self.counters["semantic_hits"]) / lookups, 3) if lookups else 0.0,
+            "entries": size,
+            "store": type(self.store).__name__,
+            "tasks": sorted(self.tasks),
+            "semantic_tasks": sorted(self.semantic_tasks)
+        }
+
+
+def make_store(backend=LLM_CACHE_BACKEND, prefix="llm_cache", max_entries=LLM_CACHE_MAX_ENTRIES):
+    """
+    Redis-backed store when requested and reachable, otherwise an in-process one.
+    """
+    if backend == "redis" and redis is not None:
+        try:
+            client = redis.Redis.from_url(REDIS_URL, socket_timeout=1)
+            client.ping()
+            return RedisCacheStore(guard_redis(client), prefix=prefix, max_entries=max_entries)
+        except Exception as e:
+            print(f"{prefix}: Redis unavailable ({e}), using in-process store")
+    return MemoryCacheStore(max_entries=max_entries)
+
+
+_default_cache = None
+
+
+def get_llm_cache():
+    """
+    Process-wide cache; Redis-backed when configured and reachable.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMResponseCache(store=make_store())
+    return _default_cache
@@ -0,0 +1,386 @@
+import os
+import time
+import asyncio
+import threading
+import urllib.request
+from dotenv import load_dotenv
+from .llm_cache import get_llm_cache
+from .llm_usage import record_call
+
+load_dotenv()
+
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/local-model")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "lm-studio")
+# Comma-separated OpenAI-compatible endpoints (e.g. several LM Studio / llama.cpp boxes)
+LLM_API_BASES = os.getenv("LLM_API_BASES", os.getenv("LLM_API_BASE", "http://localhost:1234/v1"))
+# Send a duplicate request to a second backend if the first hasn't answered in this time (0 = off)
+LLM_HEDGE_AFTER_MS = int(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "15"))
+# Consecutive request failures before a backend is taken out of rotation until its next health check
+LLM_MAX_FAILURES = int(os.getenv("LLM_MAX_FAILURES", "2"))
+
+# Per-task routing. Each task can point at its own model and backends via
+# LLM_MODEL_<TASK> and LLM_API_BASES_<TASK> (or LLM_API_BASE_<TASK>); unset values
+# fall back to LLM_MODEL and the default pool.
+LLM_TASKS = ("chat", "title", "codegen", "summary", "vision")
+
+
+class LLMBackend:
+    def __init__(self, api_base):
+        self.api_base = api_base.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_health_check = None
+
+    def stats(self):
+        return {
+            "api_base": self.api_base,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+
+def _litellm_completion(**kwargs):
+    from litellm import completion
+    return completion(**kwargs)
+
+
+async def _litellm_acompletion(**kwargs):
+    from litellm import acompletion
+    return await acompletion(**kwargs)
+
+
+class LLMBackendPool:
+    """
+    Pool of OpenAI-compatible LLM endpoints shared by every completion call site.
+
+    Requests go to the healthy backend with the fewest outstanding requests. A
+    backend that fails LLM_MAX_FAILURES times in a row is skipped until a background
+    health check (GET {api_base}/models) sees it again. Async calls can optionally be
+    hedged: if the first backend is slower than hedge_after_ms, the same request is
+    sent to a second backend and whichever answers first wins.
+    """
+
+    def __init__(self, api_bases, model=LLM_MODEL, api_key=LLM_API_KEY, hedge_after_ms=LLM_HEDGE_AFTER_MS,
+                 health_interval=LLM_HEALTH_INTERVAL, max_failures=LLM_MAX_FAILURES,
+                 completion_fn=None, acompletion_fn=None):
+        if isinstance(api_bases, str):
+            api_bases = [b.strip() for b in api_bases.split(",") if b.strip()]
+        self.backends = [LLMBackend(b) for b in api_bases]
+        self.model = model
+        self.api_key = api_key
+        self.hedge_after_ms = hedge_after_ms
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self._completion_fn = completion_fn or _litellm_completion
+        self._acompletion_fn = acompletion_fn or _litellm_acompletion
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+
+    # --- Health ---
+
+    def check_health(self, timeout=2):
+        for backend in self.backends:
+            try:
+                with urllib.request.urlopen(f"{backend.api_base}/models", timeout=timeout) as resp:
+                    ok = resp.status == 200
+            except Exception:
+                ok = False
+            with self._lock:
+                backend.healthy = ok
+                backend.last_health_check = time.time()
+                if ok:
+                    backend.consecutive_failures = 0
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def _ensure_health_thread(self):
+        # Only worth probing when there is something to route between
+        if self._health_thread is None and len(self.backends) > 1 and self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    # --- Routing ---
+
+    def pick(self, exclude=()):
+        """
+        Least-outstanding-requests choice among healthy backends (all backends if none are healthy).
+        """
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            healthy = [b for b in candidates if b.healthy] or candidates
+            if not healthy:
+                return None
+            backend = min(healthy, key=lambda b: b.outstanding)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _finish(self, backend, ok):
+        # ok=None: request abandoned (e.g. cancelled), no health signal either way
+        with self._lock:
+            backend.outstanding -= 1
+            if ok is None:
+                return
+            if ok:
+                backend.consecutive_failures = 0
+            else:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self.max_failures:
+                    backend.healthy = False
+
+    def _request_kwargs(self, backend, kwargs):
+        request = dict(kwargs)
+        request.setdefault("model", self.model)
+        request.setdefault("api_key", self.api_key)
+        request["api_base"] = backend.api_base
+        return request
+
+    # --- Sync ---
+
+    def completion(self, **kwargs):
+        """
+        Drop-in for litellm.completion. An explicit api_base bypasses the pool.
+        Fails over once to another backend on error.
+        """
+        if kwargs.get("api_base"):
+            return self._completion_fn(**{"model": self.model, "api_key": self.api_key, **kwargs})
+        self._ensure_health_thread()
+
+        tried = []
+        while True:
+            backend = self.pick(exclude=tried)
+            try:
+                response = self._completion_fn(**self._request_kwargs(backend, kwargs))
+                self._finish(backend, ok=True)
+                return response
+            except Exception:
+                self._finish(backend, ok=False)
+                tried.append(backend)
+                if len(tried) >= min(2, len(self.backends)):
+                    raise
+
+    # --- Async ---
+
+    async def _attempt(self, backend, kwargs):
+        try:
+            response = await self._acompletion_fn(**self._request_kwargs(backend, kwargs))
+        except BaseException as e:
+            # Cancellation (e.g. the losing side of a hedge) says nothing about backend health
+            self._finish(backend, ok=None if isinstance(e, asyncio.CancelledError) else False)
+            raise
+        self._finish(backend, ok=True)
+        return response
+
+    async def acompletion(self, **kwargs):
+        """
+        Drop-in for litellm.acompletion with least-outstanding routing, failover and optional hedging.
+        """
+        if kwargs.get("api_base"):
+            return await self._acompletion_fn(**{"model": self.model, "api_key": self.api_key, **kwargs})
+        self._ensure_health_thread()
+
+        primary = self.pick()
+        first = asyncio.ensure_future(self._attempt(primary, kwargs))
+        tasks = {first: primary}
+        try:
+            if self.hedge_after_ms > 0 and len(self.backends) > 1:
+                done, _ = await asyncio.wait({first}, timeout=self.hedge_after_ms / 1000)
+                if not done:
+                    secondary = self.pick(exclude=[primary])
+                    tasks[asyncio.ensure_future(self._attempt(secondary, kwargs))] = secondary
+                    self.hedged_requests += 1
+
+            pending = set(tasks)
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+
+            # Everything we sent failed: fail over once to a backend we haven't tried
+            fallback = self.pick(exclude=list(tasks.values()))
+            if fallback is None:
+                raise last_error
+            return await self._attempt(fallback, kwargs)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        return {
+            "backends": [b.stats() for b in self.backends],
+            "hedge_after_ms": self.hedge_after_ms,
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+_default_pool = None
+_task_pools = {}
+
+
+def _task_env(name, task):
+    return os.getenv(f"{name}_{task.upper()}") or None
+
+
+def task_model(task):
+    """
+    Model configured for a task, or None to use the pool's default model.
+    """
+    if task is None:
+        return None
+    if task not in LLM_TASKS:
+        raise ValueError(f"Unknown LLM task: {task}")
+    return _task_env("LLM_MODEL", task)
+
+
+def has_dedicated_pool(task):
+    """
+    True if the task has its own backends rather than sharing the main LLM.
+    """
+    if task is None or task not in LLM_TASKS:
+        return False
+    return bool(_task_env("LLM_API_BASES", task) or _task_env("LLM_API_BASE", task))
+
+
+def get_llm_pool(task=None):
+    """
+    Pool for a task (default: the process-wide pool configured from LLM_API_BASES / LLM_API_BASE).
+    """
+    global _default_pool
+    if has_dedicated_pool(task):
+        if task not in _task_pools:
+            bases = _task_env("LLM_API_BASES", task) or _task_env("LLM_API_BASE", task)
+            _task_pools[task] = LLMBackendPool(bases, model=task_model(task) or LLM_MODEL)
+        return _task_pools[task]
+    if _default_pool is None:
+        _default_pool = LLMBackendPool(LLM_API_BASES)
+    return _default_pool
+
+
+def _routed_kwargs(task, kwargs):
+    model = task_model(task)
+    if model and "model" not in kwargs:
+        kwargs = {**kwargs, "model": model}
+    return kwargs
+
+
+def _fallback_kwargs(task, kwargs):
+    # Main model on the main backends; drop the task's model unless the caller chose it
+    if task_model(task) == kwargs.get("model"):
+        kwargs = {k: v for k, v in kwargs.items() if k != "model"}
+    return kwargs
+
+
+def _complete(task, kwargs):
+    if not has_dedicated_pool(task):
+        return get_llm_pool().completion(**kwargs)
+    try:
+        return get_llm_pool(task).completion(**kwargs)
+    except Exception as e:
+        print(f"LLM pool: '{task}' backends failed ({e}), falling back to main model")
+        return get_llm_pool().completion(**_fallback_kwargs(task, kwargs))
+
+
+async def _acomplete(task, kwargs):
+    if not has_dedicated_pool(task):
+        return await get_llm_pool().acompletion(**kwargs)
+    try:
+        return await get_llm_pool(task).acompletion(**kwargs)
+    except Exception as e:
+        print(f"LLM pool: '{task}' backends failed ({e}), falling back to main model")
+        return await get_llm_pool().acompletion(**_fallback_kwargs(task, kwargs))
+
+
+def _cache_args(task, kwargs):
+    model = kwargs.get("model") or task_model(task) or LLM_MODEL
+    return task, model, kwargs.get("messages", []), kwargs.get("tools")
+
+
+def _cached_completion(task, kwargs):
+    cache = get_llm_cache()
+    if not cache.enabled_for(task):
+        return _complete(task, kwargs)
+
+    cache_args = _cache_args(task, kwargs)
+    response = cache.lookup(*cache_args)
+    if response is None:
+        response = _complete(task, kwargs)
+        cache.store_response(*cache_args[:3], response, tools=cache_args[3])
+    return response
+
+
+async def _cached_acompletion(task, kwargs):
+    cache = get_llm_cache()
+    if not cache.enabled_for(task):
+        return await _acomplete(task, kwargs)
+
+    # Redis round trips and embeddings stay off the event loop
+    cache_args = _cache_args(task, kwargs)
+    response = await asyncio.to_thread(cache.lookup, *cache_args)
+    if response is None:
+        response = await _acomplete(task, kwargs)
+        await asyncio.to_thread(cache.store_response, *cache_args[:3], response, tools=cache_args[3])
+    return response
+
+
+def completion(task=None, **kwargs):
+    """
+    Drop-in for litellm.completion routed by task. Cacheable tasks are answered from
+    the response cache when possible. If a task's dedicated backends fail, the call
+    falls back to the main pool. Every call is recorded in the LLM usage log.
+    """
+    kwargs = _routed_kwargs(task, kwargs)
+    model = kwargs.get("model") or LLM_MODEL
+    started = time.perf_counter()
+    try:
+        response = _cached_completion(task, kwargs)
+    except Exception as e:
+        record_call(task, model, started, error=e)
+        raise
+    record_call(task, model, started, response)
+    return response
+
+
+async def acompletion(task=None, **kwargs):
+    kwargs = _routed_kwargs(task, kwargs)
+    model = kwargs.get("model") or LLM_MODEL
+    started = time.perf_counter()
+    try:
+        response = await _cached_acompletion(task, kwargs)
+    except Exception as e:
+        record_call(task, model, started, error=e)
+        raise
+    record_call(task, model, started, response)
+    return response
+
+
+def routing_stats():
+    return {
+        "default": get_llm_pool().stats(),
+        "cache": get_llm_cache().stats(),
+        "tasks": {
+            task: {
+                "model": task_model(task) or LLM_MODEL,
+                "backends": get_llm_pool(task).stats() if has_dedicated_pool(task) else "default"
+            }
+            for task in LLM_TASKS
+        }
+    }
@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+
+# Served strictly in this order; within a priority, users are served round-robin
+PRIORITIES = ("interactive", "background")
+
+
+class SchedulerSaturated(Exception):
+    """Raised when a new chat turn cannot be admitted because the LLM queue is full."""
+
+    def __init__(self, queue_depth, max_queue):
+        self.queue_depth = queue_depth
+        self.max_queue = max_queue
+        super().__init__(f"LLM backend saturated ({queue_depth} calls queued, limit {max_queue})")
+
+
+class LLMScheduler:
+    """
+    Admission control and fair scheduling for calls to the shared LLM backend.
+
+    At most max_concurrent calls run at once. Waiting calls are queued per priority
+    and per user; interactive calls always go before background ones (titles,
+    summaries), and users within a priority take turns, so one user's long tool loop
+    cannot starve everybody else. New chat turns are rejected via admit() while the
+    queue is at max_queue.
+    """
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT, max_queue=LLM_MAX_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters = {p: OrderedDict() for p in PRIORITIES} # priority -> user_id -> deque of futures
+        self.counters = {"granted": 0, "queued": 0, "rejected": 0, "cancelled": 0}
+        self._wait_seconds_total = 0.0
+
+    @property
+    def queue_depth(self):
+        return sum(len(q) for users in self._waiters.values() for q in users.values())
+
+    def queue_position(self, user_id):
+        """1-based position of the user's next queued call, or 0 if none queued."""
+        position = 0
+        for priority in PRIORITIES:
+            for waiting_user, q in self._waiters[priority].items():
+                if waiting_user == user_id:
+                    return position + 1
+                position += len(q)
+        return 0
+
+    def admit(self, user_id):
+        """
+        Admission check for a new chat turn. Raises SchedulerSaturated when full.
+        """
+        depth = self.queue_depth
+        if depth >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise SchedulerSaturated(depth, self.max_queue)
+
+    @asynccontextmanager
+    async def slot(self, user_id, priority="interactive"):
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, user_id, priority="interactive"):
+        if priority not in self._waiters:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        if self._active < self.max_concurrent and self.queue_depth == 0:
+            self._active += 1
+            self.counters["granted"] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(user_id, deque()).append(future)
+        self.counters["queued"] += 1
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled; hand it on
+                self.release()
+            else:
+                self._remove_waiter(priority, user_id, future)
+            self.counters["cancelled"] += 1
+            raise
+        self._wait_seconds_total += time.perf_counter() - started
+        self.counters["granted"] += 1
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _remove_waiter(self, priority, user_id, future):
+        q = self._waiters[priority].get(user_id)
+        if q is None:
+            return
+        try:
+            q.remove(future)
+        except ValueError:
+            pass
+        if not q:
+            del self._waiters[priority][user_id]
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            users = self._waiters[priority]
+            while users:
+                user_id, q = next(iter(users.items()))
+                future = q.popleft()
+                if q:
+                    users.move_to_end(user_id) # Round-robin across users
+                else:
+                    del users[user_id]
+                if not future.done():
+                    return future
+        return None
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent:
+            future = self._next_waiter()
+            if future is None:
+                break
+            self._active += 1
+            future.set_result(None)
+
+    def stats(self):
+        waits = self.counters["granted"]
+        return {
+            **self.counters,
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "queue_depth_by_priority": {
+                p: sum(len(q) for q in users.values()) for p, users in self._waiters.items()
+            },
+            "queued_users": sorted({u for users in self._waiters.values() for u in users}),
+            "avg_wait_ms": round(self._wait_seconds_total / waits * 1000, 2) if waits else 0.0
+        }
@@ -0,0 +1,252 @@
+import os
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from .circuit_breaker import guard_mongo
+from .clients import get_mongo_client
+
+LLM_USAGE_BATCH_SIZE = int(os.getenv("LLM_USAGE_BATCH_SIZE", "100"))
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "5"))
+# Records kept in memory while Mongo is unreachable; the oldest are dropped beyond this
+LLM_USAGE_MAX_BUFFER = int(os.getenv("LLM_USAGE_MAX_BUFFER", "10000"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+CONTEXT_FIELDS = ("user_id", "chat_id", "mode", "persona", "turn", "tool")
+
+# Who/what triggered the LLM calls made in this context (set by the orchestrator)
+_usage_context = contextvars.ContextVar("llm_usage_context", default={})
+
+
+def get_usage_context():
+    return dict(_usage_context.get())
+
+
+def set_usage_context(**fields):
+    """
+    Sets attribution fields for the rest of the current task (each chat turn runs in its own task).
+    """
+    return _usage_context.set({**_usage_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+
+@contextmanager
+def usage_context(**fields):
+    """
+    Adds attribution fields (user_id, mode, turn, tool, ...) for LLM calls made inside the block.
+    """
+    token = set_usage_context(**fields)
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+class LLMUsageRecorder:
+    """
+    Accounting of every LLM completion: tokens, latency and who/what triggered it.
+
+    record() only appends to an in-memory buffer; a daemon thread writes batches to
+    the llm_usage collection every flush_interval seconds or once batch_size records
+    are waiting. If Mongo is down, records stay buffered (up to max_buffer).
+    Each record gets its _id when it is buffered, so a retried batch cannot insert
+    a record twice.
+    """
+
+    def __init__(self, collection=None, batch_size=LLM_USAGE_BATCH_SIZE, flush_interval=LLM_USAGE_FLUSH_SECONDS,
+                 max_buffer=LLM_USAGE_MAX_BUFFER):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.counters = {"recorded": 0, "written": 0, "dropped": 0, "flush_errors": 0}
+
+    @classmethod
+    def from_mongo(cls, **kwargs):
+        collection = None
+        try:
+            client = get_mongo_client()
+            collection = guard_mongo(client["jarvis_db"]["llm_usage"])
+        except Exception as e:
+            print(f"LLMUsageRecorder: Error connecting to MongoDB: {e}")
+        return cls(collection=collection, **kwargs)
+
+    def record(self, task, model, response=None, latency_s=0.0, error=None):
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        now = datetime.utcnow()
+        context = get_usage_context()
+        doc = {
+            "_id": uuid.uuid4().hex,
+            "timestamp": now,
+            "day": now.strftime("%Y-%m-%d"),
+            "task": task or "chat",
+            "model": model,
+            **{field: context.get(field) for field in CONTEXT_FIELDS},
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency_ms": round(latency_s * 1000, 2),
+            "cached": bool(getattr(response, "cached", False)),
+            "status": "error" if error else "ok"
+        }
+        if error:
+            doc["error"] = str(error)[:500]
+
+        with self._lock:
+            self._buffer.append(doc)
+            self.counters["recorded"] += 1
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.counters["dropped"] += overflow
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is None and self.collection is not None:
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        # Index creation waits on the server, so it happens here rather than on the request path
+        try:
+            self.collection.create_index([("day", 1), ("user_id", 1)])
+            self.collection.create_index([("tool", 1), ("day", 1)])
+        except Exception as e:
+            print(f"LLMUsageRecorder: could not create indexes: {e}")
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Writes everything buffered. Returns the number of records written.
+        """
+        if self.collection is None:
+            return 0
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            details = getattr(e, "details", None)
+            write_errors = details.get("writeErrors") if isinstance(details, dict) else None
+            if write_errors is not None:
+                # BulkWriteError: the rest of the batch was written, and duplicate keys are
+                # records an earlier attempt wrote before it failed
+                failed = {err["index"] for err in write_errors if err.get("code") != DUPLICATE_KEY_ERROR}
+                retry = [doc for i, doc in enumerate(batch) if i in failed]
+            else:
+                retry = batch
+            if retry:
+                self.counters["flush_errors"] += 1
+                print(f"LLMUsageRecorder: flush of {len(retry)} of {len(batch)} records failed: {e}")
+                with self._lock:
+                    # Put them back in front for the next attempt, within the buffer limit
+                    self._buffer = (retry + self._buffer)[-self.max_buffer:]
+            written = len(batch) - len(retry)
+            self.counters["written"] += written
+            return written
+        self.counters["written"] += len(batch)
+        return len(batch)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._buffer)
+        return {**self.counters, "pending": pending, "batch_size": self.batch_size}
+
+    # --- Aggregates ---
+
+    def _aggregate(self, match, group_key, sort, limit=None):
+        if self.collection is None:
+            return []
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": group_key,
+                "calls": {"$sum": 1},
+                "cached_calls": {"$sum": {"$cond": ["$cached", 1, 0]}},
+                "errors": {"$sum": {"$cond": [{"$eq": ["$status", "error"]}, 1, 0]}},
+                "prompt_tokens": {"$sum": "$prompt_tokens"},
+                "completion_tokens": {"$sum": "$completion_tokens"},
+                "total_tokens": {"$sum": "$total_tokens"},
+                "llm_ms": {"$sum": "$latency_ms"},
+                "avg_latency_ms": {"$avg": "$latency_ms"}
+            }},
+            {"$sort": sort}
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+        rows = []
+        for row in self.collection.aggregate(pipeline):
+            key = row.pop("_id")
+            row["llm_seconds"] = round(row.pop("llm_ms") / 1000, 2)
+            row["avg_latency_ms"] = round(row["avg_latency_ms"] or 0, 2)
+            rows.append({**(key if isinstance(key, dict) else {"key": key}), **row})
+        return rows
+
+    @staticmethod
+    def _since(days):
+        return (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    def usage_by_user_day(self, days=7, user_id=None):
+        match = {"day": {"$gte": self._since(days)}}
+        if user_id:
+            match["user_id"] = user_id
+        return self._aggregate(match, {"user_id": "$user_id", "day": "$day"}, {"_id.day": -1, "total_tokens": -1})
+
+    def usage_by_mode(self, days=7, user_id=None):
+        match = {"day": {"$gte": self._since(days)}}
+        if user_id:
+            match["user_id"] = user_id
+        return self._aggregate(match, {"mode": "$mode", "persona": "$persona", "task": "$task"}, {"total_tokens": -1})
+
+    def top_tools(self, days=7, limit=10, user_id=None):
+        """
+        Tools ranked by the tokens of the LLM calls they triggered (e.g. create_tool code generation).
+        """
+        match = {"day": {"$gte": self._since(days)}, "tool": {"$ne": None}}
+        if user_id:
+            match["user_id"] = user_id
+        return self._aggregate(match, {"tool": "$tool"}, {"total_tokens": -1}, limit=limit)
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_usage_recorder():
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = LLMUsageRecorder.from_mongo()
+    return _recorder
+
+
+def flush_pending():
+    """
+    Flushes the process recorder if one was created (used by short-lived tool workers).
+    """
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def record_call(task, model, started, response=None, error=None):
+    try:
+        get_usage_recorder().record(task, model, response, time.perf_counter() - started, error)
+    except Exception as e:
+        # Accounting must never break a completion
+        print(f"LLMUsageRecorder: could not record call: {e}")
@@ -0,0 +1,120 @@
+import os
+import json
+from collections import Counter
+
+# Identical (tool, args) calls allowed in one turn sequence before the loop is cut short
+LOOP_MAX_REPEATS = int(os.getenv("LOOP_MAX_REPEATS", "3"))
+# Consecutive LLM turns that only repeat earlier calls or send unparseable arguments
+LOOP_MAX_STALLED_TURNS = int(os.getenv("LOOP_MAX_STALLED_TURNS", "2"))
+
+# Internal tools without side effects. Only read-only tools are answered from cache;
+# any other tool (including dynamic and MCP tools unless they opt in, see
+# JarvisOrchestrator._read_only_tools) may change state, so running it invalidates cached
+# results and repeat counts (e.g. read_file after write_file must see the new content)
+READ_ONLY_TOOLS = frozenset({
+    "read_tool_output", "read_pdf", "read_docx", "read_image", "read_text_file", "list_files", "read_file"
+})
+
+
+class ToolLoopGuard:
+    """
+    Tracks (tool, args) fingerprints across the turns of one process_message call.
+
+    Repeated read-only calls are answered from the results of earlier identical
+    calls. A turn in which every call is a repeat or has malformed arguments makes
+    no progress; after max_stalled_turns such turns in a row, or once a single call
+    has been repeated max_repeats times, should_stop is set and the orchestrator
+    asks the model for a final answer instead of spending more LLM calls.
+
+    Any other tool may change state, so running it resets cached results and the repeat
+    counts of every other call (pytest -> write_file -> pytest is progress, and a
+    re-read after a write is a new call). Only the same state-changing call repeated
+    with no other state change in between counts as a repeat.
+    """
+
+    def __init__(self, max_repeats=LOOP_MAX_REPEATS, max_stalled_turns=LOOP_MAX_STALLED_TURNS,
+                 read_only_tools=READ_ONLY_TOOLS):
+        self.max_repeats = max_repeats
+        self.max_stalled_turns = max_stalled_turns
+        self.read_only_tools = read_only_tools
+        self.call_counts = Counter()
+        self.results = {}
+        self.stalled_turns = 0
+        self.stop_reason = None
+        self.counters = {"calls": 0, "repeats": 0, "cache_hits": 0, "malformed": 0}
+        self._turn_progress = False
+
+    @staticmethod
+    def parse_arguments(raw):
+        """
+        Returns (args, error). Malformed JSON is reported back to the model rather
+        than silently becoming {}.
+        """
+        if isinstance(raw, dict):
+            return raw, None
+        try:
+            args = json.loads(raw or "{}")
+        except json.JSONDecodeError as e:
+            return None, f"Invalid JSON arguments ({e}). Call the tool again with a valid JSON object."
+        if not isinstance(args, dict):
+            return None, "Tool arguments must be a JSON object."
+        return args, None
+
+    @staticmethod
+    def fingerprint(name, args):
+        return f"{name}:{json.dumps(args, sort_keys=True, default=str)}"
+
+    @property
+    def should_stop(self):
+        return self.stop_reason is not None
+
+    def start_turn(self):
+        self._turn_progress = False
+
+    def record_malformed(self, name):
+        self.counters["calls"] += 1
+        self.counters["malformed"] += 1
+
+    def check(self, name, args):
+        """
+        Registers a call. Returns the earlier result if this call can be answered from cache.
+        """
+        self.counters["calls"] += 1
+        key = self.fingerprint(name, args)
+        read_only = name in self.read_only_tools
+        self.call_counts[key] += 1
+        if not read_only:
+            # State may change: other calls are no longer repeats and their results are stale
+            own = self.call_counts[key]
+            self.call_counts.clear()
+            self.results.clear()
+            self.call_counts[key] = own
+        if self.call_counts[key] == 1:
+            self._turn_progress = True
+            return None
+
+        self.counters["repeats"] += 1
+        if self.call_counts[key] >= self.max_repeats:
+            self.stop_reason = f"'{name}' was called {self.call_counts[key]} times with the same arguments"
+        if not read_only or key not in self.results:
+            return None
+        self.counters["cache_hits"] += 1
+        return self.results[key]
+
+    def record_result(self, name, args, result):
+        if name not in self.read_only_tools:
+            # State may have changed; earlier read results could be stale
+            self.results.clear()
+            return
+        self.results[self.fingerprint(name, args)] = result
+
+    def end_turn(self):
+        if self._turn_progress:
+            self.stalled_turns = 0
+            return
+        self.stalled_turns += 1
+        if self.stalled_turns >= self.max_stalled_turns and self.stop_reason is None:
+            self.stop_reason = f"{self.stalled_turns} consecutive turns made no progress"
+
+    def stats(self):
+        return {**self.counters, "stalled_turns": self.stalled_turns, "stop_reason": self.stop_reason}
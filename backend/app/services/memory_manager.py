@@ -1,65 +1,171 @@
 import os
+import time
 import datetime
 import uuid
 import json
-from pymongo import MongoClient
-import chromadb
-from sentence_transformers import SentenceTransformer
+import threading
+from collections import OrderedDict
 from ..tasks import embed_and_store_episode
+from .circuit_breaker import guard_mongo, get_breaker, is_connection_error
+from .clients import get_mongo_client, get_chroma_client, get_embedding_model, is_embedded
+from .hybrid_search import HybridRetriever, HYBRID_SEARCH, default_reranker
+from .episode_ranking import importance_score, resolve_ranking, rank_episodes, validate_ranking
 
 # Env vars should be loaded by orchestrator or main before importing, 
 # or we load them here.
 from dotenv import load_dotenv
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-CHROMA_HOST = "localhost"
-CHROMA_PORT = 8000
+# Episodic collections (one per user and mode) with a keyword index held in memory
+HYBRID_MAX_INDEXES = int(os.getenv("HYBRID_MAX_INDEXES", "64"))
+# Without Redis, how long a worker may use its cached mode settings before re-reading Mongo
+MODE_CACHE_SECONDS = float(os.getenv("MODE_CACHE_SECONDS", "10"))
+MODE_VERSION_KEY = "modes:version"
 
 class EpisodicMemory:
     def __init__(self):
-        self.model = None
         self.client = None
+        self._retrievers = OrderedDict() # collection name -> HybridRetriever, least recently used first
+        self._retrievers_lock = threading.Lock()
         try:
-            # We only need the model for SEARCH (Reading)
-            # Writing is handled by Celery
-            print("Loading Search Embedding Model (Local)...")
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            self.client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+            self.client = get_chroma_client()
         except Exception as e:
             print(f"Error initializing EpisodicMemory: {e}")
 
+    @property
+    def model(self):
+        # We only need the model for SEARCH (writing is handled by Celery). Loaded on
+        # first use or by the startup preload, whichever comes first.
+        return get_embedding_model()
+
+    def _retriever(self, collection_name):
+        with self._retrievers_lock:
+            retriever = self._retrievers.get(collection_name)
+            if retriever is not None:
+                self._retrievers.move_to_end(collection_name)
+                return retriever
+        collection = self.client.get_or_create_collection(name=collection_name)
+        with self._retrievers_lock:
+            retriever = self._retrievers.setdefault(collection_name, HybridRetriever(collection, reranker=default_reranker()))
+            while len(self._retrievers) > HYBRID_MAX_INDEXES:
+                self._retrievers.popitem(last=False)
+        return retriever
+
+    def _forget_ids(self, collection_name, ids):
+        retriever = self._retrievers.get(collection_name)
+        if retriever is not None:
+            retriever.remove(ids)
+
     def add_episode(self, content, mode="Work", user_id="default"):
+        if is_embedded():
+            # The embedded Chroma store belongs to this process; Celery workers can't write to it
+            self._store_episode_inline(content, mode, user_id)
+            return
         # Offload to Celery
         print(f"Dispatching memory task for mode '{mode}' user '{user_id}'")
-        embed_and_store_episode.delay(content, mode, user_id)
+        try:
+            # retry=False: a down broker fails this call instead of blocking on reconnects
+            get_breaker("redis").call(embed_and_store_episode.apply_async, args=[content, mode, user_id], retry=False)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            # Degraded: broker unreachable, so embed and store here (we're on the background writer, off the request path)
+            print(f"Celery broker unavailable ({e}), storing episode in-process")
+            self._store_episode_inline(content, mode, user_id)
+
+    def _store_episode_inline(self, content, mode, user_id):
+        if not self.client or not self.model:
+            return
+        collection_name = f"episodic_{user_id}_{mode.lower()}"
+        collection = self.client.get_or_create_collection(name=collection_name)
+        episode_id = str(uuid.uuid4())
+        metadata = {
+            "content": content,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "mode": mode,
+            "user_id": user_id,
+            "importance": importance_score(content)
+        }
+        collection.add(
+            ids=[episode_id],
+            embeddings=[self.model.encode(content).tolist()],
+            metadatas=[metadata],
+            documents=[content]
+        )
+        retriever = self._retrievers.get(collection_name)
+        if retriever is not None:
+            retriever.add([episode_id], [content], [metadata])
 
-    def search_episodes(self, query, mode="Work", n=3, user_id="default"):
+    def search_episodes(self, query, mode="Work", n=3, user_id="default", ranking=None):
+        """
+        Top episodes for a query, over-fetched and re-ranked by relevance, recency and
+        importance (see episode_ranking.py). ranking is the mode's parameters
+        (ModeManager.get_episode_ranking); None uses the built-in ones for the mode.
+        """
         if not self.client or not self.model:
             return []
             
         try:
+            ranking = ranking or resolve_ranking(mode)
+            n_candidates = max(n, int(n * ranking["overfetch"]))
             # Generate query embedding locally independent of Celery
             query_embedding = self.model.encode(query).tolist()
             
             collection_name = f"episodic_{user_id}_{mode.lower()}"
-            collection = self.client.get_or_create_collection(name=collection_name)
-            
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n
-            )
-            
-            return results['documents'][0] if results['documents'] else []
+            if HYBRID_SEARCH:
+                # Vector + keyword (exact identifiers, file names, error strings), fused
+                hits = self._retriever(collection_name).search(query, n_candidates, query_embeddings=[query_embedding])
+            else:
+                collection = self.client.get_or_create_collection(name=collection_name)
+                
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_candidates
+                )
+                hits = []
+                if results['ids'] and results['ids'][0]:
+                    for i, document in enumerate(results['documents'][0]):
+                        hits.append({
+                            "document": document,
+                            "metadata": results['metadatas'][0][i] if results.get('metadatas') else {},
+                            "score": -results['distances'][0][i] if results.get('distances') else -i,
+                            "distance": results['distances'][0][i] if results.get('distances') else None
+                        })
+
+            return [hit["document"] for hit in rank_episodes(hits, ranking)[:n]]
         except Exception as e:
             print(f"Error searching episodes: {e}")
             return []
             
+    def warm_up(self, sessions):
+        """
+        Queries the episodic collection of each (user_id, mode) once so its index is
+        loaded. Missing collections are skipped, not created.
+        """
+        if not self.client or not self.model:
+            return 0
+        query_embedding = self.model.encode("warm up").tolist()
+        touched = 0
+        for user_id, mode in sessions:
+            collection_name = f"episodic_{user_id}_{mode.lower()}"
+            try:
+                collection = self.client.get_collection(name=collection_name)
+            except Exception as e:
+                if is_connection_error(e):
+                    raise
+                continue
+            collection.query(query_embeddings=[query_embedding], n_results=1)
+            if HYBRID_SEARCH:
+                self._retriever(collection_name).sync(force=True)
+            touched += 1
+        return touched
+
     def delete_mode_memory(self, mode, user_id="default"):
         if not self.client:
             return False
         try:
             collection_name = f"episodic_{user_id}_{mode.lower()}"
+            self._retrievers.pop(collection_name, None)
             self.client.delete_collection(name=collection_name)
             return True
         except Exception as e:
@@ -95,6 +201,7 @@ class EpisodicMemory:
             collection_name = f"episodic_{user_id}_{mode.lower()}"
             collection = self.client.get_collection(name=collection_name)
             collection.delete(ids=[episode_id])
+            self._forget_ids(collection_name, [episode_id])
             return True
         except Exception as e:
              print(f"Error deleting episode {episode_id}: {e}")
@@ -141,6 +248,7 @@ class EpisodicMemory:
                 return 0
 
             collection.delete(ids=ids_to_delete)
+            self._forget_ids(collection_name, ids_to_delete)
             print(f"Hard deleted {len(ids_to_delete)} episodes semantically related to '{text}'")
             return len(ids_to_delete)
             
@@ -155,9 +263,9 @@ class SemanticMemory:
         self.collection = None
         
         try:
-            self.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            self.client = get_mongo_client()
             self.db = self.client["jarvis_db"]
-            self.collection = self.db["facts"]
+            self.collection = guard_mongo(self.db["facts"])
             print("Connected to MongoDB Local")
         except Exception as e:
             print(f"Error connecting to MongoDB: {e}")
@@ -274,13 +382,24 @@ class SemanticMemory:
 
 
 class ModeManager:
-    def __init__(self):
+    """
+    Modes and their settings. Allowed tools and episode ranking are cached per worker;
+    with Redis (redis_client) each read checks a version counter that create_mode and
+    delete_mode bump, so a change on one worker reaches the others on their next
+    request. Without Redis, cached entries expire after MODE_CACHE_SECONDS.
+    """
+
+    def __init__(self, redis_client=None, cache_seconds=MODE_CACHE_SECONDS):
         self.client = None
         self.collection = None
+        self.redis = redis_client
+        self.cache_seconds = cache_seconds
+        self._allowed_tools_cache = {} # mode name -> (version, fetched_at, frozenset of tool names or None for '*')
+        self._ranking_cache = {} # mode name -> (version, fetched_at, episode ranking parameters)
         try:
-            self.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            self.client = get_mongo_client()
             self.db = self.client["jarvis_db"]
-            self.collection = self.db["modes"]
+            self.collection = guard_mongo(self.db["modes"])
             # Seed default modes if empty
             if self.collection.count_documents({}) == 0:
                 self.collection.insert_many([
@@ -299,17 +418,96 @@ class ModeManager:
         if self.collection is None: return []
         return list(self.collection.find({}, {"_id": 0}))
 
-    def create_mode(self, name, description, allowed_tools):
+    def _version(self):
+        if self.redis is None:
+            return None
+        try:
+            return int(self.redis.get(MODE_VERSION_KEY) or 0)
+        except Exception as e:
+            print(f"ModeManager: version check failed ({e}), using cache expiry")
+            return None
+
+    def _invalidate(self, name):
+        self._allowed_tools_cache.pop(name, None)
+        self._ranking_cache.pop(name, None)
+        if self.redis is not None:
+            try:
+                self.redis.incr(MODE_VERSION_KEY)
+            except Exception as e:
+                print(f"ModeManager: could not publish change to mode '{name}': {e}")
+
+    def _cached(self, cache, mode_name, version):
+        """Returns (True, value) if the cached entry is still current, else (False, None)."""
+        entry = cache.get(mode_name)
+        if entry is None:
+            return False, None
+        cached_version, fetched_at, value = entry
+        if version is not None:
+            fresh = cached_version == version
+        else:
+            fresh = time.monotonic() - fetched_at < self.cache_seconds
+        return fresh, value
+
+    def get_allowed_tools(self, mode_name):
+        """
+        Returns the precomputed set of tool names allowed in a mode, or None if the
+        mode allows all tools.
+        """
+        version = self._version()
+        fresh, allowed_set = self._cached(self._allowed_tools_cache, mode_name, version)
+        if fresh:
+            return allowed_set
+
+        try:
+            mode_doc = self.get_mode(mode_name)
+        except Exception as e:
+            # Degraded: Mongo unreachable and mode not cached yet; allow all tools, don't cache the guess
+            print(f"Error loading mode '{mode_name}', allowing all tools: {e}")
+            return None
+        allowed = mode_doc.get("allowed_tools", ["*"]) if mode_doc else ["*"]
+        allowed_set = None if "*" in allowed else frozenset(allowed)
+        self._allowed_tools_cache[mode_name] = (version, time.monotonic(), allowed_set)
+        return allowed_set
+
+    def get_episode_ranking(self, mode_name):
+        """
+        Episodic retrieval parameters for a mode: the defaults, overridden by the mode's
+        optional 'episode_ranking' field.
+        """
+        version = self._version()
+        fresh, ranking = self._cached(self._ranking_cache, mode_name, version)
+        if fresh:
+            return ranking
+
+        try:
+            mode_doc = self.get_mode(mode_name)
+        except Exception as e:
+            # Degraded: use the built-in parameters, don't cache them
+            print(f"Error loading mode '{mode_name}', using default episode ranking: {e}")
+            return resolve_ranking(mode_name)
+        ranking = resolve_ranking(mode_name, (mode_doc or {}).get("episode_ranking"))
+        self._ranking_cache[mode_name] = (version, time.monotonic(), ranking)
+        return ranking
+
+    def create_mode(self, name, description, allowed_tools, episode_ranking=None):
         if self.collection is None: return {"status": "error", "message": "DB not connected"}
         
         if self.collection.find_one({"name": name}):
             return {"status": "error", "message": f"Mode '{name}' already exists."}
-        
-        self.collection.insert_one({
+
+        mode_doc = {
             "name": name,
             "description": description,
             "allowed_tools": allowed_tools
-        })
+        }
+        if episode_ranking:
+            error = validate_ranking(episode_ranking)
+            if error:
+                return {"status": "error", "message": error}
+            mode_doc["episode_ranking"] = episode_ranking
+        
+        self.collection.insert_one(mode_doc)
+        self._invalidate(name)
         return {"status": "success", "message": f"Mode '{name}' created."}
 
     def delete_mode(self, name):
@@ -319,6 +517,7 @@ class ModeManager:
              return {"status": "error", "message": "Cannot delete default 'Work' mode."}
              
          result = self.collection.delete_one({"name": name})
+         self._invalidate(name)
          if result.deleted_count > 0:
              return {"status": "success", "message": f"Mode '{name}' deleted."}
          return {"status": "error", "message": "Mode not found."}
@@ -329,9 +528,9 @@ class ToneManager:
         self.client = None
         self.collection = None
         try:
-            self.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            self.client = get_mongo_client()
             self.db = self.client["jarvis_db"]
-            self.collection = self.db["tones"]
+            self.collection = guard_mongo(self.db["tones"])
             # Seed default tones if empty
             if self.collection.count_documents({}) == 0:
                 self.collection.insert_many([
@@ -346,7 +545,12 @@ class ToneManager:
 
     def get_tone(self, tone_name):
         if self.collection is None: return None
-        return self.collection.find_one({"name": tone_name}, {"_id": 0})
+        try:
+            return self.collection.find_one({"name": tone_name}, {"_id": 0})
+        except Exception as e:
+            # Degraded: callers fall back to the built-in DEFAULT_TONES
+            print(f"Error loading tone '{tone_name}': {e}")
+            return None
 
     def get_all_tones(self):
         if self.collection is None: return []
@@ -1,19 +1,34 @@
 import asyncio
 import os
+import time
 import sys
 import json
-import chromadb
-import importlib.util
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from litellm import completion
 from pathlib import Path
 from .memory_manager import EpisodicMemory, SemanticMemory, ModeManager, ToneManager
 from .tool_creator import ToolCreator
 from .document_manager import DocumentManager
 from .chat_service import ChatService
-from ..prompts import get_persona_prompt
+from .file_monitor import FileMonitorService
+from .tool_registry import ToolRegistry, ToolLoadError, sync_tool_index
+from .tool_retrieval import ToolRetriever
+from .circuit_breaker import is_connection_error
+from .clients import get_chroma_client
+from .startup import PROFILE
+from .background_writer import BackgroundWriter
+from .tool_executor import ToolProcessPool
+from .llm_scheduler import LLMScheduler
+from .llm_pool import acompletion, has_dedicated_pool
+from .loop_guard import ToolLoopGuard, READ_ONLY_TOOLS
+from .tool_output_store import ToolOutputStore, READ_TOOL_OUTPUT_DEFINITION
+from .session_tape import SessionTape, SESSION_RECORD_FILE, attach_recorder
+from .llm_usage import usage_context, set_usage_context, flush_pending
+from .session_state import SessionStateStore
+from . import tracing
+from ..prompts import get_persona_prompt, DEFAULT_TONES, generate_tone_prompt_template
 import re
 
 # ... [imports]
@@ -25,70 +40,79 @@ SERVER_SCRIPT = BASE_DIR / "backend" / "scripts" / "filesystem_server.py"
 TOOLS_DIR = BASE_DIR / "tools"
 TOOL_DEFINITIONS_FILE = BASE_DIR / "tool_definitions.json"
 
-CHROMA_HOST = "localhost"
-CHROMA_PORT = 8000
+# Threads used to construct the services (each opens connections or seeds collections); 1 = sequential
+STARTUP_INIT_WORKERS = int(os.getenv("STARTUP_INIT_WORKERS", "8"))
 
 class PromptManager:
-    def __init__(self, semantic_memory, mode_manager, tone_manager):
-        self.mode = "Work" # Default mode
-        self.persona = "Generalist" # Default persona
-        self.tone = "Professional" # Default tone
+    """
+    Builds system prompts from per-user session state (mode, persona, tone).
+    Holds no per-user state itself, so any API worker can serve any user.
+    """
+
+    def __init__(self, semantic_memory, mode_manager, tone_manager, session_store):
         self.semantic_memory = semantic_memory
         self.mode_manager = mode_manager
         self.tone_manager = tone_manager
-    
-    def set_mode(self, mode):
+        self.session_store = session_store
+
+    def get_state(self, user_id):
+        return self.session_store.get(user_id)
+
+    def set_mode(self, user_id, mode):
         # Check against DB modes
         mode_doc = self.mode_manager.get_mode(mode)
         if mode_doc:
-            self.mode = mode
+            self.session_store.update(user_id, mode=mode)
             return f"Mode switched to: {mode}"
         return f"Invalid mode. Available: {', '.join([m['name'] for m in self.mode_manager.get_all_modes()])}"
 
-    def set_persona(self, persona):
+    def set_persona(self, user_id, persona):
         from ..prompts import PERSONAS
         if persona in PERSONAS:
-            self.persona = persona
+            self.session_store.update(user_id, persona=persona)
             return f"Persona switched to: {persona}"
         return f"Invalid persona. Available: {list(PERSONAS.keys())}"
 
-    def set_tone(self, tone):
+    def set_tone(self, user_id, tone):
         # Check against DB
         tone_doc = self.tone_manager.get_tone(tone)
         if tone_doc:
-            self.tone = tone
+            self.session_store.update(user_id, tone=tone)
             return f"Tone switched to: {tone}"
         # Check defaults if DB fails?
         if tone in DEFAULT_TONES:
-             self.tone = tone
+             self.session_store.update(user_id, tone=tone)
              return f"Tone switched to: {tone} (Default)"
              
         return f"Invalid tone. Available: {', '.join([t['name'] for t in self.tone_manager.get_all_tones()])}"
 
-    def get_system_prompt(self, user_id="default"):
+    def get_system_prompt(self, user_id="default", state=None):
+        # state: the turn's snapshot of the user's session state (read here if not given)
+        state = state or self.get_state(user_id)
+        mode, persona, tone = state["mode"], state["persona"], state["tone"]
         relevant_facts = []
         # Strict isolation: Only get facts for the current mode
-        relevant_facts.extend(self.semantic_memory.get_all_facts(mode=self.mode, user_id=user_id))
+        relevant_facts.extend(self.semantic_memory.get_all_facts(mode=mode, user_id=user_id))
         
         relevant_facts = list(set([f['fact'] for f in relevant_facts])) # Extract fact strings
 
         # Get Tone Prompt
-        tone_doc = self.tone_manager.get_tone(self.tone)
+        tone_doc = self.tone_manager.get_tone(tone)
         if tone_doc:
              tone_prompt = generate_tone_prompt_template(tone_doc["name"], tone_doc["description"])
         else:
-             tone_prompt = DEFAULT_TONES.get(self.tone, DEFAULT_TONES["Professional"])
+             tone_prompt = DEFAULT_TONES.get(tone, DEFAULT_TONES["Professional"])
 
         prompt = f"""
-{get_persona_prompt(self.persona)}
+{get_persona_prompt(persona)}
 
 {tone_prompt}
 
 [CURRENT_MODE]
-Current Mode: {self.mode}
+Current Mode: {mode}
 (In Work mode, focus on productivity and technical tasks. In Personal mode, be more casual and focus on personal interests.)
 
-[RELEVANT_MEMORIES ({self.mode})]
+[RELEVANT_MEMORIES ({mode})]
 {chr(10).join("- " + f for f in relevant_facts) if relevant_facts else "No relevant memories found."}
 
 [INSTRUCTIONS]
@@ -104,106 +128,348 @@ Waiting for input...
 """
         return prompt
 
+def init_services(target, factories):
+    """
+    Constructs the services that connect to Mongo/Chroma/Redis in parallel and sets them
+    as attributes of target. They are independent of each other and share the
+    process-wide clients (see clients.py).
+    """
+    with ThreadPoolExecutor(max_workers=STARTUP_INIT_WORKERS, thread_name_prefix="orchestrator-init") as pool:
+        futures = {name: pool.submit(PROFILE.run, f"init:{name}", factory) for name, factory in factories.items()}
+        for name, future in futures.items():
+            setattr(target, name, future.result())
+    # Mode settings changed on another worker are picked up through the same Redis
+    target.mode_manager.redis = target.session_store.redis
+
+
+class ApiServices:
+    """
+    What the API process needs when chat turns run on Celery orchestrator workers
+    (CHAT_EXECUTION=celery): session state, modes, tones and memory for the settings
+    and memory endpoints. No tool index, tool pool, MCP session or LLM scheduler.
+    """
+
+    runs_turns = False
+
+    def __init__(self):
+        init_services(self, {
+            "episodic_memory": EpisodicMemory,
+            "semantic_memory": SemanticMemory,
+            "mode_manager": ModeManager,
+            "tone_manager": ToneManager,
+            "chat_service": ChatService,
+            "session_store": SessionStateStore.from_env,
+        })
+        self.prompt_manager = PromptManager(self.semantic_memory, self.mode_manager, self.tone_manager, self.session_store)
+
+    async def stop(self):
+        pass # Only the shared clients, closed with the process
+
+
 class JarvisOrchestrator:
+    runs_turns = True
+
     def __init__(self):
-        self.episodic_memory = EpisodicMemory()
-        self.semantic_memory = SemanticMemory()
-        self.mode_manager = ModeManager()
-        self.tone_manager = ToneManager()
-        self.chat_service = ChatService()
-        self.prompt_manager = PromptManager(self.semantic_memory, self.mode_manager, self.tone_manager)
-        self.tool_creator = ToolCreator()
-        self.tool_creator = ToolCreator()
-        self.document_manager = DocumentManager()
-        self.file_monitor = FileMonitorService()
-        self.tool_collection = None
+        self.chroma_client = None
+        self._init_services()
+        self.prompt_manager = PromptManager(self.semantic_memory, self.mode_manager, self.tone_manager, self.session_store)
         self.session = None
         self.read_stream = None
         self.write_stream = None
         self.exit_stack = None
         # self.messages = [] # REMOVED: History is now stateless per request
         self.real_tool_names = set()
+        self.read_only_mcp_tools = set() # MCP tools annotated with readOnlyHint
         self.helper_tools = self._define_internal_tools()
-        self.dynamic_tools = {} # Registry for hot-loaded tools
-        self.dynamic_tool_definitions = [] # Definitions for hot-loaded tools
-        
-        # Initialize Tool DB Client
+        self.background_tasks = set() # Strong refs so fire-and-forget tasks aren't GC'd
+        self.active_turns = {} # (user_id, chat_id) -> in-flight chat turn task
+        self.llm_scheduler = LLMScheduler() # Shared LLM backend: concurrency cap + fair queuing
+        self.loop_stats = Counter() # Aggregated ToolLoopGuard counters across chat turns
+        self.llm_completion = acompletion # Swapped out by the session recorder / replay harness
+        self.session_tape = None
+        self.background_writer = BackgroundWriter() # Post-response persistence off the critical path
+        self.tool_registry = ToolRegistry(TOOL_DEFINITIONS_FILE, TOOLS_DIR) # Lazily-imported generated tools
+        self.tool_pool = ToolProcessPool(TOOL_DEFINITIONS_FILE, TOOLS_DIR) # Sandboxed workers for dynamic tools
+        # Shares the tool index version with other workers, so their retrieval caches drop too
+        self.tool_retriever = ToolRetriever(self.tool_collection, redis_client=self.session_store.redis)
+            
+        with PROFILE.phase("init:tool_index"):
+            self._load_all_existing_tools()
+
+    def _init_services(self):
+        init_services(self, {
+            "episodic_memory": EpisodicMemory,
+            "semantic_memory": SemanticMemory,
+            "mode_manager": ModeManager,
+            "tone_manager": ToneManager,
+            "chat_service": ChatService,
+            "session_store": SessionStateStore.from_env,
+            "tool_creator": ToolCreator,
+            "document_manager": DocumentManager,
+            "file_monitor": FileMonitorService,
+            "tool_output_store": ToolOutputStore, # Large tool outputs, paged via read_tool_output
+            "tool_collection": self._connect_tool_collection,
+        })
+
+    def _connect_tool_collection(self):
         try:
             print("Connecting to ChromaDB for Tools...")
-            self.chroma_client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
-            self.tool_collection = self.chroma_client.get_or_create_collection("tools")
+            self.chroma_client = get_chroma_client()
+            collection = self.chroma_client.get_or_create_collection("tools")
             print("Connected to ChromaDB 'tools' collection.")
+            return collection
         except Exception as e:
             print(f"Warning: Could not connect to ChromaDB for tools: {e}")
-            self.tool_collection = None
-            
-        self._load_all_existing_tools()
+            return None
 
     def _load_all_existing_tools(self):
         """
-        Loads all tools defined in tool_definitions.json on startup and indexes them.
+        Registers all tools defined in tool_definitions.json on startup and indexes them.
+        Modules are NOT imported here; the registry imports them on first invocation.
         """
-        if not TOOL_DEFINITIONS_FILE.exists():
-            print("Warning: tool_definitions.json not found.", flush=True)
-            return
+        tool_defs = self.tool_registry.load_definitions()
 
-        try:
-            with open(TOOL_DEFINITIONS_FILE, "r") as f:
-                defs = json.load(f)
-            
-            for tool_def in defs:
-                name = tool_def["name"]
-                filename = tool_def["filename"]
-                file_path = TOOLS_DIR / filename
-                
-                if not file_path.exists():
-                    print(f"Warning: Tool file {file_path} not found for {name}", flush=True)
-                    continue
-                    
-                # Load module
+        # Index in ChromaDB (only new/changed tools are re-embedded)
+        if self.tool_collection:
+            try:
+                stats = sync_tool_index(self.tool_collection, tool_defs)
+                print(f"DEBUG: Tool index sync: {stats}", flush=True)
+                if stats["upserted"] or stats["deleted"]:
+                    self.tool_retriever.invalidate()
+            except Exception as idx_err:
+                print(f"Error indexing tools: {idx_err}", flush=True)
+
+    def _llm_slot(self, user_id, priority, task):
+        """
+        Scheduler slot for a call to the main LLM. Tasks routed to their own
+        backends (e.g. a small title model) don't compete for it.
+        """
+        if has_dedicated_pool(task):
+            return nullcontext()
+        return self.llm_scheduler.slot(user_id, priority=priority)
+
+    async def _execute_tool(self, function_name, function_args, user_id, chat_id, current_mode, current_tool_definitions):
+        """
+        Runs one tool call and returns its result as a string. create_tool appends the
+        new tool to current_tool_definitions so it is available on the next turn.
+        """
+        result_content = ""
+
+        if function_name == "read_tool_output":
+            print(f"Executing INTERNAL tool: {function_name}")
+            result_content = await asyncio.to_thread(
+                self.tool_output_store.read,
+                chat_id, function_args.get("handle", ""), function_args.get("offset", 0), function_args.get("length")
+            )
+
+        elif function_name == "save_fact":
+            print(f"Executing INTERNAL tool: {function_name}")
+            target_mode = function_args.get("mode", current_mode)
+            result_content = self.semantic_memory.save_fact(function_args["fact"], mode=target_mode, user_id=user_id)
+
+        elif function_name == "edit_memory":
+            print(f"Executing INTERNAL tool: {function_name}")
+            old_content = function_args.get("old_content")
+            new_content = function_args.get("new_content")
+
+            # Search for candidates
+            candidates = self.semantic_memory.search_facts(old_content, mode=current_mode, user_id=user_id)
+
+            if not candidates:
+                 result_content = f"No memory found matching '{old_content}' in {current_mode} mode."
+            elif len(candidates) == 1:
+                 success = self.semantic_memory.update_fact(candidates[0]['id'], new_content)
+                 result_content = f"Memory updated: '{candidates[0]['fact']}' -> '{new_content}'" if success else "Error updating memory."
+            else:
+                 # Multiple matches
+                 result_content = f"Multiple memories found matching '{old_content}'. Please be more specific. Matches: " + ", ".join([f"'{c['fact']}'" for c in candidates])
+
+        elif function_name == "set_mode":
+            print(f"Executing INTERNAL tool: {function_name}")
+            result_content = self.prompt_manager.set_mode(user_id, function_args["mode"])
+            # Determine if we need to update system prompt for next turn?
+            # For simplicity, we keep current prompt but the tool result says mode changed.
+
+        elif function_name == "delete_mode":
+            print(f"Executing INTERNAL tool: {function_name}")
+            mode_del = function_args["mode"]
+            sem_del = self.semantic_memory.delete_mode(mode_del, user_id=user_id)
+            epi_del = self.episodic_memory.delete_mode_memory(mode_del, user_id=user_id)
+            result_content = f"Deleted mode '{mode_del}' for user {user_id}. Semantic: {sem_del}, Episodic: {epi_del}"
+            if self.prompt_manager.get_state(user_id)["mode"] == mode_del:
+                self.prompt_manager.set_mode(user_id, "Work")
+                result_content += ". Switched to 'Work'."
+
+        elif function_name == "switch_persona":
+            print(f"Executing INTERNAL tool: {function_name}")
+            result_content = self.prompt_manager.set_persona(user_id, function_args["persona"])
+
+        elif function_name in ["read_pdf", "read_docx", "read_image", "read_text_file"]:
+            print(f"Executing INTERNAL tool: {function_name}")
+            result_content = self.document_manager.ingest_file(function_args["file_path"])
+
+        elif function_name == "create_tool":
+            print(f"Executing CREATION tool: {function_name}")
+            result = self.tool_creator.create_tool(function_args["tool_name"], function_args["description"])
+
+            if isinstance(result, dict) and result.get("status") == "success":
+                result_content = result["message"]
+                tool_name_created = result["tool_name"]
+                file_path = result["file_path"]
+
+                # Dynamic Load
+                if self._load_dynamic_tool(tool_name_created, file_path):
+                     result_content += f"\nTool '{tool_name_created}' hot-loaded and ready."
+                     # UPDATE current_tool_definitions for the next turn
+                     new_def = self.tool_registry.get_definition(tool_name_created)
+                     if new_def and not any(t['function']['name'] == tool_name_created for t in current_tool_definitions):
+                         current_tool_definitions.append(new_def)
+            else:
+                result_content = str(result)
+
+        elif function_name in self.tool_registry:
+            print(f"Executing DYNAMIC tool: {function_name}")
+            self.tool_retriever.record_usage(function_name)
+            try:
+                if self.tool_pool.enabled:
+                    # Out of process, with timeout and resource limits
+                    result_content = await self.tool_pool.run(
+                        function_name, self.tool_registry.tool_defs[function_name], function_args
+                    )
+                else:
+                    func = self.tool_registry.get_function(function_name)
+                    result_content = str(func(**function_args))
+            except ToolLoadError as e:
+                result_content = f"Error loading tool {function_name}: {e}"
+            except Exception as e:
+                result_content = f"Error executing tool {function_name}: {e}"
+
+        elif function_name in self.real_tool_names:
+            print(f"Executing REAL tool: {function_name}")
+            result = await self.session.call_tool(function_name, function_args)
+            result_content = str(result.content)
+
+        elif function_name == "create_new_mode":
+            print(f"Executing INTERNAL tool: {function_name}")
+            res = self.mode_manager.create_mode(
+                function_args["name"], 
+                function_args.get("description", ""), 
+                function_args.get("allowed_tools", ["*"])
+            )
+            result_content = str(res)
+
+
+        elif function_name == "list_files":
+            print(f"Executing FILE tool: {function_name}")
+            try:
+                path = function_args["path"]
+                if os.path.exists(path):
+                    files = os.listdir(path)
+                    result_content = f"Files in {path}:\n" + "\n".join(files)
+                else:
+                    result_content = f"Path not found: {path}"
+            except Exception as e:
+                result_content = f"Error listing files: {str(e)}"
+
+        elif function_name == "read_file":
+            print(f"Executing FILE tool: {function_name}")
+            try:
+                # Use DocumentManager for smarter reading? Or just plain text.
+                # DocumentManager is more for "indexing". Here we want raw content for editing.
+                with open(function_args["path"], "r", encoding="utf-8") as f:
+                    result_content = f.read()
+            except Exception as e:
+                result_content = f"Error reading file: {str(e)}"
+
+        elif function_name == "write_file":
+            print(f"Executing FILE tool: {function_name}")
+            try:
+                path = function_args["path"]
+                content = function_args["content"]
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                result_content = f"Successfully wrote to {path}"
+            except Exception as e:
+                result_content = f"Error writing file: {str(e)}"
+
+        elif function_name == "delete_file":
+            print(f"Executing FILE tool: {function_name}")
+            try:
+                path = function_args["path"]
+                if os.path.isdir(path):
+                    os.rmdir(path)
+                    result_content = f"Deleted directory: {path}"
+                else:
+                    os.remove(path)
+                    result_content = f"Deleted file: {path}"
+            except Exception as e:
+                result_content = f"Error deleting: {str(e)}"
+
+        elif function_name == "run_shell_command":
+            print(f"Executing FILE tool: {function_name}")
+            try:
+                import subprocess
+                cmd = function_args["command"]
+                cwd = function_args["cwd"]
+                # Basic safety check: ensure cwd is within a monitored directory?
+                # For now, we trust the agent as requested "complete access".
+
+                proc = subprocess.run(cmd, cwd=cwd, shell=True, capture_output=True, text=True, timeout=30)
+                result_content = f"Stdout:\n{proc.stdout}\nStderr:\n{proc.stderr}"
+            except Exception as e:
+                result_content = f"Error running command: {str(e)}"
+
+        else:
+            print(f"Simulating MOCK tool: {function_name}")
+            result_content = f"Mock success: {function_name} executed with {function_args}"
+
+        return result_content
+
+    async def _call_llm(self, user_id, priority, task, turn=None, **kwargs):
+        """
+        One LLM call: waits for a scheduler slot, then calls the model routed for the task.
+        Traced as an llm_call span with queue time and token counts.
+        """
+        with tracing.span("llm_call", task=task) as llm_span:
+            if turn is not None:
+                llm_span.set(turn=turn)
+            waiting_since = time.perf_counter()
+            async with self._llm_slot(user_id, priority, task):
+                llm_span.set(queue_ms=round((time.perf_counter() - waiting_since) * 1000, 2))
                 try:
-                    spec = importlib.util.spec_from_file_location(name, str(file_path))
-                    if spec and spec.loader:
-                        module = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(module)
-                        
-                        if hasattr(module, name):
-                            func = getattr(module, name)
-                            self.dynamic_tools[name] = func
-                            
-                            # Add definition
-                            tool_definition_struct = {
-                                "type": "function",
-                                "function": {
-                                    "name": name,
-                                    "description": tool_def["description"],
-                                    "parameters": tool_def["inputSchema"]
-                                }
-                            }
-                            self.dynamic_tool_definitions.append(tool_definition_struct)
-                            
-                            # Index in ChromaDB
-                            if self.tool_collection:
-                                try:
-                                    # Use description + name as document content
-                                    doc_content = f"{name}: {tool_def['description']}"
-                                    self.tool_collection.upsert(
-                                        ids=[name],
-                                        documents=[doc_content],
-                                        metadatas=[{"json": json.dumps(tool_def)}]
-                                    )
-                                    print(f"DEBUG: Indexed tool '{name}' in ChromaDB", flush=True)
-                                except Exception as idx_err:
-                                    print(f"Error indexing tool {name}: {idx_err}", flush=True)
-                                    
-                            print(f"DEBUG: Loaded existing tool '{name}'", flush=True)
-                        else:
-                            print(f"Error: Function {name} not found in {filename}", flush=True)
-                except Exception as e:
-                    print(f"Error loading tool {name}: {e}", flush=True)
-                    
-        except Exception as e:
-            print(f"Error reading tool definitions: {e}", flush=True)
+                    with usage_context(turn=turn):
+                        response = await self.llm_completion(task=task, **kwargs)
+                except Exception:
+                    tracing.LLM_CALLS.inc(task=task, status="error")
+                    raise
+            tracing.record_llm_response(llm_span, task, response)
+            return response
+
+    def _read_only_tools(self):
+        """
+        Tools whose repeated calls may be answered from cache: the internal read-only ones,
+        dynamic tools with "read_only": true in tool_definitions.json and MCP tools
+        annotated readOnlyHint. Everything else is treated as state-changing.
+        """
+        dynamic = {name for name, tool_def in self.tool_registry.tool_defs.items() if tool_def.get("read_only")}
+        return READ_ONLY_TOOLS | dynamic | self.read_only_mcp_tools
+
+    def _record_loop_stats(self, loop_guard):
+        self.loop_stats["sequences"] += 1
+        self.loop_stats["stopped_early"] += int(loop_guard.should_stop)
+        for key in ("calls", "repeats", "cache_hits", "malformed"):
+            self.loop_stats[key] += loop_guard.counters[key]
+
+    def _spawn_background(self, coro):
+        """
+        Runs a coroutine as a fire-and-forget task that does not delay the response.
+        """
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        if self.session_tape is not None:
+            self.session_tape.track_task(task)
+        return task
 
     def _sanitize_response(self, text):
         """
@@ -452,62 +718,63 @@ class JarvisOrchestrator:
                          "required": ["command", "cwd"]
                      }
                 }
-            }
+            },
+            READ_TOOL_OUTPUT_DEFINITION
         ]
 
     def _load_dynamic_tool(self, tool_name, file_path):
         """
-        Dynamically loads a tool from a file path and registers it.
+        Hot-loads a freshly created tool: registers its definition and imports it
+        right away so creation errors surface immediately.
         """
         try:
-            spec = importlib.util.spec_from_file_location(tool_name, file_path)
-            if spec and spec.loader:
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                if hasattr(module, tool_name):
-                    func = getattr(module, tool_name)
-                    self.dynamic_tools[tool_name] = func
-                    
-                    # Update definitions
-                    # We read the file from disk to get the definition
-                    # The tool_creator saves it to tool_definitions.json
-                    # We can find it there.
-                    try:
-                        defs_path = TOOL_DEFINITIONS_FILE
-                        if defs_path.exists():
-                            with open(defs_path, "r") as f:
-                                defs = json.load(f)
-                                for d in defs:
-                                    if d["name"] == tool_name:
-                                        # Check if already exists to avoid duplicates
-                                        if not any(td["function"]["name"] == tool_name for td in self.dynamic_tool_definitions):
-                                            self.dynamic_tool_definitions.append({
-                                                "type": "function",
-                                                "function": {
-                                                    "name": d["name"],
-                                                    "description": d["description"],
-                                                    "parameters": d["inputSchema"]
-                                                }
-                                            })
-                                        break
-                    except Exception as ex:
-                        print(f"Error loading definition for {tool_name}: {ex}")
-
-                    print(f"DEBUG: Dynamically loaded tool '{tool_name}'")
-                    return True
+            tool_def = next((d for d in self.tool_registry.read_definitions() if d["name"] == tool_name), None)
+            if tool_def is None:
+                # The tool_creator saves it to tool_definitions.json before we get here
+                print(f"Error loading definition for {tool_name}: not found in tool_definitions.json")
+                return False
+            if not self.tool_registry.register(tool_def):
+                return False
+            self.tool_registry.get_function(tool_name)
+
+            # Make the new tool retrievable without waiting for a restart
+            if self.tool_collection:
+                try:
+                    sync_tool_index(self.tool_collection, [tool_def], prune=False)
+                    self.tool_retriever.invalidate()
+                except Exception as idx_err:
+                    print(f"Error indexing tool {tool_name}: {idx_err}")
+            print(f"DEBUG: Dynamically loaded tool '{tool_name}'")
+            return True
         except Exception as e:
             print(f"Error loading dynamic tool {tool_name}: {e}")
             return False
-        return False
 
     async def start(self):
         print("DEBUG: Starting Jarvis Orchestrator...", flush=True)
-        # ChromaDB client is now initialized in __init__
-        
+        await self.background_writer.start()
+        # Tool workers and the MCP server are separate processes; start them side by side
+        await asyncio.gather(self._start_tool_pool(), self._connect_mcp())
+
+        if SESSION_RECORD_FILE:
+            self.session_tape = SessionTape(SESSION_RECORD_FILE)
+            attach_recorder(self, self.session_tape)
+            print(f"Recording chat turns to {SESSION_RECORD_FILE}")
+
+    async def _start_tool_pool(self):
+        with PROFILE.phase("start:tool_pool"):
+            await self.tool_pool.start()
+
+    async def _connect_mcp(self):
+        with PROFILE.phase("start:mcp"):
+            await self._connect_mcp_session()
+
+    async def _connect_mcp_session(self):
+        mcp = PROFILE.import_module("mcp")
+        mcp_stdio = PROFILE.import_module("mcp.client.stdio")
         env = os.environ.copy()
         env["PYTHONUNBUFFERED"] = "1"
-        server_params = StdioServerParameters(
+        server_params = mcp.StdioServerParameters(
             command=sys.executable,
             args=[str(SERVER_SCRIPT)], 
             env=env, 
@@ -516,26 +783,133 @@ class JarvisOrchestrator:
         from contextlib import AsyncExitStack
         self.exit_stack = AsyncExitStack()
         
-        stdio_ctx = stdio_client(server_params)
+        stdio_ctx = mcp_stdio.stdio_client(server_params)
         self.read_stream, self.write_stream = await self.exit_stack.enter_async_context(stdio_ctx)
         
-        self.session = ClientSession(self.read_stream, self.write_stream)
+        self.session = mcp.ClientSession(self.read_stream, self.write_stream)
         await self.exit_stack.enter_async_context(self.session)
         
         await self.session.initialize()
         
         mcp_tools_list = await self.session.list_tools()
         self.real_tool_names = {t.name for t in mcp_tools_list.tools}
+        self.read_only_mcp_tools = {
+            t.name for t in mcp_tools_list.tools
+            if getattr(getattr(t, "annotations", None), "readOnlyHint", False)
+        }
         print(f"Connected to MCP Server. Real tools: {list(self.real_tool_names)}")
 
     async def stop(self):
+        await self.background_writer.stop()
+        await self.tool_pool.stop()
+        await asyncio.to_thread(flush_pending)
         if self.exit_stack:
             await self.exit_stack.aclose()
 
-    async def process_message(self, user_input: str, user_id: str, chat_id: str):
+    def start_turn(self, user_input: str, user_id: str, chat_id: str, listener=None):
+        """
+        Runs a chat turn as a cancellable task registered under (user_id, chat_id).
+        listener(event, data), if given, is called with progress events (see _emit).
+        Raises SchedulerSaturated if the LLM queue is full.
+        """
+        # Raises SchedulerSaturated (-> 429) before any work is done
+        self.llm_scheduler.admit(user_id)
+
+        key = (user_id, chat_id)
+        task = asyncio.create_task(self._run_turn(user_input, user_id, chat_id, listener))
+        self.active_turns[key] = task
+
+        def _unregister(t):
+            if self.active_turns.get(key) is t:
+                del self.active_turns[key]
+        task.add_done_callback(_unregister)
+        return task
+
+    def cancel_turn(self, user_id: str, chat_id: str):
+        """
+        Cancels the in-flight turn for a chat (pending LLM call and running tools).
+        Returns False if nothing was running.
+        """
+        task = self.active_turns.get((user_id, chat_id))
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def _run_turn(self, user_input, user_id, chat_id, listener=None):
+        with tracing.trace("chat_turn", user_id=user_id, chat_id=chat_id):
+            try:
+                response = await self._run_turn_untraced(user_input, user_id, chat_id, listener)
+            except asyncio.CancelledError:
+                tracing.CHAT_TURNS.inc(status="cancelled")
+                raise
+            except Exception:
+                tracing.CHAT_TURNS.inc(status="error")
+                raise
+            tracing.CHAT_TURNS.inc(status="ok")
+            return response
+
+    async def _run_turn_untraced(self, user_input, user_id, chat_id, listener=None):
+        turn_state = {"partial_text": "", "tools_run": [], "listener": listener}
+        if self.session_tape is not None:
+            return await self._record_turn(user_input, user_id, chat_id, turn_state)
+        try:
+            return await self.process_message(user_input, user_id, chat_id, turn_state=turn_state)
+        except asyncio.CancelledError:
+            # Keep the transcript consistent: the user message is already stored,
+            # so record what the assistant had produced before it was cancelled.
+            print(f"DEBUG: Turn cancelled for chat {chat_id}")
+            partial = "[Cancelled before completion]"
+            if turn_state["tools_run"]:
+                partial += f"\nTools run: {', '.join(turn_state['tools_run'])}"
+            if turn_state["partial_text"]:
+                partial += f"\n{turn_state['partial_text']}"
+            # Written before the next turn can start, like a completed reply (see process_message);
+            # shielded so a second cancellation doesn't abandon the write
+            await asyncio.shield(asyncio.to_thread(self.chat_service.add_message, chat_id, user_id, "assistant", partial))
+            raise
+
+    async def _record_turn(self, user_input, user_id, chat_id, turn_state):
+        """
+        Runs a turn while the session recorder is on and saves it to the tape.
+        """
+        self.session_tape.begin_turn(user_input, user_id, chat_id, tool_defs=self.tool_registry.tool_defs)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self.process_message(user_input, user_id, chat_id, turn_state=turn_state)
+            # The chat title is generated in the background but belongs to this turn
+            await self.session_tape.wait_background()
+            return response
+        finally:
+            self.session_tape.end_turn(response, (time.perf_counter() - started) * 1000)
+            await asyncio.to_thread(self.session_tape.save)
+
+    @staticmethod
+    def _emit(turn_state, event, **data):
+        """
+        Reports turn progress ("thinking", "tool_start", "tool_end") to the turn's listener, if any.
+        """
+        listener = turn_state.get("listener")
+        if listener is None:
+            return
+        try:
+            listener(event, data)
+        except Exception as e:
+            print(f"Turn listener failed on '{event}': {e}")
+
+    async def process_message(self, user_input: str, user_id: str, chat_id: str, turn_state=None):
+        # turn_state (optional) is updated as the turn progresses so a cancelled turn can be persisted
+        if turn_state is None:
+            turn_state = {"partial_text": "", "tools_run": []}
         # Update System Prompt Dynamically
-        current_mode = self.prompt_manager.mode
-        system_prompt = self.prompt_manager.get_system_prompt(user_id=user_id)
+        # One snapshot of the user's session state for the whole turn
+        with tracing.span("session_state"):
+            session_state = self.prompt_manager.get_state(user_id)
+        current_mode = session_state["mode"]
+        # Attributes every LLM call of this turn (and its background title task) in the usage log
+        set_usage_context(user_id=user_id, chat_id=chat_id, mode=current_mode, persona=session_state["persona"])
+        system_prompt = self.prompt_manager.get_system_prompt(user_id=user_id, state=session_state)
         
         system_prompt += """
 [TOOL_CREATION]
@@ -547,7 +921,8 @@ After creating a tool, it will be auto-loaded and available immediately.
 """
         
         # 1. Fetch Chat History (STATELESS)
-        chat_doc = self.chat_service.get_chat(chat_id, user_id)
+        with tracing.span("history_load"):
+            chat_doc = self.chat_service.get_chat(chat_id, user_id)
         current_history = []
         if chat_doc:
             # Convert DB messages to LLM format
@@ -565,10 +940,11 @@ After creating a tool, it will be auto-loaded and available immediately.
             # --- FEATURE: Dynamic Chat Naming & Proactive Tool Loading ---
             # If this is the FIRST message in the chat (check original length)
             if len(chat_doc.get("messages", [])) == 0:
-                # 1. Generate Title
-                await self._generate_chat_title(user_input, chat_id, user_id)
-                # 2. Suggest Tools (Wait for it so we can use it in this turn)
-                suggested_tools = await self._suggest_tools(user_input, chat_id, user_id)
+                # 1. Generate Title (background task, off the critical path)
+                self._spawn_background(self._generate_chat_title(user_input, chat_id, user_id))
+                # 2. Suggest Tools from the tool index (no LLM call, used in this turn)
+                with tracing.span("tool_suggestion"):
+                    suggested_tools = self._suggest_tools(user_input, chat_id, user_id, mode=current_mode)
                 # Update local doc reference for this run
                 chat_doc["suggested_tools"] = suggested_tools
         else:
@@ -577,10 +953,15 @@ After creating a tool, it will be auto-loaded and available immediately.
             # Create it implicitly if missing? For now just log.
 
         # Add episodic context (Partitioned by MODE and USER)
-        relevant_episodes = self.episodic_memory.search_episodes(user_input, mode=current_mode, n=2, user_id=user_id)
+        with tracing.span("episodic_search"):
+            relevant_episodes = self.episodic_memory.search_episodes(
+                user_input, mode=current_mode, n=2, user_id=user_id,
+                ranking=self.mode_manager.get_episode_ranking(current_mode)
+            )
         
         # DOCUMENT SEARCH (RAG)
-        relevant_docs = self.document_manager.search_documents(user_input)
+        with tracing.span("document_search"):
+            relevant_docs = self.document_manager.search_documents(user_input)
         
         context_msg = ""
         
@@ -601,10 +982,12 @@ After creating a tool, it will be auto-loaded and available immediately.
         
         # STATE REMINDER: Force priority of Semantic Memory over Chat History
         # We re-fetch facts to ensure we have the absolute latest state
-        active_facts = self.semantic_memory.get_all_facts(mode=current_mode, user_id=user_id)
+        with tracing.span("fact_fetch"):
+            active_facts = self.semantic_memory.get_all_facts(mode=current_mode, user_id=user_id)
         fact_strings = [f['fact'] for f in active_facts]
         
-        file_context = self.file_monitor.get_monitored_context()
+        with tracing.span("file_context"):
+            file_context = self.file_monitor.get_monitored_context()
         if file_context:
             file_context = f"\n[FILE SYSTEM CONTEXT]\n{file_context}"
         
@@ -622,79 +1005,81 @@ Active Memories:
         payload_messages.append({"role": "user", "content": user_input + context_msg + state_reminder})
 
         # Save USER message to DB immediately (Without the hidden prompts)
-        self.chat_service.add_message(chat_id, user_id, "user", user_input)
+        with tracing.span("user_message_save"):
+            await asyncio.to_thread(self.chat_service.add_message, chat_id, user_id, "user", user_input)
 
         # Tool Definitions
         # Start with core helper tools (create_tool, save_fact, etc.)
         current_tool_definitions = self.helper_tools.copy()
 
         # --- MODE RESTRICTION LOGIC ---
-        mode_doc = self.mode_manager.get_mode(current_mode)
-        allowed_tools = mode_doc.get("allowed_tools", ["*"]) if mode_doc else ["*"]
+        # None means the mode allows every tool
+        allowed_tools = self.mode_manager.get_allowed_tools(current_mode)
+
+        def is_allowed(name):
+            return allowed_tools is None or name in allowed_tools
         
         # If not wild card, filter base helpers
-        if "*" not in allowed_tools:
+        if allowed_tools is not None:
             # We ALWAYS allow 'set_mode', 'create_new_mode' to avoid locking out, 
             # and maybe 'save_fact'? Let's trust the configured list but force criticals.
-            critical_tools = ["set_mode", "create_new_mode", "create_tool"] 
+            critical_tools = ["set_mode", "create_new_mode", "create_tool", "read_tool_output"]
             # Only keep tools that are in allowed list OR critical
             current_tool_definitions = [
                 t for t in current_tool_definitions 
-                if t["function"]["name"] in allowed_tools or t["function"]["name"] in critical_tools
+                if is_allowed(t["function"]["name"]) or t["function"]["name"] in critical_tools
             ]
 
-        # Dynamic Retrieval from ChromaDB
+        # Dynamic Retrieval from ChromaDB (restricted to the mode's tools inside the query)
         if self.tool_collection is not None:
             print(f"DEBUG: Retrieving tools for query: '{user_input}'")
             try:
-                results = self.tool_collection.query(
-                    query_texts=[user_input],
-                    n_results=5 # Retrieve top 5 relevant tools
-                )
-                
-                if results['ids'] and results['ids'][0]:
-                    print(f"DEBUG: Retrieved tools: {results['ids'][0]}")
-                    for i, json_str in enumerate(results['metadatas'][0]):
-                        try:
-                            tool_def = json.loads(json_str['json'])
-                            # Ensure we don't duplicate if it's somehow already in helpers (unlikely)
-                            if not any(t['function']['name'] == tool_def['name'] for t in current_tool_definitions):
-                                # FILTER DYNAMIC TOOLS TOO
-                                if "*" in allowed_tools or tool_def["name"] in allowed_tools:
-                                    current_tool_definitions.append({
-                                        "type": "function",
-                                        "function": {
-                                            "name": tool_def["name"],
-                                            "description": tool_def["description"],
-                                            "parameters": tool_def["inputSchema"]
-                                        }
-                                    })
-                        except Exception as e:
-                            print(f"Error parsing tool metadata: {e}")
+                with tracing.span("tool_retrieval"):
+                    retrieved_tools = self.tool_retriever.retrieve(user_input, allowed_tools=allowed_tools, n_results=5)
+                for tool_def in retrieved_tools:
+                    # Ensure we don't duplicate if it's somehow already in helpers (unlikely)
+                    if not any(t['function']['name'] == tool_def['name'] for t in current_tool_definitions):
+                        current_tool_definitions.append({
+                            "type": "function",
+                            "function": {
+                                "name": tool_def["name"],
+                                "description": tool_def["description"],
+                                "parameters": tool_def["inputSchema"]
+                            }
+                        })
             except Exception as e:
                 print(f"Error querying tools: {e}")
+                if is_connection_error(e):
+                    # Degraded: Chroma unreachable (or its circuit is open); offer every allowed tool like below
+                    current_tool_definitions.extend(
+                        d for d in self.tool_registry.definitions
+                        if is_allowed(d["function"]["name"])
+                        and not any(t["function"]["name"] == d["function"]["name"] for t in current_tool_definitions)
+                    )
+        else:
+            print("Warning: Tool DB unavailable, falling back to ALL tools.")
+            current_tool_definitions.extend(
+                d for d in self.tool_registry.definitions if is_allowed(d["function"]["name"])
+            )
         
         # --- FEATURE: Proactive Tool Loading (Suggested Tools) ---
         if chat_doc and "suggested_tools" in chat_doc:
             print(f"DEBUG: Loading suggested tools: {chat_doc['suggested_tools']}")
             for tool_name in chat_doc["suggested_tools"]:
                 # Check dynamic tools
-                if tool_name in self.dynamic_tools:
+                if tool_name in self.tool_registry and is_allowed(tool_name):
                      # Find definition
-                     t_def = next((alert for alert in self.dynamic_tool_definitions if alert["function"]["name"] == tool_name), None)
+                     t_def = self.tool_registry.get_definition(tool_name)
                      if t_def and not any(t['function']['name'] == tool_name for t in current_tool_definitions):
                          current_tool_definitions.append(t_def)
                 # Check real MCP tools (handled below in MCP block? No, MCP tools not in definition list yet)
                 # We handle MCP below.
-                
-        else:
-            print("Warning: Tool DB unavailable, falling back to ALL tools.")
-            current_tool_definitions.extend(self.dynamic_tool_definitions)
 
         # Add MCP tools (if any)
         if self.session:
             try:
-                mcp_tools_list = await self.session.list_tools()
+                with tracing.span("mcp_list_tools"):
+                    mcp_tools_list = await self.session.list_tools()
                 current_tool_definitions.extend([
                     {
                         "type": "function",
@@ -704,7 +1089,7 @@ Active Memories:
                         }
                     } 
                     for tool in mcp_tools_list.tools
-                    if "*" in allowed_tools or tool.name in allowed_tools 
+                    if is_allowed(tool.name)
                 ])
             except Exception as e:
                 print(f"Error listing MCP tools: {e}")
@@ -714,28 +1099,17 @@ Active Memories:
         MAX_TURNS = 20  # Increased to allow for complex multi-step tasks (e.g. create tool -> gen data -> process)
         turn_count = 0
 
-        while turn_count < MAX_TURNS:
-            turn_count += 1
-            print(f"DEBUG: Turn {turn_count}/{MAX_TURNS}")
-            
-            # ... [Existing loop body] ...
-            # I need to match the indentation and structure of the loop body content I'm *not* changing,
-            # but replace_file_content requires exact match or complete replacement.
-            # To avoid large replace blocks, I will do this in two steps or simply replace the loop set up 
-            # and then the post-loop handling.
-            
-            # Actually, standard replace_file_content works on contiguous blocks.
-            # I will target the variable init and the WHILE line first.
+        loop_guard = ToolLoopGuard(read_only_tools=self._read_only_tools())
 
+        while turn_count < MAX_TURNS:
             turn_count += 1
             print(f"DEBUG: Turn {turn_count}/{MAX_TURNS}")
 
             try:
                 # Force tools to be available in every turn
-                response = completion(
-                    model=os.getenv("LLM_MODEL", "openai/local-model"),
-                    api_base=os.getenv("LLM_API_BASE", "http://localhost:1234/v1"),
-                    api_key=os.getenv("LLM_API_KEY", "lm-studio"),
+                # Async so a cancelled turn aborts the pending request
+                response = await self._call_llm(
+                    user_id, "interactive", "chat", turn=turn_count,
                     messages=payload_messages,
                     tools=current_tool_definitions if current_tool_definitions else None,
                 )
@@ -759,174 +1133,49 @@ Active Memories:
                      for tc in response_message.tool_calls
                  ]
             payload_messages.append(msg_dict)
+            if response_message.content:
+                turn_state["partial_text"] = response_message.content
+                if response_message.tool_calls:
+                    self._emit(turn_state, "thinking", text=response_message.content)
 
             if response_message.tool_calls:
                 print(f"\n[Tool Call Detected]: {response_message.tool_calls[0].function.name}")
                 
+                loop_guard.start_turn()
                 for tool_call in response_message.tool_calls:
                     function_name = tool_call.function.name
-                    try:
-                        function_args = json.loads(tool_call.function.arguments)
-                    except json.JSONDecodeError:
+                    turn_state["tools_run"].append(function_name)
+                    function_args, args_error = loop_guard.parse_arguments(tool_call.function.arguments)
+                    if args_error:
                         print(f"Error parsing arguments for {function_name}: {tool_call.function.arguments}")
-                        function_args = {} 
-                    
+                        loop_guard.record_malformed(function_name)
+                        payload_messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": args_error})
+                        continue
+
                     result_content = ""
-                    
-                    if function_name == "save_fact":
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        target_mode = function_args.get("mode", current_mode)
-                        result_content = self.semantic_memory.save_fact(function_args["fact"], mode=target_mode, user_id=user_id)
-
-                    elif function_name == "edit_memory":
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        old_content = function_args.get("old_content")
-                        new_content = function_args.get("new_content")
-                        
-                        # Search for candidates
-                        candidates = self.semantic_memory.search_facts(old_content, mode=current_mode, user_id=user_id)
-                        
-                        if not candidates:
-                             result_content = f"No memory found matching '{old_content}' in {current_mode} mode."
-                        elif len(candidates) == 1:
-                             success = self.semantic_memory.update_fact(candidates[0]['id'], new_content)
-                             result_content = f"Memory updated: '{candidates[0]['fact']}' -> '{new_content}'" if success else "Error updating memory."
-                        else:
-                             # Multiple matches
-                             result_content = f"Multiple memories found matching '{old_content}'. Please be more specific. Matches: " + ", ".join([f"'{c['fact']}'" for c in candidates])
-
-                    elif function_name == "set_mode":
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        result_content = self.prompt_manager.set_mode(function_args["mode"])
-                        # Determine if we need to update system prompt for next turn?
-                        # For simplicity, we keep current prompt but the tool result says mode changed.
-                        
-                    elif function_name == "delete_mode":
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        mode_del = function_args["mode"]
-                        sem_del = self.semantic_memory.delete_mode(mode_del, user_id=user_id)
-                        epi_del = self.episodic_memory.delete_mode_memory(mode_del, user_id=user_id)
-                        result_content = f"Deleted mode '{mode_del}' for user {user_id}. Semantic: {sem_del}, Episodic: {epi_del}"
-                        if self.prompt_manager.mode == mode_del:
-                            self.prompt_manager.set_mode("Work")
-                            result_content += ". Switched to 'Work'."
-
-                    elif function_name == "switch_persona":
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        result_content = self.prompt_manager.set_persona(function_args["persona"])
-                    
-                    elif function_name in ["read_pdf", "read_docx", "read_image", "read_text_file", "read_file"]:
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        result_content = self.document_manager.ingest_file(function_args["file_path"])
-                            
-                    elif function_name == "create_tool":
-                        print(f"Executing CREATION tool: {function_name}")
-                        result = self.tool_creator.create_tool(function_args["tool_name"], function_args["description"])
-                        
-                        if isinstance(result, dict) and result.get("status") == "success":
-                            result_content = result["message"]
-                            tool_name_created = result["tool_name"]
-                            file_path = result["file_path"]
-                            
-                            # Dynamic Load
-                            if self._load_dynamic_tool(tool_name_created, file_path):
-                                 result_content += f"\nTool '{tool_name_created}' hot-loaded and ready."
-                                 # UPDATE current_tool_definitions for the next turn
-                                 if self.dynamic_tool_definitions:
-                                     # Append the most recently added definition
-                                     # We need to find the specific one we just added to be safe
-                                     new_def = next((d for d in self.dynamic_tool_definitions if d['function']['name'] == tool_name_created), None)
-                                     if new_def:
-                                         current_tool_definitions.append(new_def)
-                        else:
-                            result_content = str(result)
-                            
-                    elif function_name in self.dynamic_tools:
-                        print(f"Executing DYNAMIC tool: {function_name}")
-                        try:
-                            func = self.dynamic_tools[function_name]
-                            result_content = str(func(**function_args))
-                        except Exception as e:
-                            result_content = f"Error executing tool {function_name}: {e}"
-
-                    elif function_name in self.real_tool_names:
-                        print(f"Executing REAL tool: {function_name}")
-                        result = await self.session.call_tool(function_name, function_args)
-                        result_content = str(result.content)
-                        
-                    elif function_name == "create_new_mode":
-                        print(f"Executing INTERNAL tool: {function_name}")
-                        res = self.mode_manager.create_mode(
-                            function_args["name"], 
-                            function_args.get("description", ""), 
-                            function_args.get("allowed_tools", ["*"])
-                        )
-                        result_content = str(res)
-
-
-                    elif function_name == "list_files":
-                        print(f"Executing FILE tool: {function_name}")
-                        try:
-                            path = function_args["path"]
-                            if os.path.exists(path):
-                                files = os.listdir(path)
-                                result_content = f"Files in {path}:\n" + "\n".join(files)
-                            else:
-                                result_content = f"Path not found: {path}"
-                        except Exception as e:
-                            result_content = f"Error listing files: {str(e)}"
-
-                    elif function_name == "read_file":
-                        print(f"Executing FILE tool: {function_name}")
-                        try:
-                            # Use DocumentManager for smarter reading? Or just plain text.
-                            # DocumentManager is more for "indexing". Here we want raw content for editing.
-                            with open(function_args["path"], "r", encoding="utf-8") as f:
-                                result_content = f.read()
-                        except Exception as e:
-                            result_content = f"Error reading file: {str(e)}"
-
-                    elif function_name == "write_file":
-                        print(f"Executing FILE tool: {function_name}")
-                        try:
-                            path = function_args["path"]
-                            content = function_args["content"]
-                            with open(path, "w", encoding="utf-8") as f:
-                                f.write(content)
-                            result_content = f"Successfully wrote to {path}"
-                        except Exception as e:
-                            result_content = f"Error writing file: {str(e)}"
-
-                    elif function_name == "delete_file":
-                        print(f"Executing FILE tool: {function_name}")
-                        try:
-                            path = function_args["path"]
-                            if os.path.isdir(path):
-                                os.rmdir(path)
-                                result_content = f"Deleted directory: {path}"
-                            else:
-                                os.remove(path)
-                                result_content = f"Deleted file: {path}"
-                        except Exception as e:
-                            result_content = f"Error deleting: {str(e)}"
-
-                    elif function_name == "run_shell_command":
-                        print(f"Executing FILE tool: {function_name}")
-                        try:
-                            import subprocess
-                            cmd = function_args["command"]
-                            cwd = function_args["cwd"]
-                            # Basic safety check: ensure cwd is within a monitored directory?
-                            # For now, we trust the agent as requested "complete access".
-                            
-                            proc = subprocess.run(cmd, cwd=cwd, shell=True, capture_output=True, text=True, timeout=30)
-                            result_content = f"Stdout:\n{proc.stdout}\nStderr:\n{proc.stderr}"
-                        except Exception as e:
-                            result_content = f"Error running command: {str(e)}"
+                    cached_result = loop_guard.check(function_name, function_args)
+                    self._emit(turn_state, "tool_start", tool=function_name)
+
+                    if cached_result is not None:
+                        print(f"Reusing result of repeated call: {function_name}")
+                        result_content = f"{cached_result}\n[Same call already made with these arguments; result reused.]"
 
                     else:
-                        print(f"Simulating MOCK tool: {function_name}")
-                        result_content = f"Mock success: {function_name} executed with {function_args}"
+                        with tracing.span("tool_execution", tool=function_name) as tool_span, \
+                                usage_context(tool=function_name):
+                            result_content = await self._execute_tool(
+                                function_name, function_args, user_id, chat_id, current_mode, current_tool_definitions
+                            )
+                        tracing.TOOL_SECONDS.observe(tool_span.duration, tool=function_name)
+                    self._emit(turn_state, "tool_end", tool=function_name, cached=cached_result is not None)
+
+                    if cached_result is None:
+                        if function_name != "read_tool_output":
+                            # Big outputs (files, diffs, shell output) go to the store; the prompt gets a preview + handle
+                            result_content = await asyncio.to_thread(
+                                self.tool_output_store.maybe_spill, chat_id, function_name, result_content
+                            )
+                        loop_guard.record_result(function_name, function_args, result_content)
 
                     # Add Tool Result to History
                     payload_messages.append({
@@ -934,7 +1183,11 @@ Active Memories:
                         "tool_call_id": tool_call.id,
                         "content": result_content
                     })
-                
+
+                loop_guard.end_turn()
+                if loop_guard.should_stop:
+                    print(f"DEBUG: Tool loop stopped early: {loop_guard.stop_reason}")
+                    break
                 # Loop continues to next turn to generate response based on tool results
             
             else:
@@ -944,14 +1197,18 @@ Active Memories:
                 break
 
         # Post-Loop Fallback: If loop finished but no final text (e.g. max turns reached on a tool call)
+        self._record_loop_stats(loop_guard)
         if not final_text:
             print("DEBUG: Max turns reached or loop exited without final text. Generating summary...")
+            if loop_guard.should_stop:
+                payload_messages.append({
+                    "role": "system",
+                    "content": f"Stop calling tools ({loop_guard.stop_reason}). Answer the user now using the tool results above."
+                })
             try:
                 # Force a final response based on the accumulated history
-                response = completion(
-                    model=os.getenv("LLM_MODEL", "openai/local-model"),
-                    api_base=os.getenv("LLM_API_BASE", "http://localhost:1234/v1"),
-                    api_key=os.getenv("LLM_API_KEY", "lm-studio"),
+                response = await self._call_llm(
+                    user_id, "interactive", "summary",
                     messages=payload_messages,
                     # No tools this time, just want a text response
                 )
@@ -960,72 +1217,59 @@ Active Memories:
             except Exception as e:
                 final_text = f"Error generating final response: {e}"
 
-        # Post-Loop Logging and Saving
-        
-        # Save Episodic Memory
-        self.episodic_memory.add_episode(
+        # Save Assistant Response to DB before returning. Not queued: the next turn (possibly on
+        # another worker) saves its user message directly, and a queued reply could land after it,
+        # or twice when a retried $push had in fact succeeded
+        with tracing.span("assistant_message_save"):
+            await asyncio.to_thread(self.chat_service.add_message, chat_id, user_id, "assistant", final_text)
+
+        # Save Episodic Memory (queued; the response doesn't wait on embedding or Celery)
+        self.background_writer.submit(
+            "episodic_memory",
+            self.episodic_memory.add_episode,
             content=f"User: {user_input}\nJarvis: {final_text}",
-            mode=self.prompt_manager.mode,
+            # Re-read: a set_mode call during the turn files the episode under the new mode
+            mode=self.prompt_manager.get_state(user_id)["mode"],
             user_id=user_id
         )
-        
-        # Save Assistant Response to DB
-        self.chat_service.add_message(chat_id, user_id, "assistant", final_text)
 
         return final_text
 
     async def _generate_chat_title(self, first_message, chat_id, user_id):
+        """
+        Background task: names the chat from its first message via ChatService.update_chat_title.
+        """
         print("DEBUG: Generating chat title...")
         try:
-            response = completion(
-                model=os.getenv("LLM_MODEL", "openai/local-model"),
-                api_base=os.getenv("LLM_API_BASE", "http://localhost:1234/v1"),
-                api_key=os.getenv("LLM_API_KEY", "lm-studio"),
+            response = await self._call_llm(
+                user_id, "background", "title",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant. Generate a concise title (3-5 words) for this chat based on the user's first message. Return ONLY the title, no quotes."},
                     {"role": "user", "content": first_message}
                 ]
             )
-            final_message = second_response.choices[0].message
-            final_text = self._sanitize_response(final_message.content)
-            print(f"Jarvis: {final_text}")
-            
-            prompt = f"""
-You are an intelligent orchestrator. The user has just started a chat with this request:
-"{first_message}"
-
-Available Tools: {', '.join(all_tool_names)}
-
-Which of these tools are HIGHLY LIKELY to be needed for this request?
-Return a JSON array of tool names. Example: ["read_pdf", "calculator"].
-If no specific tools are needed, return [].
-Do NOT explain. Return ONLY JSON.
-"""
-            response = completion(
-                model=os.getenv("LLM_MODEL", "openai/local-model"),
-                api_base=os.getenv("LLM_API_BASE", "http://localhost:1234/v1"),
-                api_key=os.getenv("LLM_API_KEY", "lm-studio"),
-                messages=[{"role": "user", "content": prompt}]
-            )
-            content = response.choices[0].message.content
-            # Cleanup code blocks if any
-            if "```" in content:
-                content = content.split("```")[1].replace("json", "").strip()
-            
-            # Save Assistant Response to DB
-            self.chat_service.add_message(chat_id, user_id, "assistant", final_text)
-            
-            return final_text
-        
-        else:
-            final_text = self._sanitize_response(response_message.content)
-            print(f"Jarvis: {final_text}")
-            self.episodic_memory.add_episode(
-                content=f"User: {user_input}\nJarvis: {final_text}",
-                mode=self.prompt_manager.mode,
-                user_id=user_id
-            )
-            # Save Assistant Response to DB
-            self.chat_service.add_message(chat_id, user_id, "assistant", final_text)
+            title = self._sanitize_response(response.choices[0].message.content).strip('"\'')
+            if title:
+                await asyncio.to_thread(self.chat_service.update_chat_title, chat_id, user_id, title)
+                print(f"DEBUG: Chat title set to '{title}'")
+            return title
+        except Exception as e:
+            print(f"Error generating chat title: {e}")
+            return None
 
-            return final_text
+    def _suggest_tools(self, first_message, chat_id, user_id, mode="Work"):
+        """
+        Suggests tools for a new chat from the tool vector index (plus usage priors).
+        """
+        print("DEBUG: Suggesting tools...")
+        if self.tool_collection is None:
+            return []
+        try:
+            allowed_tools = self.mode_manager.get_allowed_tools(mode)
+            suggested = self.tool_retriever.suggest(first_message, allowed_tools=allowed_tools)
+            self.chat_service.update_chat_field(chat_id, user_id, "suggested_tools", suggested)
+            print(f"DEBUG: Suggested tools: {suggested}")
+            return suggested
+        except Exception as e:
+            print(f"Error suggesting tools: {e}")
+            return []
@@ -41,6 +41,13 @@ class SentinelService:
                 r = requests.get(url, timeout=2)
                 if r.status_code == 200:
                     status[name] = "OK"
+                    if name == "backend":
+                        # The backend reports the circuit state of its own Mongo/Chroma/Redis clients
+                        for dependency, breaker in r.json().get("dependencies", {}).items():
+                            if breaker["state"] == "closed":
+                                status[dependency] = "OK"
+                            else:
+                                status[dependency] = f"WARN (circuit {breaker['state']}: {breaker.get('last_error')})"
                 else:
                     status[name] = f"WARN ({r.status_code})"
             except Exception as e:
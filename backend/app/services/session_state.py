@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pymongo import ReturnDocument
+from .circuit_breaker import guard_mongo, guard_redis
+from .clients import get_mongo_client
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Without Redis, how long a worker may serve a user's state from its own cache
+# before re-reading Mongo (i.e. how stale a change made on another worker can be)
+SESSION_CACHE_SECONDS = float(os.getenv("SESSION_CACHE_SECONDS", "2"))
+SESSION_CACHE_MAX_USERS = int(os.getenv("SESSION_CACHE_MAX_USERS", "10000"))
+
+DEFAULT_SESSION = {"mode": "Work", "persona": "Generalist", "tone": "Professional"}
+
+
+class SessionStateStore:
+    """
+    Per-user session state (mode, persona, tone), shared by every API worker.
+
+    Mongo (jarvis_db.session_state) holds the state. Each worker keeps an in-process
+    cache; with Redis, every read compares the cached entry against a per-user version
+    counter bumped on each update, so a change made on one worker is seen by the next
+    request on any other worker. Without Redis, entries expire after SESSION_CACHE_SECONDS.
+    """
+
+    def __init__(self, collection=None, redis_client=None, cache_seconds=SESSION_CACHE_SECONDS,
+                 max_users=SESSION_CACHE_MAX_USERS):
+        self.collection = collection
+        self.redis = redis_client
+        self.cache_seconds = cache_seconds
+        self.max_users = max_users
+        self._cache = OrderedDict() # user_id -> (version, fetched_at, state)
+        self._local = {} # Used as the store itself when Mongo is unavailable (single worker only)
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "updates": 0}
+
+    @classmethod
+    def from_env(cls):
+        collection = None
+        redis_client = None
+        try:
+            client = get_mongo_client()
+            collection = guard_mongo(client["jarvis_db"]["session_state"])
+        except Exception as e:
+            print(f"SessionStateStore: Error connecting to MongoDB: {e}")
+        if redis is not None:
+            try:
+                redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=1)
+                redis_client.ping()
+                redis_client = guard_redis(redis_client)
+            except Exception as e:
+                print(f"SessionStateStore: Redis unavailable ({e}), caching for {SESSION_CACHE_SECONDS}s per worker")
+                redis_client = None
+        return cls(collection=collection, redis_client=redis_client)
+
+    @staticmethod
+    def _version_key(user_id):
+        return f"session_state:version:{user_id}"
+
+    def _remote_version(self, user_id):
+        if self.redis is None:
+            return None
+        try:
+            return int(self.redis.get(self._version_key(user_id)) or 0)
+        except Exception as e:
+            print(f"SessionStateStore: version check failed ({e}), using cache expiry")
+            return None
+
+    def _bump_version(self, user_id):
+        if self.redis is None:
+            return None
+        try:
+            return int(self.redis.incr(self._version_key(user_id)))
+        except Exception as e:
+            print(f"SessionStateStore: could not publish update for {user_id}: {e}")
+            return None
+
+    def _remember(self, user_id, version, state):
+        with self._lock:
+            self._cache[user_id] = (version, time.monotonic(), state)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _from_doc(doc):
+        state = dict(DEFAULT_SESSION)
+        if doc:
+            state.update({k: doc[k] for k in DEFAULT_SESSION if doc.get(k)})
+        return state
+
+    def _load(self, user_id):
+        if self.collection is None:
+            return self._from_doc(self._local.get(user_id))
+        try:
+            return self._from_doc(self.collection.find_one({"_id": user_id}))
+        except Exception as e:
+            print(f"SessionStateStore: Error loading state for {user_id}: {e}")
+            return dict(DEFAULT_SESSION)
+
+    def get(self, user_id):
+        """
+        Returns a copy of the user's state: {"mode", "persona", "tone"}.
+        """
+        version = self._remote_version(user_id)
+        with self._lock:
+            entry = self._cache.get(user_id)
+        if entry is not None:
+            cached_version, fetched_at, state = entry
+            if version is not None:
+                fresh = cached_version == version
+            else:
+                fresh = time.monotonic() - fetched_at < self.cache_seconds
+            if fresh:
+                self.counters["hits"] += 1
+                return dict(state)
+
+        self.counters["misses"] += 1
+        state = self._load(user_id)
+        self._remember(user_id, version, state)
+        return dict(state)
+
+    def update(self, user_id, **fields):
+        """
+        Sets some of mode/persona/tone for a user and returns the new state.
+        """
+        fields = {k: v for k, v in fields.items() if k in DEFAULT_SESSION}
+        self.counters["updates"] += 1
+        if self.collection is None:
+            self._local.setdefault(user_id, {}).update(fields)
+            state = self._from_doc(self._local[user_id])
+        else:
+            doc = self.collection.find_one_and_update(
+                {"_id": user_id},
+                {"$set": {**fields, "updated_at": datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            state = self._from_doc(doc)
+        # Bumped after the write so other workers reload the new state
+        self._remember(user_id, self._bump_version(user_id), state)
+        return dict(state)
+
+    def reset_value(self, field, value):
+        """
+        Puts every user whose field equals value (e.g. a deleted mode) back on the default.
+        """
+        default = DEFAULT_SESSION[field]
+        if self.collection is None:
+            user_ids = [u for u, s in self._local.items() if s.get(field) == value]
+        else:
+            try:
+                user_ids = [d["_id"] for d in self.collection.find({field: value}, {"_id": 1})]
+            except Exception as e:
+                print(f"SessionStateStore: Error finding sessions with {field}={value}: {e}")
+                return 0
+        for user_id in user_ids:
+            self.update(user_id, **{field: default})
+        return len(user_ids)
+
+    def stats(self):
+        return {
+            **self.counters,
+            "cached_users": len(self._cache),
+            "coherence": "redis_version" if self.redis is not None else f"ttl_{self.cache_seconds}s",
+            "backend": "mongo" if self.collection is not None else "memory"
+        }
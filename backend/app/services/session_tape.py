@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import asyncio
+import inspect
+import threading
+import contextvars
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+# Set to a .json path to record every chat turn (LLM calls, tool results, retrieval, DB reads)
+SESSION_RECORD_FILE = os.getenv("SESSION_RECORD_FILE")
+# How long (seconds) a recorded turn waits for its background calls (e.g. the chat title) before saving
+SESSION_RECORD_BACKGROUND_TIMEOUT = float(os.getenv("SESSION_RECORD_BACKGROUND_TIMEOUT", "30"))
+
+# Orchestrator services whose calls are recorded and replayed
+RECORDED_SERVICES = (
+    "prompt_manager", "chat_service", "episodic_memory", "semantic_memory", "document_manager",
+    "file_monitor", "mode_manager", "tool_retriever", "session"
+)
+
+# Calls that can interleave (background title vs. chat turn, different tools) are
+# matched by key on replay instead of strictly by order
+CALL_KEYS = {
+    ("orchestrator", "llm_completion"): lambda args, kwargs: kwargs.get("task"),
+    ("orchestrator", "_execute_tool"): lambda args, kwargs: args[0] if args else kwargs.get("function_name"),
+}
+
+
+# >0 while inside a recorded call; calls made from within it (e.g. a tool that reads
+# prompt_manager.get_state) are part of that call's recorded result, not separate events
+_recording_depth = contextvars.ContextVar("recording_depth", default=0)
+# The turn being recorded in this context. Concurrent turns (other users, other chats)
+# each see their own, and background tasks spawned during a turn inherit it.
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class _TurnRecording:
+    def __init__(self, turn):
+        self.turn = turn
+        self.tasks = [] # background tasks started during the turn
+
+
+class ReplayMismatch(Exception):
+    """Raised when replayed code makes a call the recording doesn't have."""
+
+
+def dump_value(value, as_object=False):
+    """
+    JSON-safe form of a recorded result. Objects (LLM responses, MCP results) are
+    tagged so replay can rebuild attribute access.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [dump_value(v, as_object) for v in value]
+    if isinstance(value, dict):
+        items = {str(k): dump_value(v, as_object) for k, v in value.items()}
+        return {"__obj__": items} if as_object else items
+    if hasattr(value, "model_dump"):
+        return dump_value(value.model_dump(), as_object=True)
+    if hasattr(value, "__dict__"):
+        return dump_value({k: v for k, v in vars(value).items() if not k.startswith("_")}, as_object=True)
+    return str(value)
+
+
+def load_value(value):
+    if isinstance(value, list):
+        return [load_value(v) for v in value]
+    if isinstance(value, dict):
+        if set(value) == {"__obj__"}:
+            return SimpleNamespace(**{k: load_value(v) for k, v in value["__obj__"].items()})
+        return {k: load_value(v) for k, v in value.items()}
+    return value
+
+
+class SessionTape:
+    """
+    Recording of chat turns: for each turn the user input, the final response and
+    every call the orchestrator made to the LLM, tools and storage services, with
+    results and latencies. Saved as JSON after each turn.
+    """
+
+    def __init__(self, path=None, turns=None):
+        self.path = path
+        self.turns = turns if turns is not None else []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f)["turns"])
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            data = json.dumps({"version": 1, "turns": self.turns}, indent=1)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+
+    def begin_turn(self, user_input, user_id, chat_id, tool_defs=None):
+        """
+        Starts a turn in the current context; calls recorded from this context (and from
+        tasks started in it) go to this turn until end_turn.
+        """
+        turn = {
+            "user_input": user_input,
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "tool_defs": dump_value(tool_defs or {}),
+            "events": [],
+            "response": None,
+            "elapsed_ms": None
+        }
+        with self._lock:
+            self.turns.append(turn)
+        _current_turn.set(_TurnRecording(turn))
+
+    def track_task(self, task):
+        """Registers a background task started during the current turn, see wait_background."""
+        recording = _current_turn.get()
+        if recording is not None:
+            recording.tasks.append(task)
+
+    async def wait_background(self, timeout=SESSION_RECORD_BACKGROUND_TIMEOUT):
+        """
+        Waits for the current turn's background tasks so their calls are in the turn when
+        it is saved. Tasks still running after timeout are left to finish on their own.
+        """
+        recording = _current_turn.get()
+        pending = [task for task in recording.tasks if not task.done()] if recording is not None else []
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+
+    def end_turn(self, response, elapsed_ms):
+        recording = _current_turn.get()
+        if recording is None:
+            return
+        with self._lock:
+            recording.turn["response"] = response
+            recording.turn["elapsed_ms"] = round(elapsed_ms, 2)
+        _current_turn.set(None)
+
+    def record(self, target, name, kind, result=None, latency_ms=0.0, is_async=False, key=None, error=None):
+        recording = _current_turn.get()
+        if recording is None:
+            return # Calls outside a chat turn (startup, other endpoints)
+        with self._lock:
+            recording.turn["events"].append({
+                "target": target,
+                "name": name,
+                "kind": kind,
+                "key": key,
+                "async": is_async,
+                "latency_ms": round(latency_ms, 3),
+                "result": dump_value(result),
+                "error": error
+            })
+
+
+def _recording_wrapper(tape, target, name, func):
+    key_fn = CALL_KEYS.get((target, name))
+
+    def record(args, kwargs, started, depth, result=None, error=None):
+        if depth == 0:
+            key = key_fn(args, kwargs) if key_fn else None
+            tape.record(target, name, "call", result, (time.perf_counter() - started) * 1000,
+                        inspect.iscoroutinefunction(func), key, error=error)
+
+    if inspect.iscoroutinefunction(func):
+        async def async_wrapper(*args, **kwargs):
+            depth = _recording_depth.get()
+            token = _recording_depth.set(depth + 1)
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                record(args, kwargs, started, depth, error=str(e))
+                raise
+            finally:
+                _recording_depth.reset(token)
+            record(args, kwargs, started, depth, result)
+            return result
+        return async_wrapper
+
+    def wrapper(*args, **kwargs):
+        depth = _recording_depth.get()
+        token = _recording_depth.set(depth + 1)
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record(args, kwargs, started, depth, error=str(e))
+            raise
+        finally:
+            _recording_depth.reset(token)
+        record(args, kwargs, started, depth, result)
+        return result
+    return wrapper
+
+
+class RecordingProxy:
+    """
+    Wraps a service: method calls and attribute reads are passed through and recorded.
+    """
+
+    def __init__(self, target, name, tape):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_tape", tape)
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if callable(value):
+            return _recording_wrapper(self._tape, self._name, attr, value)
+        if _recording_depth.get() == 0:
+            self._tape.record(self._name, attr, "attr", value)
+        return value
+
+    def __setattr__(self, attr, value):
+        setattr(self._target, attr, value)
+
+
+class ReplayProxy:
+    """
+    Stands in for a service during replay: returns recorded results in order and
+    sleeps for the recorded latency (scaled by latency_scale).
+    """
+
+    def __init__(self, name, queues, latency_scale=1.0):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_queues", queues)
+        object.__setattr__(self, "_latency_scale", latency_scale)
+
+    def __getattr__(self, attr):
+        queue = self._queues.get((self._name, attr, None))
+        if queue and queue[0]["kind"] == "attr":
+            return load_value(queue.popleft()["result"])
+        return replay_function(self._name, attr, self._queues, self._latency_scale)
+
+    def __setattr__(self, attr, value):
+        pass # State changes on services are not replayed
+
+
+def _next_event(target, name, queues, args, kwargs):
+    key_fn = CALL_KEYS.get((target, name))
+    key = key_fn(args, kwargs) if key_fn else None
+    queue = queues.get((target, name, key))
+    if not queue:
+        raise ReplayMismatch(f"No recorded call left for {target}.{name} (key={key})")
+    return queue.popleft()
+
+
+def _replayed_result(event):
+    if event["error"] is not None:
+        raise RuntimeError(f"[replayed error] {event['error']}")
+    return load_value(event["result"])
+
+
+def replay_function(target, name, queues, latency_scale=1.0):
+    # Sync or async is decided by what was recorded for this call site
+    queue = next((q for (t, n, _), q in queues.items() if t == target and n == name and q), None)
+    is_async = bool(queue and queue[0]["async"])
+
+    if is_async:
+        async def async_replay(*args, **kwargs):
+            event = _next_event(target, name, queues, args, kwargs)
+            await asyncio.sleep(event["latency_ms"] * latency_scale / 1000)
+            return _replayed_result(event)
+        return async_replay
+
+    def replay(*args, **kwargs):
+        event = _next_event(target, name, queues, args, kwargs)
+        time.sleep(event["latency_ms"] * latency_scale / 1000)
+        return _replayed_result(event)
+    return replay
+
+
+def build_queues(turn):
+    queues = defaultdict(deque)
+    for event in turn["events"]:
+        queues[(event["target"], event["name"], event["key"])].append(event)
+    return queues
+
+
+def attach_recorder(orchestrator, tape):
+    """
+    Routes the orchestrator's services, LLM calls and tool executions through a recorder.
+    """
+    for name in RECORDED_SERVICES:
+        service = getattr(orchestrator, name, None)
+        if service is not None and not isinstance(service, RecordingProxy):
+            setattr(orchestrator, name, RecordingProxy(service, name, tape))
+    orchestrator.llm_completion = _recording_wrapper(tape, "orchestrator", "llm_completion", orchestrator.llm_completion)
+    orchestrator._execute_tool = _recording_wrapper(tape, "orchestrator", "_execute_tool", orchestrator._execute_tool)
+
+
+def attach_replay(orchestrator, turn, latency_scale=1.0):
+    """
+    Points the orchestrator at recorded results for one turn. Returns the event queues
+    so callers can check what was left unconsumed.
+    """
+    queues = build_queues(turn)
+    recorded_targets = {target for target, _, _ in queues}
+    for name in RECORDED_SERVICES:
+        # e.g. no MCP session when the turn was recorded
+        proxy = ReplayProxy(name, queues, latency_scale) if name in recorded_targets or name != "session" else None
+        setattr(orchestrator, name, proxy)
+    orchestrator.llm_completion = replay_function("orchestrator", "llm_completion", queues, latency_scale)
+    orchestrator._execute_tool = replay_function("orchestrator", "_execute_tool", queues, latency_scale)
+    return queues
@@ -0,0 +1,100 @@
+import sys
+import time
+import threading
+import importlib
+from contextlib import contextmanager
+
+STARTING = "starting"
+UP = "up"
+WARM = "warm"
+
+
+class StartupProfile:
+    """
+    Cold-start profile of this process: how long heavy imports and each init phase took.
+
+    Phases may overlap (services are constructed in parallel), so each one records
+    its offset from process start and the thread it ran on. state goes
+    starting -> up (serving requests) -> warm (heavy resources loaded).
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.state = STARTING
+        self.up_after = None
+        self.warm_after = None
+        self.phases = []
+        self.imports = {}
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.t0
+
+    def record(self, name, started, duration, error=None):
+        with self._lock:
+            self.phases.append({
+                "name": name,
+                "start_s": round(started, 3),
+                "duration_s": round(duration, 3),
+                "thread": threading.current_thread().name,
+                "error": error
+            })
+
+    @contextmanager
+    def phase(self, name):
+        started = self.elapsed()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            self.record(name, started, self.elapsed() - started, error)
+
+    def run(self, name, func, *args, **kwargs):
+        with self.phase(name):
+            return func(*args, **kwargs)
+
+    def import_module(self, name):
+        """
+        importlib.import_module that records how long the first import took.
+        """
+        if name in sys.modules:
+            return sys.modules[name]
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.setdefault(name, round(time.perf_counter() - started, 3))
+        return module
+
+    def mark(self, state):
+        self.state = state
+        if state == UP and self.up_after is None:
+            self.up_after = round(self.elapsed(), 3)
+        elif state == WARM and self.warm_after is None:
+            self.warm_after = round(self.elapsed(), 3)
+        print(f"Startup: {state} after {self.elapsed():.2f}s")
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p["start_s"])
+            imports = dict(sorted(self.imports.items(), key=lambda item: -item[1]))
+        return {
+            "state": self.state,
+            "up_after_s": self.up_after,
+            "warm_after_s": self.warm_after,
+            "phases": phases,
+            "imports": imports
+        }
+
+    def print_summary(self, limit=10):
+        report = self.report()
+        slowest = sorted(report["phases"], key=lambda p: -p["duration_s"])[:limit]
+        print("Startup profile (slowest phases): " + ", ".join(f"{p['name']}={p['duration_s']}s" for p in slowest))
+        if report["imports"]:
+            print("Startup profile (imports): " + ", ".join(f"{m}={s}s" for m, s in list(report["imports"].items())[:limit]))
+
+
+# Created when the API first imports the services package, so offsets are close to process start
+PROFILE = StartupProfile()
@@ -2,7 +2,7 @@ import os
 import json
 import subprocess
 import time
-from litellm import completion
+from .llm_pool import completion
 from pathlib import Path
 
 # Paths relative to this file: .../backend/app/services/tool_creator.py
@@ -13,8 +13,8 @@ TOOL_DEFINITIONS_FILE = BASE_DIR / "tool_definitions.json"
 
 class ToolCreator:
     def __init__(self, model=None, api_base=None, api_key=None):
-        self.model = model or os.getenv("LLM_MODEL", "openai/local-model")
-        self.api_base = api_base or os.getenv("LLM_API_BASE", "http://localhost:1234/v1")
+        self.model = model # None = the model routed for the "codegen" task
+        self.api_base = api_base # None = route through the shared LLM backend pool
         self.api_key = api_key or os.getenv("LLM_API_KEY", "lm-studio")
         
         if not os.path.exists(TOOLS_DIR):
@@ -95,9 +95,10 @@ class ToolCreator:
         print(f"DEBUG: Generating code for {tool_name}...")
         try:
             response = completion(
-                model=self.model,
-                api_base=self.api_base,
+                task="codegen",
                 api_key=self.api_key,
+                **({"model": self.model} if self.model else {}),
+                **({"api_base": self.api_base} if self.api_base else {}),
                 messages=[{"role": "user", "content": tool_prompt}]
             )
             tool_code = response.choices[0].message.content.strip()
@@ -130,9 +131,10 @@ class ToolCreator:
         print(f"DEBUG: Generating tests for {tool_name}...")
         try:
             response = completion(
-                model=self.model,
-                api_base=self.api_base,
+                task="codegen",
                 api_key=self.api_key,
+                **({"model": self.model} if self.model else {}),
+                **({"api_base": self.api_base} if self.api_base else {}),
                 messages=[{"role": "user", "content": test_prompt}]
             )
             test_code = response.choices[0].message.content.strip()
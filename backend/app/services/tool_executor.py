@@ -0,0 +1,303 @@
+import os
+import asyncio
+import multiprocessing
+
+try:
+    import resource # Unix only; limits are skipped on Windows
+except ImportError:
+    resource = None
+
+from .tool_registry import ToolRegistry, ToolLoadError
+from .llm_usage import get_usage_context, usage_context, flush_pending
+
+TOOL_POOL_SIZE = int(os.getenv("TOOL_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+# Virtual address-space cap (RLIMIT_AS), not resident memory: numpy/torch reserve far more
+# address space than they use, so size it generously or leave it off (0, the default)
+TOOL_MEMORY_LIMIT_MB = int(os.getenv("TOOL_MEMORY_LIMIT_MB", "0"))
+TOOL_CPU_LIMIT_SECONDS = int(os.getenv("TOOL_CPU_LIMIT_SECONDS", "30"))
+# How long a call waits for an idle worker before returning an error to the LLM
+TOOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("TOOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+# Attempts to start a replacement worker (with exponential backoff) before the slot is
+# left empty; empty slots are refilled on the next call
+TOOL_RESPAWN_ATTEMPTS = int(os.getenv("TOOL_RESPAWN_ATTEMPTS", "3"))
+TOOL_RESPAWN_BACKOFF_SECONDS = float(os.getenv("TOOL_RESPAWN_BACKOFF_SECONDS", "1"))
+
+
+def _apply_memory_limit(memory_limit_mb):
+    if resource is None or not memory_limit_mb:
+        return
+    try:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        print(f"ToolWorker: could not set memory limit: {e}", flush=True)
+
+
+def _apply_cpu_limit(cpu_seconds):
+    """
+    RLIMIT_CPU counts total process CPU time, so a warm worker gets a soft limit of
+    (CPU used so far + budget for this call). Exceeding it kills the worker via SIGXCPU.
+    """
+    if resource is None or not cpu_seconds:
+        return
+    try:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + int(cpu_seconds) + 1
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError) as e:
+        print(f"ToolWorker: could not set CPU limit: {e}", flush=True)
+
+
+def _worker_main(conn, definitions_file, tools_dir, memory_limit_mb):
+    """
+    Entry point of a pool worker process: pre-imports the tool modules, then serves
+    (tool_name, tool_def, version, args, cpu_seconds, usage_ctx) requests until it receives None.
+    """
+    _apply_memory_limit(memory_limit_mb)
+
+    registry = ToolRegistry(definitions_file, tools_dir)
+    registry.load_definitions()
+    versions = {}
+    for name in registry.names():
+        try:
+            registry.get_function(name)
+        except ToolLoadError as e:
+            # Reported again at call time
+            print(f"ToolWorker: pre-import of '{name}' failed: {e}", flush=True)
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        name, tool_def, version, args, cpu_seconds, usage_ctx = request
+        if registry.tool_defs.get(name) != tool_def or versions.get(name, version) != version:
+            registry.register(tool_def)
+        versions[name] = version
+
+        try:
+            _apply_cpu_limit(cpu_seconds)
+            func = registry.get_function(name)
+            # LLM calls made by the tool (e.g. vision) are attributed to the caller's user/turn
+            with usage_context(**usage_ctx):
+                conn.send(("ok", str(func(**args))))
+        except ToolLoadError as e:
+            conn.send(("error", f"Error loading tool {name}: {e}"))
+        except MemoryError:
+            conn.send(("error", f"Error executing tool {name}: out of memory (limit {memory_limit_mb} MB of virtual memory)"))
+        except Exception as e:
+            conn.send(("error", f"Error executing tool {name}: {e}"))
+        # Workers can be killed at any time, so usage records are not left buffered
+        flush_pending()
+
+
+class ToolWorker:
+    def __init__(self, ctx, definitions_file, tools_dir, memory_limit_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, str(definitions_file), str(tools_dir), memory_limit_mb),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=2)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.kill()
+
+
+class ToolProcessPool:
+    """
+    Warm pool of worker processes that execute dynamic tools out of the API process.
+
+    Workers pre-import the modules from tools/ when they start. Each invocation gets a
+    timeout (per-tool 'timeout' in tool_definitions.json, else TOOL_TIMEOUT_SECONDS),
+    a CPU-time budget and optionally a virtual-memory limit. A worker that times out,
+    is cancelled or dies is killed and replaced, so a hung tool never blocks other users.
+    """
+
+    def __init__(self, definitions_file, tools_dir, size=TOOL_POOL_SIZE, default_timeout=TOOL_TIMEOUT_SECONDS,
+                 memory_limit_mb=TOOL_MEMORY_LIMIT_MB, cpu_limit_seconds=TOOL_CPU_LIMIT_SECONDS,
+                 acquire_timeout=TOOL_ACQUIRE_TIMEOUT_SECONDS, respawn_attempts=TOOL_RESPAWN_ATTEMPTS,
+                 respawn_backoff=TOOL_RESPAWN_BACKOFF_SECONDS):
+        self.definitions_file = definitions_file
+        self.tools_dir = tools_dir
+        self.size = size
+        self.default_timeout = default_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_limit_seconds = cpu_limit_seconds
+        self.acquire_timeout = acquire_timeout
+        self.respawn_attempts = respawn_attempts
+        self.respawn_backoff = respawn_backoff
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = None
+        self._workers = set()
+        self._replacements = set() # in-flight _replace_worker tasks
+        self._missing = 0 # slots whose replacement failed, refilled by the next run()
+        self.counters = {"calls": 0, "errors": 0, "timeouts": 0, "cancelled": 0, "crashed": 0,
+                         "no_worker": 0, "replace_failed": 0}
+
+    @property
+    def enabled(self):
+        return self._idle is not None
+
+    def _spawn_worker(self):
+        worker = ToolWorker(self._ctx, self.definitions_file, self.tools_dir, self.memory_limit_mb)
+        self._workers.add(worker)
+        return worker
+
+    async def _add_worker(self):
+        worker = await asyncio.to_thread(self._spawn_worker)
+        if self._idle is None:
+            # Pool was stopped while this worker was starting
+            self._workers.discard(worker)
+            worker.close()
+            return
+        self._idle.put_nowait(worker)
+
+    async def _replace_worker(self):
+        for attempt in range(self.respawn_attempts):
+            try:
+                await self._add_worker()
+                return
+            except Exception as e:
+                print(f"ToolProcessPool: could not start worker (attempt {attempt + 1}/{self.respawn_attempts}): {e}")
+            if attempt + 1 < self.respawn_attempts:
+                await asyncio.sleep(self.respawn_backoff * 2 ** attempt)
+        self._missing += 1
+        self.counters["replace_failed"] += 1
+
+    def _schedule_replacement(self):
+        # Keep the pool at full size without delaying the current caller
+        task = asyncio.get_running_loop().create_task(self._replace_worker())
+        self._replacements.add(task)
+        task.add_done_callback(self._replacement_done)
+
+    async def start(self):
+        if self.size <= 0 or self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        await asyncio.gather(*(self._add_worker() for _ in range(self.size)))
+        print(f"ToolProcessPool: started {self.size} workers")
+
+    async def stop(self):
+        if self._idle is None:
+            return
+        for task in list(self._replacements):
+            task.cancel()
+        await asyncio.gather(*self._replacements, return_exceptions=True)
+        workers, self._workers = self._workers, set()
+        await asyncio.gather(*(asyncio.to_thread(w.close) for w in workers))
+        self._idle = None
+        print("ToolProcessPool: stopped")
+
+    def _discard(self, worker):
+        self._workers.discard(worker)
+        worker.kill()
+        self._schedule_replacement()
+
+    def _replacement_done(self, task):
+        self._replacements.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"ToolProcessPool: could not replace worker: {task.exception()}")
+
+    @staticmethod
+    async def _wait_readable(conn, timeout):
+        """
+        Waits until the worker replies (or its end of the pipe closes) without tying up a
+        thread, so a cancelled turn stops waiting immediately. Returns False on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = conn.fileno()
+        try:
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(True))
+        except NotImplementedError:
+            # Proactor event loop (Windows) has no add_reader
+            return await asyncio.to_thread(conn.poll, timeout)
+        try:
+            await asyncio.wait_for(ready, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+
+    async def run(self, name, tool_def, args, timeout=None):
+        """
+        Executes a tool in a worker and returns its result as a string.
+        Errors, timeouts and crashes are returned as error strings for the LLM.
+        """
+        timeout = timeout or tool_def.get("timeout") or self.default_timeout
+        file_path = os.path.join(str(self.tools_dir), tool_def["filename"])
+        version = os.path.getmtime(file_path) if os.path.exists(file_path) else 0
+        self.counters["calls"] += 1
+
+        # Slots lost to failed replacements (e.g. spawns hitting resource limits) are retried here
+        missing, self._missing = self._missing, 0
+        for _ in range(missing):
+            self._schedule_replacement()
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.counters["no_worker"] += 1
+            return f"Error executing tool {name}: no worker available after {self.acquire_timeout}s"
+        healthy = True
+        try:
+            worker.conn.send((name, tool_def, version, args, self.cpu_limit_seconds, get_usage_context()))
+            ready = await self._wait_readable(worker.conn, timeout)
+            if not ready:
+                healthy = False
+                self.counters["timeouts"] += 1
+                return f"Error executing tool {name}: timed out after {timeout}s"
+            status, payload = worker.conn.recv()
+            if status != "ok":
+                self.counters["errors"] += 1
+            return payload
+        except asyncio.CancelledError:
+            healthy = False
+            self.counters["cancelled"] += 1
+            raise
+        except (EOFError, OSError) as e:
+            # Worker died mid-call (e.g. memory or CPU limit hit)
+            healthy = False
+            self.counters["crashed"] += 1
+            return f"Error executing tool {name}: worker process terminated ({e or 'resource limit exceeded'})"
+        except Exception as e:
+            healthy = False
+            self.counters["errors"] += 1
+            return f"Error executing tool {name}: {e}"
+        finally:
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                self._discard(worker)
+
+    def stats(self):
+        return {
+            **self.counters,
+            "workers": len(self._workers),
+            "missing": self._missing,
+            "idle": self._idle.qsize() if self._idle is not None else 0
+        }
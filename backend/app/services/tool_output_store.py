@@ -0,0 +1,106 @@
+import os
+import uuid
+from .llm_cache import make_store
+
+# Tool results longer than this are stored server-side and replaced by a preview + handle
+TOOL_OUTPUT_SPILL_CHARS = int(os.getenv("TOOL_OUTPUT_SPILL_CHARS", "6000"))
+TOOL_OUTPUT_PREVIEW_CHARS = int(os.getenv("TOOL_OUTPUT_PREVIEW_CHARS", "2000"))
+TOOL_OUTPUT_MAX_PAGE_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_PAGE_CHARS", "6000"))
+TOOL_OUTPUT_TTL = int(os.getenv("TOOL_OUTPUT_TTL", "3600"))
+TOOL_OUTPUT_MAX_ENTRIES = int(os.getenv("TOOL_OUTPUT_MAX_ENTRIES", "500"))
+TOOL_OUTPUT_BACKEND = os.getenv("TOOL_OUTPUT_BACKEND", os.getenv("LLM_CACHE_BACKEND", "redis"))
+
+READ_TOOL_OUTPUT_DEFINITION = {
+    "type": "function",
+    "function": {
+        "name": "read_tool_output",
+        "description": "Read part of a large tool output that was truncated and stored under a handle.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "handle": {"type": "string", "description": "Handle from the truncated tool output."},
+                "offset": {"type": "integer", "description": "Character offset to start reading from."},
+                "length": {"type": "integer", "description": f"Number of characters to read (max {TOOL_OUTPUT_MAX_PAGE_CHARS})."}
+            },
+            "required": ["handle"]
+        }
+    }
+}
+
+
+class ToolOutputStore:
+    """
+    Keeps large tool outputs out of the prompt.
+
+    Outputs over spill_chars are stored per chat with a TTL and replaced in the
+    conversation by a preview and a handle; the model pages through the rest with
+    read_tool_output. Every tool message is therefore at most about
+    max(preview_chars, max_page_chars) long, no matter how big the file or diff is.
+    """
+
+    def __init__(self, store=None, spill_chars=TOOL_OUTPUT_SPILL_CHARS, preview_chars=TOOL_OUTPUT_PREVIEW_CHARS,
+                 max_page_chars=TOOL_OUTPUT_MAX_PAGE_CHARS, ttl=TOOL_OUTPUT_TTL):
+        self.store = store if store is not None else make_store(TOOL_OUTPUT_BACKEND, "tool_output", TOOL_OUTPUT_MAX_ENTRIES)
+        self.spill_chars = spill_chars
+        self.preview_chars = preview_chars
+        self.max_page_chars = max_page_chars
+        self.ttl = ttl
+        self.counters = {"spilled": 0, "spilled_chars": 0, "reads": 0, "expired": 0}
+
+    @staticmethod
+    def _key(chat_id, handle):
+        return f"{chat_id}:{handle}"
+
+    def maybe_spill(self, chat_id, tool_name, content):
+        """
+        Returns content unchanged if it is small, otherwise a preview with a handle.
+        """
+        content = "" if content is None else str(content)
+        if len(content) <= self.spill_chars:
+            return content
+
+        handle = f"{tool_name}-{uuid.uuid4().hex[:8]}"
+        try:
+            self.store.set(self._key(chat_id, handle), content, self.ttl)
+        except Exception as e:
+            # Without a store the model still gets a bounded message
+            print(f"ToolOutputStore: could not store output of {tool_name}: {e}")
+            return content[:self.preview_chars] + f"\n...[Output truncated: {len(content)} characters total.]"
+
+        self.counters["spilled"] += 1
+        self.counters["spilled_chars"] += len(content)
+        return (
+            content[:self.preview_chars]
+            + f"\n...[Output truncated: {len(content)} characters total, stored as handle '{handle}'. "
+            f"Call read_tool_output(handle='{handle}', offset={self.preview_chars}, length={self.max_page_chars}) to read more.]"
+        )
+
+    def read(self, chat_id, handle, offset=0, length=None):
+        self.counters["reads"] += 1
+        try:
+            content = self.store.get(self._key(chat_id, handle))
+        except Exception as e:
+            return f"Error reading tool output '{handle}': {e}"
+        if content is None:
+            self.counters["expired"] += 1
+            return f"No stored output for handle '{handle}' (it may have expired). Run the original tool again."
+
+        try:
+            offset = max(0, int(offset or 0))
+            length = max(1, min(int(length or self.max_page_chars), self.max_page_chars))
+        except (TypeError, ValueError):
+            return f"Error reading tool output '{handle}': offset and length must be integers."
+        end = min(offset + length, len(content))
+        page = content[offset:end]
+        header = f"[{handle}: characters {offset}-{end} of {len(content)}"
+        header += "]" if end >= len(content) else f"; continue with offset={end}]"
+        return f"{header}\n{page}"
+
+    def stats(self):
+        return {
+            **self.counters,
+            "spill_chars": self.spill_chars,
+            "preview_chars": self.preview_chars,
+            "max_page_chars": self.max_page_chars,
+            "ttl": self.ttl
+        }
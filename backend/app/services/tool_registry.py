@@ -0,0 +1,192 @@
+import json
+import hashlib
+import importlib.util
+from pathlib import Path
+
+# Bump when the indexed document/metadata layout changes so every tool is re-embedded once
+INDEX_FORMAT_VERSION = 1
+
+
+class ToolLoadError(Exception):
+    """Raised when a registered tool's module cannot be imported or lacks its function."""
+
+
+class ToolRegistry:
+    """
+    Registry of generated tools backed by tool_definitions.json.
+
+    Tools are registered from their definitions alone. The module behind a tool
+    is only imported the first time the tool is invoked, and the resulting
+    function is cached for subsequent calls.
+    """
+
+    def __init__(self, definitions_file, tools_dir):
+        self.definitions_file = Path(definitions_file)
+        self.tools_dir = Path(tools_dir)
+        self.tool_defs = {}    # name -> raw entry from tool_definitions.json
+        self._functions = {}   # name -> imported callable (filled on first use)
+
+    def read_definitions(self):
+        """
+        Returns the raw entries of tool_definitions.json (empty list if missing/invalid).
+        """
+        if not self.definitions_file.exists():
+            print("Warning: tool_definitions.json not found.", flush=True)
+            return []
+        try:
+            with open(self.definitions_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading tool definitions: {e}", flush=True)
+            return []
+
+    def load_definitions(self):
+        """
+        Registers every tool in tool_definitions.json without importing any module.
+        Later entries with the same name replace earlier ones.
+        """
+        for tool_def in self.read_definitions():
+            self.register(tool_def)
+        print(f"DEBUG: Registered {len(self.tool_defs)} tools from definitions", flush=True)
+        return list(self.tool_defs.values())
+
+    def register(self, tool_def):
+        name = tool_def["name"]
+        file_path = self.tools_dir / tool_def["filename"]
+        if not file_path.exists():
+            print(f"Warning: Tool file {file_path} not found for {name}", flush=True)
+            return False
+
+        self.tool_defs[name] = tool_def
+        # Drop any cached import so a re-registered tool picks up the new code
+        self._functions.pop(name, None)
+        return True
+
+    def __contains__(self, name):
+        return name in self.tool_defs
+
+    def names(self):
+        return list(self.tool_defs.keys())
+
+    def get_definition(self, name):
+        """
+        Returns the OpenAI-style function definition for a registered tool, or None.
+        """
+        tool_def = self.tool_defs.get(name)
+        if tool_def is None:
+            return None
+        return {
+            "type": "function",
+            "function": {
+                "name": tool_def["name"],
+                "description": tool_def["description"],
+                "parameters": tool_def["inputSchema"]
+            }
+        }
+
+    @property
+    def definitions(self):
+        return [self.get_definition(name) for name in self.tool_defs]
+
+    def is_loaded(self, name):
+        return name in self._functions
+
+    def get_function(self, name):
+        """
+        Returns the callable for a tool, importing its module on first use.
+        Raises ToolLoadError if the module cannot be imported.
+        """
+        func = self._functions.get(name)
+        if func is not None:
+            return func
+
+        tool_def = self.tool_defs.get(name)
+        if tool_def is None:
+            raise ToolLoadError(f"Tool '{name}' is not registered.")
+
+        file_path = self.tools_dir / tool_def["filename"]
+        try:
+            spec = importlib.util.spec_from_file_location(name, str(file_path))
+            if not spec or not spec.loader:
+                raise ToolLoadError(f"Cannot load module spec from {file_path}")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except ToolLoadError:
+            raise
+        except Exception as e:
+            raise ToolLoadError(f"Failed to import {tool_def['filename']}: {e}") from e
+
+        if not hasattr(module, name):
+            raise ToolLoadError(f"Function {name} not found in {tool_def['filename']}")
+
+        func = getattr(module, name)
+        self._functions[name] = func
+        print(f"DEBUG: Lazily imported tool '{name}'", flush=True)
+        return func
+
+
+def tool_content_hash(tool_def):
+    """
+    Stable hash of the parts of a tool that affect its embedding or the schema shown to the LLM.
+    """
+    payload = json.dumps({
+        "format": INDEX_FORMAT_VERSION,
+        "name": tool_def["name"],
+        "description": tool_def.get("description", ""),
+        "schema": tool_def.get("inputSchema", {})
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def sync_tool_index(collection, tool_defs, source="definitions", prune=True):
+    """
+    Incrementally syncs tool definitions into a Chroma collection.
+
+    Each entry stores a content hash in its metadata. Only new or changed tools are
+    upserted (in one batch), and with prune=True entries of the same source that are
+    no longer defined are deleted. Entries indexed before sources were recorded are
+    never pruned; the first sync that defines them tags them with its source.
+    Nothing is embedded when nothing changed.
+    Returns a dict with the upserted/deleted/unchanged counts.
+    """
+    # Later entries with the same name win, matching ToolRegistry.register
+    wanted = {d["name"]: d for d in tool_defs}
+
+    existing = collection.get(include=["metadatas"])
+    indexed_hashes = {}
+    untagged = set()
+    owned_ids = []
+    for i, tool_id in enumerate(existing.get("ids") or []):
+        meta = (existing.get("metadatas") or [])[i] or {}
+        indexed_hashes[tool_id] = meta.get("hash")
+        if "source" not in meta:
+            untagged.add(tool_id)
+        elif meta["source"] == source:
+            owned_ids.append(tool_id)
+
+    changed = []
+    for name, tool_def in wanted.items():
+        content_hash = tool_content_hash(tool_def)
+        if indexed_hashes.get(name) != content_hash or name in untagged:
+            changed.append((tool_def, content_hash))
+
+    if changed:
+        collection.upsert(
+            ids=[d["name"] for d, _ in changed],
+            # Use description + name as document content
+            documents=[f"{d['name']}: {d['description']}" for d, _ in changed],
+            metadatas=[
+                {"json": json.dumps(d), "name": d["name"], "hash": h, "source": source}
+                for d, h in changed
+            ]
+        )
+
+    stale = [tool_id for tool_id in owned_ids if tool_id not in wanted] if prune else []
+    if stale:
+        collection.delete(ids=stale)
+
+    return {
+        "upserted": len(changed),
+        "deleted": len(stale),
+        "unchanged": len(wanted) - len(changed)
+    }
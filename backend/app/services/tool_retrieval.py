@@ -0,0 +1,217 @@
+import os
+import json
+import math
+import random
+import time
+from collections import OrderedDict, Counter
+
+# Weight of the usage-frequency prior when ranking suggestions (0 disables it)
+SUGGESTION_PRIOR_WEIGHT = float(os.getenv("TOOL_SUGGESTION_PRIOR_WEIGHT", "0.3"))
+TOOL_INDEX_VERSION_KEY = "tools:index_version"
+
+
+class ToolRetrievalCache:
+    """
+    Small approximate cache mapping query embeddings to retrieved tool sets.
+
+    Embeddings are bucketed by a random-hyperplane locality-sensitive hash; within a
+    bucket an entry is a hit if its cosine similarity to the query is above the
+    threshold. Entries are tied to the tool index version and the mode's allowed-tool
+    set, and the whole cache is dropped whenever the index version changes.
+    """
+
+    def __init__(self, max_entries=256, similarity_threshold=0.97, n_planes=12, seed=42):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.n_planes = n_planes
+        self.seed = seed
+        self._planes = None
+        self._entries = OrderedDict()  # (signature, allowed_key, id) -> (embedding, results)
+        self._next_id = 0
+        self.index_version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self._miss_ms_total = 0.0
+
+    def _signature(self, embedding):
+        if self._planes is None or len(self._planes[0]) != len(embedding):
+            rng = random.Random(self.seed)
+            self._planes = [[rng.gauss(0, 1) for _ in embedding] for _ in range(self.n_planes)]
+        bits = 0
+        for plane in self._planes:
+            bits = (bits << 1) | (sum(p * e for p, e in zip(plane, embedding)) >= 0)
+        return bits
+
+    @staticmethod
+    def _cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return dot / norm if norm else 0.0
+
+    def invalidate(self, version=None):
+        """Called whenever the tool index changes; version is the shared index version if known."""
+        self.index_version = self.index_version + 1 if version is None else version
+        self._entries.clear()
+
+    def get(self, embedding, allowed_key):
+        signature = self._signature(embedding)
+        for key in reversed(self._entries):
+            if key[0] != signature or key[1] != allowed_key:
+                continue
+            cached_embedding, results = self._entries[key]
+            if self._cosine(embedding, cached_embedding) >= self.similarity_threshold:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_ms += self.avg_miss_ms
+                return results
+        return None
+
+    def put(self, embedding, allowed_key, results, elapsed_ms):
+        self.misses += 1
+        self._miss_ms_total += elapsed_ms
+        key = (self._signature(embedding), allowed_key, self._next_id)
+        self._next_id += 1
+        self._entries[key] = (list(embedding), results)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @property
+    def avg_miss_ms(self):
+        return self._miss_ms_total / self.misses if self.misses else 0.0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "index_version": self.index_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "avg_query_ms": round(self.avg_miss_ms, 2),
+            "saved_ms": round(self.saved_ms, 2)
+        }
+
+
+class ToolRetriever:
+    """
+    Semantic tool retrieval over the Chroma 'tools' collection.
+
+    Mode restrictions are pushed into the query as a metadata filter on the indexed
+    tool name, so the top-k is always drawn from tools the mode permits. Queries are
+    embedded locally (with the same default model the collection uses) so that
+    near-identical requests can be answered from the retrieval cache.
+
+    With Redis (redis_client) the cache is keyed to a shared index version: invalidate()
+    bumps the counter and every worker drops its cache when it sees the counter change.
+    """
+
+    def __init__(self, collection, embedding_function=None, cache=None, redis_client=None):
+        self.collection = collection
+        self._embedding_function = embedding_function
+        self.cache = cache if cache is not None else ToolRetrievalCache()
+        self.redis = redis_client
+        self._shared_version = None # last index version read from Redis
+        self.usage_counts = Counter() # tool name -> invocations, used as a suggestion prior
+
+    def _embed(self, text):
+        if self._embedding_function is None:
+            from chromadb.utils import embedding_functions
+            self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return [float(x) for x in self._embedding_function([text])[0]]
+
+    def warm_up(self):
+        """
+        Loads the query embedding model and the collection's index, bypassing the cache.
+        """
+        if self.collection is None:
+            return 0
+        self.collection.query(query_embeddings=[self._embed("warm up")], n_results=1)
+        return 1
+
+    def invalidate(self):
+        """Marks the tool index as changed; cached retrievals are discarded on every worker."""
+        version = None
+        if self.redis is not None:
+            try:
+                version = self._shared_version = int(self.redis.incr(TOOL_INDEX_VERSION_KEY))
+            except Exception as e:
+                print(f"ToolRetriever: could not publish tool index change: {e}")
+        self.cache.invalidate(version)
+
+    def _check_index_version(self):
+        if self.redis is None:
+            return
+        try:
+            version = int(self.redis.get(TOOL_INDEX_VERSION_KEY) or 0)
+        except Exception as e:
+            print(f"ToolRetriever: index version check failed ({e}), using local cache")
+            return
+        if version != self._shared_version:
+            self._shared_version = version
+            self.cache.invalidate(version)
+
+    def record_usage(self, tool_name):
+        self.usage_counts[tool_name] += 1
+
+    def suggest(self, query, allowed_tools=None, n_results=3, candidates=8, prior_weight=None):
+        """
+        Suggests tools for a new chat straight from the vector index.
+        Candidates are ranked by retrieval rank, optionally boosted by how often
+        each tool has been used.
+        """
+        if prior_weight is None:
+            prior_weight = SUGGESTION_PRIOR_WEIGHT
+        tool_defs = self.retrieve(query, allowed_tools=allowed_tools, n_results=candidates)
+        if not tool_defs:
+            return []
+
+        max_usage = max(self.usage_counts.values(), default=0)
+
+        def score(item):
+            rank, tool_def = item
+            prior = math.log1p(self.usage_counts[tool_def["name"]]) / math.log1p(max_usage) if max_usage else 0.0
+            return 1.0 / (rank + 1) + prior_weight * prior
+
+        ranked = sorted(enumerate(tool_defs), key=score, reverse=True)
+        return [tool_def["name"] for _, tool_def in ranked[:n_results]]
+
+    def retrieve(self, query, allowed_tools=None, n_results=5):
+        """
+        Returns the raw definitions of the top tools for a query.
+        allowed_tools is None for unrestricted modes, otherwise a set of permitted names.
+        """
+        if self.collection is None:
+            return []
+        if allowed_tools is not None and not allowed_tools:
+            return []
+
+        self._check_index_version()
+        embedding = self._embed(query)
+        allowed_key = None if allowed_tools is None else frozenset(allowed_tools)
+        cache_key = (allowed_key, n_results)
+
+        cached = self.cache.get(embedding, cache_key)
+        if cached is not None:
+            print(f"DEBUG: Tool retrieval cache hit: {[d['name'] for d in cached]}")
+            return cached
+
+        started = time.perf_counter()
+        query_kwargs = {"query_embeddings": [embedding], "n_results": n_results}
+        if allowed_tools is not None:
+            query_kwargs["where"] = {"name": {"$in": sorted(allowed_tools)}}
+
+        results = self.collection.query(**query_kwargs)
+
+        tool_defs = []
+        if results['ids'] and results['ids'][0]:
+            print(f"DEBUG: Retrieved tools: {results['ids'][0]}")
+            for meta in results['metadatas'][0]:
+                try:
+                    tool_defs.append(json.loads(meta['json']))
+                except Exception as e:
+                    print(f"Error parsing tool metadata: {e}")
+
+        self.cache.put(embedding, cache_key, tool_defs, (time.perf_counter() - started) * 1000)
+        return tool_defs
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Print each finished trace as one JSON line
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+# Finished traces kept in memory for GET /traces/recent
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+# --- Metrics (Prometheus text format) ---
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class HistogramMetric:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {round(series[-2], 6)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class GaugeCallback:
+    """
+    Gauge read at scrape time. func returns a number or a {label value tuple: number} dict.
+    """
+
+    def __init__(self, name, help_text, func, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.func()
+        except Exception:
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+_metrics = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_gauge(name, help_text, func, labels=()):
+    # Re-registering (e.g. a restarted orchestrator) replaces the old callback
+    _metrics[:] = [m for m in _metrics if m.name != name]
+    return _register(GaugeCallback(name, help_text, func, labels))
+
+
+def render_metrics():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+PHASE_SECONDS = _register(HistogramMetric("jarvis_phase_seconds", "Duration of request phases", labels=("phase",)))
+TOOL_SECONDS = _register(HistogramMetric("jarvis_tool_seconds", "Tool execution time", labels=("tool",)))
+LLM_CALLS = _register(CounterMetric("jarvis_llm_calls_total", "LLM calls", labels=("task", "status")))
+LLM_TOKENS = _register(CounterMetric("jarvis_llm_tokens_total", "LLM tokens", labels=("task", "type")))
+CHAT_TURNS = _register(CounterMetric("jarvis_chat_turns_total", "Chat turns", labels=("status",)))
+HTTP_SECONDS = _register(HistogramMetric("jarvis_http_request_seconds", "HTTP request latency",
+                                         labels=("method", "path", "status")))
+CELERY_TASK_SECONDS = _register(HistogramMetric("jarvis_celery_task_seconds", "Celery task run time",
+                                                labels=("task", "status")))
+
+
+# --- Traces and spans ---
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attrs=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attrs = dict(attrs or {})
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self, trace_start):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round((self.start - trace_start) * 1000, 2),
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            **({"attrs": self.attrs} if self.attrs else {})
+        }
+
+
+class Trace:
+    def __init__(self, name, trace_id=None, parent_id=None, attrs=None):
+        self.root = Span(name, trace_id or uuid.uuid4().hex, parent_id, attrs)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @property
+    def trace_id(self):
+        return self.root.trace_id
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = [s.to_dict(self.root.start) for s in self.spans]
+        root = self.root.to_dict(self.root.start)
+        return {"trace_id": self.trace_id, **root, "spans": spans}
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+_recent_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_trace_context():
+    """
+    (trace_id, span_id) to hand to another process, or None outside a trace.
+    """
+    t = _current_trace.get()
+    if t is None:
+        return None
+    s = _current_span.get() or t.root
+    return t.trace_id, s.span_id
+
+
+@contextmanager
+def trace(name, trace_id=None, parent_id=None, **attrs):
+    """
+    Starts a trace (one per chat turn / Celery task). Spans opened inside it are attached to it.
+    """
+    t = Trace(name, trace_id, parent_id, attrs)
+    trace_token = _current_trace.set(t)
+    span_token = _current_span.set(t.root)
+    try:
+        yield t
+    except BaseException as e:
+        t.root.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        t.root.finish()
+        PHASE_SECONDS.observe(t.root.duration, phase=name)
+        _recent_traces.append(t)
+        if TRACE_LOG:
+            print(json.dumps(t.to_dict(), default=str), flush=True)
+
+
+@contextmanager
+def use_trace(t):
+    """
+    Re-enters a trace captured elsewhere (e.g. a queued background write).
+    """
+    if t is None:
+        yield None
+        return
+    trace_token = _current_trace.set(t)
+    span_token = _current_span.set(t.root)
+    try:
+        yield t
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times a phase: always recorded in jarvis_phase_seconds, and added to the current trace if any.
+    """
+    t = _current_trace.get()
+    parent = _current_span.get()
+    s = Span(name, t.trace_id if t else None, parent.span_id if parent else None, attrs)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        s.finish()
+        PHASE_SECONDS.observe(s.duration, phase=name)
+        if t is not None:
+            t.add(s)
+
+
+def record_llm_response(span_obj, task, response):
+    """
+    Adds token usage from an LLM response to the span and the token counters.
+    """
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    span_obj.set(task=task, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                 cached=bool(getattr(response, "cached", False)))
+    LLM_CALLS.inc(task=task, status="ok")
+    LLM_TOKENS.inc(prompt_tokens, task=task, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, task=task, type="completion")
+
+
+def recent_traces(limit=20, min_duration_ms=0, user_id=None):
+    """
+    Most recent traces first. With user_id, only traces started for that user.
+    """
+    traces = [t.to_dict() for t in list(_recent_traces)]
+    traces = [t for t in traces if (t["duration_ms"] or 0) >= min_duration_ms]
+    if user_id is not None:
+        traces = [t for t in traces if t.get("attrs", {}).get("user_id") == user_id]
+    return traces[-limit:][::-1]
+
+
+# --- Celery propagation ---
+
+def install_celery_tracing():
+    """
+    Propagates the current trace into Celery tasks via message headers and traces
+    each task run in the worker. Safe to call more than once.
+    """
+    try:
+        from celery import signals
+    except ImportError:
+        return
+
+    def inject_headers(headers=None, **kwargs):
+        context = current_trace_context()
+        if headers is not None and context is not None:
+            headers["trace_id"], headers["parent_span_id"] = context
+
+    running = {}
+
+    def start_task_trace(task_id=None, task=None, **kwargs):
+        request = getattr(task, "request", None)
+        extra = (getattr(request, "headers", None) or {}) if request is not None else {}
+        trace_id = getattr(request, "trace_id", None) or extra.get("trace_id")
+        parent_id = getattr(request, "parent_span_id", None) or extra.get("parent_span_id")
+        cm = trace(f"celery:{task.name}", trace_id=trace_id, parent_id=parent_id, task_id=task_id)
+        running[task_id] = (cm, cm.__enter__())
+
+    def finish_task_trace(task_id=None, task=None, state=None, **kwargs):
+        entry = running.pop(task_id, None)
+        if entry is None:
+            return
+        cm, t = entry
+        cm.__exit__(None, None, None)
+        CELERY_TASK_SECONDS.observe(t.root.duration, task=task.name, status=state or "unknown")
+
+    signals.before_task_publish.connect(inject_headers, weak=False, dispatch_uid="jarvis_trace_publish")
+    signals.task_prerun.connect(start_task_trace, weak=False, dispatch_uid="jarvis_trace_prerun")
+    signals.task_postrun.connect(finish_task_trace, weak=False, dispatch_uid="jarvis_trace_postrun")
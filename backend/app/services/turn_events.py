@@ -0,0 +1,122 @@
+import os
+import json
+import time
+
+try:
+    import redis
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis = None
+    redis_asyncio = None
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# "local": chat turns run in the API process. "celery": /chat enqueues the turn on the
+# chat_turns queue and relays its progress from Redis pub/sub.
+CHAT_EXECUTION = os.getenv("CHAT_EXECUTION", "local")
+CHAT_TURN_QUEUE = os.getenv("CHAT_TURN_QUEUE", "chat_turns")
+CHAT_TURN_TIMEOUT = float(os.getenv("CHAT_TURN_TIMEOUT", "600"))
+
+# Cancel requests for turns running on orchestrator workers
+CANCEL_CHANNEL = "chat_turn:cancel"
+TERMINAL_EVENTS = ("final", "error", "cancelled")
+
+
+def turn_channel(turn_id):
+    return f"chat_turn:{turn_id}"
+
+
+def encode_event(turn_id, event, data=None):
+    return json.dumps({"turn_id": turn_id, "event": event, "ts": time.time(), **(data or {})}, default=str)
+
+
+class TurnEventPublisher:
+    """
+    Worker side: publishes the progress events of one turn on its channel.
+    Publishing failures are logged; they never fail the turn.
+    """
+
+    def __init__(self, client, turn_id):
+        self.client = client
+        self.turn_id = turn_id
+        self.channel = turn_channel(turn_id)
+
+    def publish(self, event, **data):
+        try:
+            self.client.publish(self.channel, encode_event(self.turn_id, event, data))
+        except Exception as e:
+            print(f"TurnEventPublisher: could not publish '{event}' for turn {self.turn_id}: {e}")
+
+    def listener(self, event, data):
+        # Signature expected by JarvisOrchestrator.start_turn(listener=...)
+        self.publish(event, **data)
+
+
+class TurnSubscription:
+    """
+    API side: subscribes to a turn's channel. Enter it before enqueueing the turn so no event is missed.
+
+        async with TurnSubscription(client, turn_id) as subscription:
+            run_chat_turn.apply_async(...)
+            async for event in subscription.events(timeout):
+                ...
+    """
+
+    def __init__(self, client, turn_id):
+        self.client = client
+        self.turn_id = turn_id
+        self.pubsub = None
+
+    async def __aenter__(self):
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(turn_channel(self.turn_id))
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            await self.pubsub.unsubscribe()
+            await self.pubsub.reset()
+        except Exception as e:
+            print(f"TurnSubscription: error closing subscription for turn {self.turn_id}: {e}")
+
+    async def events(self, timeout=CHAT_TURN_TIMEOUT):
+        """
+        Yields event dicts until a terminal one (final/error/cancelled). If nothing
+        terminal arrives within timeout seconds, yields a synthetic "error" event.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield {"turn_id": self.turn_id, "event": "error", "status": 504,
+                       "message": f"No result from orchestrator workers after {timeout}s"}
+                return
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1.0))
+            if message is None:
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+
+
+_async_client = None
+
+
+def get_async_redis():
+    """
+    Process-wide asyncio Redis client for the API (None if redis is not installed).
+    """
+    global _async_client
+    if _async_client is None and redis_asyncio is not None:
+        _async_client = redis_asyncio.Redis.from_url(REDIS_URL)
+    return _async_client
+
+
+async def request_cancel(user_id, chat_id):
+    """
+    Asks the orchestrator workers to cancel a running turn. Returns the number of workers that got the request.
+    """
+    client = get_async_redis()
+    if client is None:
+        return 0
+    return await client.publish(CANCEL_CHANNEL, json.dumps({"user_id": user_id, "chat_id": chat_id}))
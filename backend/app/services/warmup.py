@@ -0,0 +1,93 @@
+import os
+import time
+import asyncio
+from .clients import get_embedding_model, get_rerank_model, RERANK_MODEL
+from .llm_usage import usage_context
+from .startup import PROFILE
+
+# Steps run at startup before the API reports ready (empty = none):
+#   embedding: load the embedding model and run a first encode
+#   chroma:    one query against the tools and documents collections and the episodic
+#              collections of the WARMUP_HOT_SESSIONS most recent chats (loads their indexes
+#              and builds their keyword indexes)
+#   rerank:    load the RERANK_MODEL cross-encoder and score one pair (no-op when unset)
+#   llm:       a one-token completion per task in WARMUP_LLM_TASKS (connection setup, litellm import)
+#   mcp:       list_tools on the MCP session
+WARMUP_STEPS = [s.strip() for s in os.getenv("WARMUP_STEPS", "embedding,chroma,rerank,llm,mcp").split(",") if s.strip()]
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "60"))
+WARMUP_HOT_SESSIONS = int(os.getenv("WARMUP_HOT_SESSIONS", "20"))
+WARMUP_LLM_TASKS = [t.strip() for t in os.getenv("WARMUP_LLM_TASKS", "chat").split(",") if t.strip()]
+
+
+async def _warm_embedding(orch):
+    model = await asyncio.to_thread(get_embedding_model)
+    if model is None:
+        raise RuntimeError("embedding model could not be loaded")
+    await asyncio.to_thread(model.encode, "warm up")
+    return {}
+
+
+async def _warm_chroma(orch):
+    def touch():
+        collections = orch.tool_retriever.warm_up() + orch.document_manager.warm_up()
+        sessions = orch.chat_service.recent_sessions(WARMUP_HOT_SESSIONS) if WARMUP_HOT_SESSIONS else []
+        return collections + orch.episodic_memory.warm_up(sessions)
+    return {"collections": await asyncio.to_thread(touch)}
+
+
+async def _warm_rerank(orch):
+    if not RERANK_MODEL:
+        return {"enabled": False}
+    model = await asyncio.to_thread(get_rerank_model)
+    if model is None:
+        raise RuntimeError("rerank model could not be loaded")
+    await asyncio.to_thread(model.predict, [("warm up", "warm up")])
+    return {"model": RERANK_MODEL}
+
+
+async def _warm_llm(orch):
+    with usage_context(user_id="system", turn="warmup"):
+        for task in WARMUP_LLM_TASKS:
+            await orch.llm_completion(task=task, messages=[{"role": "user", "content": "ping"}], max_tokens=1)
+    return {"tasks": WARMUP_LLM_TASKS}
+
+
+async def _warm_mcp(orch):
+    if not orch.session:
+        return {"tools": 0}
+    tools = await orch.session.list_tools()
+    return {"tools": len(tools.tools)}
+
+
+STEPS = {
+    "embedding": _warm_embedding,
+    "chroma": _warm_chroma,
+    "rerank": _warm_rerank,
+    "llm": _warm_llm,
+    "mcp": _warm_mcp,
+}
+
+
+async def run_warmup(orch, steps=None, timeout=WARMUP_STEP_TIMEOUT):
+    """
+    Runs the warm-up steps concurrently and returns {step: {"status", "seconds", ...}}.
+    A failed or timed-out step is reported, not raised; its resource loads on first use instead.
+    """
+    steps = WARMUP_STEPS if steps is None else steps
+
+    async def run_step(name):
+        started = time.perf_counter()
+        try:
+            with PROFILE.phase(f"warmup:{name}"):
+                detail = await asyncio.wait_for(STEPS[name](orch), timeout)
+            result = {"status": "ok", **detail}
+        except Exception as e:
+            print(f"Warm-up step '{name}' failed: {type(e).__name__}: {e}")
+            result = {"status": "error", "error": f"{type(e).__name__}: {e}"[:300]}
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return name, result
+
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        print(f"Ignoring unknown warm-up steps: {unknown}")
+    return dict(await asyncio.gather(*(run_step(s) for s in steps if s in STEPS)))
@@ -1,20 +1,16 @@
+from celery.signals import worker_init
 from .celery_app import celery_app
-from sentence_transformers import SentenceTransformer
-import chromadb
+from .services.clients import get_chroma_client, get_embedding_model
+from .services.episode_ranking import importance_score
 import uuid
 import datetime
 import os
 
-# Global model instance to avoid reloading per task if worker persists
-# However, Celery forks, so we might need to load it lazily or at module level.
-# At module level is standard for "warm" workers.
-print("Loading Embedding Model...")
-# Use a small efficient model
-model = SentenceTransformer('all-MiniLM-L6-v2') 
-print("Model Loaded.")
-
-CHROMA_HOST = "localhost"
-CHROMA_PORT = 8000
+# The API imports this module to dispatch tasks, so the embedding model is not loaded
+# at import time. Workers load it once before forking their pool ("warm" workers).
+@worker_init.connect
+def preload_embedding_model(**kwargs):
+    get_embedding_model()
 
 @celery_app.task
 def embed_and_store_episode(content: str, mode: str, user_id: str):
@@ -24,10 +20,10 @@ def embed_and_store_episode(content: str, mode: str, user_id: str):
     try:
         # Generate Embedding
         print(f"Embedding content for mode '{mode}' user '{user_id}'...")
-        embedding = model.encode(content).tolist()
+        embedding = get_embedding_model().encode(content).tolist()
         
         # Connect to Chroma
-        client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+        client = get_chroma_client()
         
         # User-specific collection
         collection_name = f"episodic_{user_id}_{mode.lower()}"
@@ -38,7 +34,8 @@ def embed_and_store_episode(content: str, mode: str, user_id: str):
             "content": content,
             "timestamp": datetime.datetime.now().isoformat(),
             "mode": mode,
-            "user_id": user_id
+            "user_id": user_id,
+            "importance": importance_score(content)
         }
         
         collection.add(
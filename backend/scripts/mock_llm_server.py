@@ -0,0 +1,77 @@
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal OpenAI-compatible server for exercising the LLM backend pool without a GPU.
+# Usage: python backend/scripts/mock_llm_server.py 1235 1236 1237 [--latency-ms 200]
+
+
+def make_handler(name, latency_ms=0, reply=None):
+    class MockLLMHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json({"object": "list", "data": [{"id": "local-model", "object": "model"}]})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            content = reply or f"[{name}] echo: {request.get('messages', [{}])[-1].get('content', '')}"
+            self._send_json({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "local-model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+            })
+
+    return MockLLMHandler
+
+
+def start_mock_server(port=0, name=None, latency_ms=0, reply=None):
+    """
+    Starts a mock server in a daemon thread. Returns (server, api_base).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(name or f"mock-{port}", latency_ms, reply))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    latency = 0
+    if "--latency-ms" in args:
+        i = args.index("--latency-ms")
+        latency = int(args[i + 1])
+        del args[i:i + 2]
+    ports = [int(p) for p in args] or [1235]
+
+    bases = []
+    for port in ports:
+        _, base = start_mock_server(port, latency_ms=latency)
+        bases.append(base)
+    print(f"Mock LLM servers running. Set LLM_API_BASES={','.join(bases)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
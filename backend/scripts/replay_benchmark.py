@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+
+# Replays chat turns recorded with SESSION_RECORD_FILE=... against mocked backends.
+# No LLM, Chroma, Mongo or Redis is needed; each recorded call returns its recorded
+# result after its recorded latency (times --latency-scale).
+#
+#   python backend/scripts/replay_benchmark.py sessions.json --repeat 5
+#   python backend/scripts/replay_benchmark.py sessions.json --latency-scale 0   # orchestration overhead only
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from backend.app.services.orchestrator import JarvisOrchestrator, TOOLS_DIR, TOOL_DEFINITIONS_FILE
+from backend.app.services.tool_registry import ToolRegistry
+from backend.app.services.background_writer import BackgroundWriter
+from backend.app.services.llm_scheduler import LLMScheduler
+from backend.app.services.tool_output_store import ToolOutputStore
+from backend.app.services.llm_cache import MemoryCacheStore
+from backend.app.services.session_tape import SessionTape, ReplayMismatch, attach_replay
+
+
+def build_replay_orchestrator():
+    """
+    An orchestrator with no external connections; services are attached per turn from the tape.
+    """
+    orchestrator = JarvisOrchestrator.__new__(JarvisOrchestrator)
+    orchestrator.helper_tools = orchestrator._define_internal_tools()
+    orchestrator.tool_registry = ToolRegistry(TOOL_DEFINITIONS_FILE, TOOLS_DIR)
+    orchestrator.tool_collection = object() # Retrieval results come from the tape
+    orchestrator.llm_scheduler = LLMScheduler()
+    orchestrator.background_writer = BackgroundWriter()
+    orchestrator.background_tasks = set()
+    orchestrator.active_turns = {}
+    orchestrator.loop_stats = Counter()
+    orchestrator.tool_output_store = ToolOutputStore(store=MemoryCacheStore())
+    orchestrator.session_tape = None
+    orchestrator.real_tool_names = set()
+    orchestrator.read_only_mcp_tools = set()
+    return orchestrator
+
+
+async def replay_turn(orchestrator, turn, latency_scale):
+    queues = attach_replay(orchestrator, turn, latency_scale)
+    orchestrator.tool_registry.tool_defs = dict(turn["tool_defs"])
+    recorded_llm_calls = sum(1 for e in turn["events"] if e["name"] == "llm_completion")
+
+    started = time.perf_counter()
+    error = None
+    try:
+        response = await orchestrator.process_message(turn["user_input"], turn["user_id"], turn["chat_id"])
+    except ReplayMismatch as e:
+        response, error = None, str(e)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # Background work (chat title) is not part of the response time
+    await asyncio.gather(*orchestrator.background_tasks, return_exceptions=True)
+
+    left_llm_calls = sum(len(q) for (t, n, _), q in queues.items() if n == "llm_completion")
+    return {
+        "user_input": turn["user_input"][:60],
+        "recorded_ms": turn["elapsed_ms"],
+        "replay_ms": round(elapsed_ms, 2),
+        "llm_calls": recorded_llm_calls - left_llm_calls,
+        "recorded_llm_calls": recorded_llm_calls,
+        "matches_recording": error is None and response == turn["response"],
+        "error": error
+    }
+
+
+async def run(tape, repeat, latency_scale):
+    orchestrator = build_replay_orchestrator()
+    await orchestrator.background_writer.start()
+    results = []
+    try:
+        for _ in range(repeat):
+            for turn in tape.turns:
+                results.append(await replay_turn(orchestrator, turn, latency_scale))
+    finally:
+        await orchestrator.background_writer.stop()
+    return results
+
+
+def summarize(results):
+    times = sorted(r["replay_ms"] for r in results)
+    return {
+        "turns": len(results),
+        "mean_ms": round(statistics.mean(times), 2),
+        "p50_ms": round(times[len(times) // 2], 2),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 2),
+        "llm_calls": sum(r["llm_calls"] for r in results),
+        "recorded_llm_calls": sum(r["recorded_llm_calls"] for r in results),
+        "mismatched_turns": sum(1 for r in results if not r["matches_recording"])
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded chat sessions and time the orchestrator.")
+    parser.add_argument("tapes", nargs="+", help="Session files recorded with SESSION_RECORD_FILE")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier for recorded latencies (0 = measure orchestration overhead only)")
+    parser.add_argument("--json", help="Write per-turn results and the summary to this file")
+    args = parser.parse_args()
+
+    all_results = []
+    for path in args.tapes:
+        tape = SessionTape.load(path)
+        results = asyncio.run(run(tape, args.repeat, args.latency_scale))
+        for r in results:
+            status = "ok" if r["matches_recording"] else f"MISMATCH {r['error'] or ''}"
+            print(f"{r['replay_ms']:>9.1f} ms  (recorded {r['recorded_ms']} ms)  llm={r['llm_calls']}  {status}  {r['user_input']!r}")
+        all_results.extend(results)
+
+    summary = summarize(all_results)
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "turns": all_results}, f, indent=2)
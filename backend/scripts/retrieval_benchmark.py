@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import statistics
+
+# Retrieval quality and latency: vector-only vs BM25-only vs hybrid (RRF) vs hybrid + rerank.
+#
+#   python backend/scripts/retrieval_benchmark.py
+#   python backend/scripts/retrieval_benchmark.py --rerank-model cross-encoder/ms-marco-MiniLM-L-6-v2
+#   python backend/scripts/retrieval_benchmark.py --corpus corpus.jsonl --queries queries.jsonl
+#
+# The default corpus is synthetic: episode-like notes mentioning error codes, file names
+# and identifiers, plus paraphrased facts, with queries of each kind ("exact" and
+# "semantic"). Your own data: corpus lines {"id", "text"}, query lines
+# {"query", "relevant": [ids], "kind"}. Everything runs against an in-memory Chroma
+# collection with the shared embedding model (EMBEDDING_MODEL).
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+SEMANTIC_PAIRS = [
+    ("We agreed to move the weekly planning meeting from Monday morning to Thursday afternoon.",
+     "when is the weekly planning sync now?"),
+    ("The user prefers answers that are short and come with a code example.",
+     "how does the user like responses formatted?"),
+    ("Budget for the office relocation was capped at forty thousand euros by finance.",
+     "what is the spending limit for moving offices?"),
+    ("The mobile app crashes on older Android phones because of a memory leak in image caching.",
+     "why does the phone application keep closing on old devices?"),
+    ("Sarah will take over the on-call rotation while Tom is on parental leave.",
+     "who covers on-call duty during Tom's absence?"),
+    ("We switched the nightly backups to run at 2am to avoid overlapping with the ETL jobs.",
+     "what time do the backups run and why was it changed?"),
+    ("The customer churn analysis showed most cancellations happen in the first thirty days.",
+     "when do customers usually cancel their subscription?"),
+    ("Staging uses a smaller database instance to keep cloud costs down.",
+     "why is the test environment database less powerful?"),
+    ("The user is allergic to peanuts and avoids restaurants that cook with nut oils.",
+     "what food restrictions should I keep in mind for dinner plans?"),
+    ("Release 3.2 was postponed two weeks because the payment provider changed its API.",
+     "why was the next version delayed?"),
+    ("The team decided to write new services in Go instead of Java for faster startup.",
+     "which programming language was chosen for new backends?"),
+    ("The user's daughter starts school in September and needs a laptop for classes.",
+     "what does the kid need for the start of the academic year?"),
+    ("Search latency regressed after the index was rebuilt without the compression option.",
+     "what made queries slower recently?"),
+    ("We rotate API keys every ninety days and store them in the secrets manager.",
+     "how often are credentials replaced?"),
+    ("The marketing site is hosted on a CDN while the dashboard runs on our own servers.",
+     "where is the public website served from?"),
+    ("The user trains for a half marathon and runs three times a week.",
+     "what sport is the user preparing for?"),
+]
+
+ACTIONS = ["deploying the api", "running migrations", "syncing the calendar", "building the docker image",
+           "uploading the report", "refreshing the token", "parsing the invoice", "resizing thumbnails"]
+HOSTS = ["prod-eu-1", "prod-us-2", "staging", "worker-3", "laptop", "ci-runner-7"]
+TOPICS = ["the onboarding checklist", "quarterly revenue", "database sharding", "the holiday schedule",
+          "retry policies", "the pricing experiment", "release notes", "the hiring plan"]
+EXTENSIONS = ["pdf", "md", "py", "docx", "csv"]
+
+
+def synthetic_dataset(rng, n_distractors):
+    corpus, queries = [], []
+
+    def add(text):
+        doc_id = f"doc-{len(corpus)}"
+        corpus.append({"id": doc_id, "text": text})
+        return doc_id
+
+    for statement, question in SEMANTIC_PAIRS:
+        queries.append({"query": question, "relevant": [add(statement)], "kind": "semantic"})
+
+    # Exact identifiers: each target shares its wording with many distractors and only
+    # the code / file name / symbol tells them apart
+    for i in range(len(SEMANTIC_PAIRS)):
+        code = f"E{rng.randint(1000, 9999)}_{rng.choice(['TIMEOUT', 'CONN_RESET', 'AUTH', 'QUOTA'])}"
+        doc_id = add(f"Failed with {code} while {rng.choice(ACTIONS)} on {rng.choice(HOSTS)}.")
+        queries.append({"query": f"what happened with {code}?", "relevant": [doc_id], "kind": "exact"})
+
+        filename = f"{rng.choice(['budget', 'roadmap', 'minutes', 'spec', 'audit'])}_{rng.randint(2019, 2025)}_{i}.{rng.choice(EXTENSIONS)}"
+        doc_id = add(f"Notes from {filename} about {rng.choice(TOPICS)}.")
+        queries.append({"query": f"open {filename}", "relevant": [doc_id], "kind": "exact"})
+
+        symbol = f"{rng.choice(['load', 'sync', 'parse', 'flush'])}{rng.choice(['User', 'Order', 'Cache', 'Ledger'])}{rng.choice(['State', 'Batch', 'Index'])}{i}"
+        doc_id = add(f"The bug was in {symbol}, which dropped the last item of each page.")
+        queries.append({"query": f"bug in {symbol}", "relevant": [doc_id], "kind": "exact"})
+
+    for _ in range(n_distractors):
+        kind = rng.random()
+        if kind < 0.4:
+            code = f"E{rng.randint(1000, 9999)}_{rng.choice(['TIMEOUT', 'CONN_RESET', 'AUTH', 'QUOTA'])}"
+            add(f"Failed with {code} while {rng.choice(ACTIONS)} on {rng.choice(HOSTS)}.")
+        elif kind < 0.7:
+            filename = f"{rng.choice(['budget', 'roadmap', 'minutes', 'spec', 'audit'])}_{rng.randint(2019, 2025)}_{rng.randint(100, 999)}.{rng.choice(EXTENSIONS)}"
+            add(f"Notes from {filename} about {rng.choice(TOPICS)}.")
+        else:
+            add(f"Discussed {rng.choice(TOPICS)} and {rng.choice(TOPICS)} with the team on {rng.choice(HOSTS)}.")
+    return corpus, queries
+
+
+def load_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def evaluate(name, search, queries, k):
+    by_kind, latencies = {}, []
+    for q in queries:
+        started = time.perf_counter()
+        ids = search(q["query"], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rank = next((i + 1 for i, doc_id in enumerate(ids) if doc_id in q["relevant"]), None)
+        for kind in ("all", q.get("kind", "all")):
+            stats = by_kind.setdefault(kind, {"hits": 0, "rr": 0.0, "n": 0})
+            stats["n"] += 1
+            stats["hits"] += rank is not None
+            stats["rr"] += 1.0 / rank if rank else 0.0
+    return {
+        "method": name,
+        **{f"recall@{k}:{kind}": round(s["hits"] / s["n"], 3) for kind, s in by_kind.items()},
+        **{f"mrr:{kind}": round(s["rr"] / s["n"], 3) for kind, s in by_kind.items()},
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector, keyword, hybrid and reranked retrieval.")
+    parser.add_argument("--corpus", help="JSONL of {id, text}")
+    parser.add_argument("--queries", help="JSONL of {query, relevant, kind}")
+    parser.add_argument("--distractors", type=int, default=2000, help="Synthetic distractor documents")
+    parser.add_argument("-k", type=int, default=3, help="Results per query (search_episodes uses 2, search_documents 3)")
+    parser.add_argument("--rerank-model", default=os.getenv("RERANK_MODEL", ""), help="Cross-encoder to add a reranked run")
+    parser.add_argument("--rerank-budget-ms", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    import chromadb
+    from backend.app.services.clients import get_embedding_model
+    from backend.app.services.hybrid_search import HybridRetriever, CrossEncoderReranker, RERANK_BUDGET_MS
+
+    if args.corpus and args.queries:
+        corpus, queries = load_jsonl(args.corpus), load_jsonl(args.queries)
+    else:
+        corpus, queries = synthetic_dataset(random.Random(7), args.distractors)
+
+    model = get_embedding_model()
+    if model is None:
+        print("Embedding model could not be loaded")
+        return 1
+    collection = chromadb.EphemeralClient().create_collection(f"retrieval_bench_{uuid.uuid4().hex[:8]}")
+    for start in range(0, len(corpus), 500):
+        batch = corpus[start:start + 500]
+        collection.add(
+            ids=[d["id"] for d in batch],
+            documents=[d["text"] for d in batch],
+            embeddings=[e.tolist() for e in model.encode([d["text"] for d in batch])]
+        )
+    print(f"Indexed {len(corpus)} documents, {len(queries)} queries", file=sys.stderr)
+
+    hybrid = HybridRetriever(collection)
+    hybrid.sync(force=True)
+
+    def embed(query):
+        return [model.encode(query).tolist()]
+
+    methods = [
+        ("vector", lambda q, k: [h["id"] for h in hybrid.vector_search(k, query_embeddings=embed(q))]),
+        ("keyword", lambda q, k: [h["id"] for h in hybrid.keyword_search(q, k)]),
+        ("hybrid", lambda q, k: [h["id"] for h in hybrid.search(q, k, query_embeddings=embed(q))]),
+    ]
+    if args.rerank_model:
+        from sentence_transformers import CrossEncoder
+        cross_encoder = CrossEncoder(args.rerank_model, device="cpu")
+        cross_encoder.predict([("warm up", "warm up")])
+        budget = args.rerank_budget_ms if args.rerank_budget_ms is not None else RERANK_BUDGET_MS
+        reranked = HybridRetriever(collection, reranker=CrossEncoderReranker(lambda: cross_encoder, budget_ms=budget))
+        reranked.index = hybrid.index
+        methods.append((f"hybrid+rerank({budget:g}ms)", lambda q, k: [h["id"] for h in reranked.search(q, k, query_embeddings=embed(q))]))
+
+    for _, search in methods: # first-query costs (model, index) out of the timings
+        search(queries[0]["query"], args.k)
+    results = [evaluate(name, search, queries, args.k) for name, search in methods]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    columns = [c for c in results[0] if c != "method"]
+    print(f"{'method':<26}" + "".join(f"{c:>20}" for c in columns))
+    for row in results:
+        print(f"{row['method']:<26}" + "".join(f"{row.get(c, ''):>20}" for c in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
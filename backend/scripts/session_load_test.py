@@ -0,0 +1,126 @@
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Load test for per-user session state across several API workers. Start the API with
+# more than one worker, e.g.
+#
+#   uvicorn backend.app.main:app --port 8001 --workers 4
+#   python backend/scripts/session_load_test.py --base-url http://localhost:8001 --users 20 --iterations 25
+#
+# Each simulated user keeps switching its own mode/persona/tone and checks after every
+# switch that the next request (served by whichever worker) sees its own state and not
+# another user's. With --chat, every iteration also sends a chat message and checks
+# the mode reported by the turn (needs an LLM, e.g. backend/scripts/mock_llm_server.py).
+# Exits with status 1 if any user ever saw the wrong state.
+
+MODES = ["Work", "Personal"]
+PERSONAS = ["Generalist", "Coder", "Architect", "Sentinel"]
+TONES = ["Professional", "Casual", "Concise"]
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.token = None
+        self.latencies = []
+
+    def request(self, method, path, payload=None, form=None):
+        headers = {}
+        data = None
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                body = json.loads(resp.read() or b"null")
+        finally:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+        return body
+
+    def login(self, username, password):
+        try:
+            self.request("POST", "/auth/signup", {"username": username, "password": password})
+        except urllib.error.HTTPError as e:
+            if e.code != 400: # Already registered
+                raise
+        self.token = self.request("POST", "/auth/login", form={"username": username, "password": password})["access_token"]
+
+
+def run_user(args, index):
+    username = f"{args.prefix}_{index}"
+    client = Client(args.base_url, args.timeout)
+    client.login(username, args.password)
+    rng = random.Random(f"{args.prefix}-{index}")
+    chat_id = client.request("POST", "/chats", {"mode": "Work", "title": "load test"})["_id"] if args.chat else None
+    mismatches = []
+
+    for i in range(args.iterations):
+        expected = {"mode": rng.choice(MODES), "persona": rng.choice(PERSONAS), "tone": rng.choice(TONES)}
+        client.request("POST", "/mode", {"mode": expected["mode"]})
+        client.request("POST", "/persona", {"persona": expected["persona"]})
+        client.request("POST", "/tone", {"tone": expected["tone"]})
+
+        seen = client.request("GET", "/session")
+        if seen != expected:
+            mismatches.append({"user": username, "iteration": i, "expected": expected, "seen": seen})
+        modes = client.request("GET", "/modes")
+        if modes["current_mode"] != expected["mode"]:
+            mismatches.append({"user": username, "iteration": i, "expected": expected["mode"], "seen": modes["current_mode"]})
+        if chat_id:
+            turn = client.request("POST", "/chat", {"message": f"ping {i}", "chat_id": chat_id})
+            if turn.get("current_mode") != expected["mode"]:
+                mismatches.append({"user": username, "iteration": i, "expected": expected["mode"], "seen": turn.get("current_mode")})
+    return mismatches, client.latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check per-user session state under concurrent load on several workers.")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=25)
+    parser.add_argument("--prefix", default="loadtest")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--chat", action="store_true", help="Also run a chat turn per iteration")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        results = list(pool.map(lambda i: run_user(args, i), range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    mismatches = [m for user_mismatches, _ in results for m in user_mismatches]
+    latencies = sorted(l for _, user_latencies in results for l in user_latencies)
+    summary = {
+        "users": args.users,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "mismatches": len(mismatches)
+    }
+    for m in mismatches[:10]:
+        print(f"MISMATCH {json.dumps(m)}")
+    print(json.dumps(summary, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
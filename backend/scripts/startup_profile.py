@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+# Cold-start profile of the orchestrator: heavy imports and init phases, the same
+# numbers the API serves on /startup/profile. Run it in a fresh process:
+#
+#   python backend/scripts/startup_profile.py
+#   python backend/scripts/startup_profile.py --no-start --max-up-seconds 5   # fail on regressions
+#   STARTUP_INIT_WORKERS=1 python backend/scripts/startup_profile.py          # sequential init, for comparison
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from backend.app.services.startup import PROFILE, UP, WARM # Before anything heavy
+from backend.app.services.warmup import run_warmup
+
+
+async def run(args):
+    with PROFILE.phase("import:orchestrator"):
+        from backend.app.services.orchestrator import JarvisOrchestrator
+    orchestrator = await asyncio.to_thread(PROFILE.run, "init:orchestrator", JarvisOrchestrator)
+    if not args.no_start:
+        with PROFILE.phase("start:orchestrator"):
+            await orchestrator.start()
+    PROFILE.mark(UP)
+    if not args.no_warmup:
+        print(json.dumps(await run_warmup(orchestrator), indent=2))
+    PROFILE.mark(WARM)
+    if not args.no_start:
+        await orchestrator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile orchestrator cold start.")
+    parser.add_argument("--no-start", action="store_true", help="Skip orchestrator.start() (MCP server, tool workers)")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the warm-up steps (WARMUP_STEPS)")
+    parser.add_argument("--max-up-seconds", type=float, help="Exit with status 1 if 'up' takes longer")
+    parser.add_argument("--max-warm-seconds", type=float, help="Exit with status 1 if 'warm' takes longer")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+    report = PROFILE.report()
+    print(json.dumps(report, indent=2))
+    PROFILE.print_summary()
+
+    if args.max_up_seconds is not None and report["up_after_s"] > args.max_up_seconds:
+        print(f"REGRESSION: up after {report['up_after_s']}s > {args.max_up_seconds}s")
+        return 1
+    if args.max_warm_seconds is not None and report["warm_after_s"] > args.max_warm_seconds:
+        print(f"REGRESSION: warm after {report['warm_after_s']}s > {args.max_warm_seconds}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
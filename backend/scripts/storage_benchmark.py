@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import statistics
+import subprocess
+
+# Per-request storage latency: networked (Mongo + Chroma server) vs embedded
+# (SQLite document store + Chroma PersistentClient in process).
+#
+#   python backend/scripts/storage_benchmark.py --backend both
+#   python backend/scripts/storage_benchmark.py --backend embedded --requests 500
+#
+# The document side goes through the services (SemanticMemory, ChatService); the vector
+# side queries episode/document/tool-sized collections on the services' shared Chroma
+# client with fixed random embeddings, so the numbers are storage cost only (no model).
+# Seeded data is namespaced per run and removed afterwards. Embedded runs use a
+# temporary data directory unless --data-dir is given.
+
+EMBEDDING_DIM = 384
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def timed(samples, name, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def random_vector(rng):
+    vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIM)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def run_backend(args):
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "embedded":
+        import tempfile
+        os.environ.setdefault("EMBEDDED_DATA_DIR", args.data_dir or tempfile.mkdtemp(prefix="jarvis_bench_"))
+
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+    from backend.app.services.clients import get_chroma_client
+    from backend.app.services.memory_manager import SemanticMemory
+    from backend.app.services.chat_service import ChatService
+
+    rng = random.Random(42)
+    run_id = uuid.uuid4().hex[:8]
+    user_id = f"bench_{run_id}"
+    facts, chats = SemanticMemory(), ChatService()
+    chroma = get_chroma_client()
+    collections = {
+        "episodes": chroma.get_or_create_collection(f"bench_episodes_{run_id}"),
+        "documents": chroma.get_or_create_collection(f"bench_documents_{run_id}", metadata={"hnsw:space": "cosine"}),
+        "tools": chroma.get_or_create_collection(f"bench_tools_{run_id}"),
+    }
+
+    # Seed
+    for i in range(args.facts):
+        facts.save_fact(f"Benchmark fact {i} about project-{i % 17}", mode="Work", user_id=user_id)
+    chat_ids = [chats.create_chat(user_id, "Work", title=f"Bench chat {i}")["_id"] for i in range(args.chats)]
+    for chat_id in chat_ids:
+        for j in range(args.messages):
+            chats.add_message(chat_id, user_id, "user" if j % 2 == 0 else "assistant", f"message {j} " * 20)
+    for name, size in (("episodes", args.episodes), ("documents", args.documents), ("tools", args.tools)):
+        for start in range(0, size, 500):
+            ids = [f"{name}-{i}" for i in range(start, min(size, start + 500))]
+            collections[name].add(
+                ids=ids,
+                embeddings=[random_vector(rng) for _ in ids],
+                documents=[f"{name} text {i}" for i in ids],
+                metadatas=[{"user_id": user_id, "n": i} for i in range(start, start + len(ids))]
+            )
+
+    queries = [random_vector(rng) for _ in range(32)]
+    samples = {}
+    try:
+        for i in range(args.requests):
+            chat_id = chat_ids[i % len(chat_ids)]
+            query = queries[i % len(queries)]
+            timed(samples, "facts.get_all", facts.get_all_facts, mode="Work", user_id=user_id)
+            timed(samples, "facts.search", facts.search_facts, f"project-{i % 17}", mode="Work", user_id=user_id)
+            timed(samples, "chat.get", chats.get_chat, chat_id, user_id)
+            timed(samples, "chat.list", chats.get_chats, user_id, "Work")
+            timed(samples, "chat.add_message", chats.add_message, chat_id, user_id, "user", f"bench {i}")
+            timed(samples, "episodes.query", collections["episodes"].query, query_embeddings=[query], n_results=3)
+            timed(samples, "documents.query", collections["documents"].query, query_embeddings=[query], n_results=5)
+            timed(samples, "tools.query", collections["tools"].query, query_embeddings=[query], n_results=5)
+    finally:
+        facts.delete_mode("Work", user_id=user_id)
+        for chat_id in chat_ids:
+            chats.delete_chat(chat_id, user_id)
+        for collection in collections.values():
+            chroma.delete_collection(collection.name)
+
+    return {
+        "backend": args.backend,
+        "requests": args.requests,
+        "ops": {
+            name: {
+                "p50_ms": round(statistics.median(values), 3),
+                "p95_ms": round(percentile(values, 0.95), 3),
+                "mean_ms": round(statistics.fmean(values), 3)
+            }
+            for name, values in samples.items()
+        }
+    }
+
+
+def compare(args):
+    results = {}
+    for backend in ("networked", "embedded"):
+        cmd = [sys.executable, __file__, "--backend", backend, "--json"] + [
+            f"--{k.replace('_', '-')}={v}" for k, v in vars(args).items()
+            if k not in ("backend", "json") and v is not None
+        ]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{backend} run failed:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}")
+            return 1
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"{'operation':<20}{'networked p50':>15}{'embedded p50':>15}{'networked p95':>15}{'embedded p95':>15}{'speedup':>10}")
+    for name, net in results["networked"]["ops"].items():
+        emb = results["embedded"]["ops"][name]
+        speedup = net["p50_ms"] / emb["p50_ms"] if emb["p50_ms"] else float("inf")
+        print(f"{name:<20}{net['p50_ms']:>15}{emb['p50_ms']:>15}{net['p95_ms']:>15}{emb['p95_ms']:>15}{speedup:>9.1f}x")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare networked and embedded storage latency.")
+    parser.add_argument("--backend", choices=["networked", "embedded", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--facts", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per seeded chat")
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--tools", type=int, default=200)
+    parser.add_argument("--data-dir", help="Embedded data directory (default: a temporary one)")
+    parser.add_argument("--json", action="store_true", help="Print only the JSON result")
+    args = parser.parse_args()
+
+    if args.backend == "both":
+        return compare(args)
+    result = run_backend(args)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
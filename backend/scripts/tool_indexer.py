@@ -1,12 +1,17 @@
-import chromadb
 import json
 import os
 import sys
 from pathlib import Path
 
-# Connect to ChromaDB (assuming it's running via Docker on localhost:8000)
+# Adjust path to import backend modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from backend.app.services.tool_registry import sync_tool_index
+from backend.app.services.clients import get_chroma_client
+
+# Connect to ChromaDB: the server on localhost:8000 (Docker), or the embedded store under
+# CHROMA_DB_PATH with STORAGE_BACKEND=embedded (stop the API first, it owns that store)
 try:
-    client = chromadb.HttpClient(host='localhost', port=8000)
+    client = get_chroma_client()
     print("Connected to ChromaDB")
 except Exception as e:
     print(f"Failed to connect to ChromaDB: {e}")
@@ -21,65 +26,35 @@ DATA_DIR = BASE_DIR / "backend" / "data"
 DUMMY_TOOLS_PATH = DATA_DIR / "dummy_tools.json"
 TOOL_DEFINITIONS_PATH = BASE_DIR / "tool_definitions.json"
 
-def index_tools():
-    # Re-create collection to ensure clean state
-    try:
-        client.delete_collection(COLLECTION_NAME)
-        print(f"Deleted existing collection '{COLLECTION_NAME}'")
-    except Exception:
-        pass
-
-    collection = client.create_collection(name=COLLECTION_NAME)
-    print(f"Created collection '{COLLECTION_NAME}'")
-
-    # Load dummy tools
-    tools = []
-    if os.path.exists(DUMMY_TOOLS_PATH):
-        with open(DUMMY_TOOLS_PATH, "r") as f:
-            tools.extend(json.load(f))
-    else:
-        print(f"Warning: {DUMMY_TOOLS_PATH} not found.")
+def _load_json_list(path):
+    if not os.path.exists(path):
+        print(f"Warning: {path} not found.")
+        return []
+    with open(path, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            print(f"Warning: {path} is empty or invalid.")
+            return []
 
-    # Load Dynamic Tools
-    if os.path.exists(TOOL_DEFINITIONS_PATH):
-        with open(TOOL_DEFINITIONS_PATH, "r") as f:
-            try:
-                dynamic_tools = json.load(f)
-                tools.extend(dynamic_tools)
-                print(f"Loaded {len(dynamic_tools)} dynamic tools.")
-            except json.JSONDecodeError:
-                print("Warning: tool_definitions.json is empty or invalid.")
-    else:
-        print(f"Warning: {TOOL_DEFINITIONS_PATH} not found.")
-
-    if not tools:
-        print("No tools found to index.")
-        return
-
-    ids = []
-    documents = [] # We'll embed the description + name
-    metadatas = []
-
-    for tool in tools:
-        tool_name = tool["name"]
-        tool_desc = tool["description"]
-        # Convert schema to string for metadata storage if needed, 
-        # but for retrieval, we mostly need the full JSON to pass to LLM.
-        # We can store the full JSON string in metadata or reconstruct it.
-        # Storing in metadata is easiest for retrieval.
-        
-        ids.append(tool_name)
-        # Embed the combination of name and description for semantic search validation
-        documents.append(f"{tool_name}: {tool_desc}") 
-        metadatas.append({"json": json.dumps(tool)})
-        
-    # Upsert
-    collection.add(
-        ids=ids,
-        documents=documents,
-        metadatas=metadatas
-    )
-    print(f"Successfully indexed {len(tools)} tools.")
+def index_tools():
+    # Incremental: only new/changed tools are embedded, removed ones are deleted.
+    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+
+    # Each source is pruned independently so dummy tools and dynamic tools don't evict each other
+    dummy_tools = _load_json_list(DUMMY_TOOLS_PATH)
+    # Match the orchestrator, which only registers tools whose file exists
+    dynamic_tools = [
+        t for t in _load_json_list(TOOL_DEFINITIONS_PATH)
+        if (BASE_DIR / "tools" / t.get("filename", "")).is_file()
+    ]
+    print(f"Loaded {len(dummy_tools)} dummy tools and {len(dynamic_tools)} dynamic tools.")
+
+    # Entries indexed before sources were recorded are tagged by whichever sync defines them
+    dummy_stats = sync_tool_index(collection, dummy_tools, source="dummy")
+    print(f"Dummy tools: {dummy_stats}")
+    dynamic_stats = sync_tool_index(collection, dynamic_tools, source="definitions")
+    print(f"Dynamic tools: {dynamic_stats}")
 
 if __name__ == "__main__":
     index_tools()
@@ -0,0 +1,61 @@
+import unittest
+import asyncio
+from backend.app.services.background_writer import BackgroundWriter
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    def test_writes_run_in_order_after_submit(self):
+        async def scenario():
+            writer = BackgroundWriter(max_pending=10)
+            await writer.start()
+            written = []
+            writer.submit("a", written.append, 1)
+            writer.submit("b", written.append, 2)
+            await writer.stop()
+            return written, writer.stats()
+
+        written, stats = asyncio.run(scenario())
+        self.assertEqual(written, [1, 2])
+        self.assertEqual(stats["written"], 2)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_failed_write_is_retried_then_counted(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ConnectionError("mongo down")
+
+        def always_false():
+            return False
+
+        async def scenario():
+            writer = BackgroundWriter(max_retries=2, retry_backoff=0)
+            await writer.start()
+            writer.submit("flaky", flaky)
+            writer.submit("broken", always_false)
+            await writer.stop()
+            return writer.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(stats["written"], 1)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["retried"], 3)
+
+    def test_full_queue_drops_writes(self):
+        async def scenario():
+            writer = BackgroundWriter(max_pending=1)
+            await writer.start()
+            results = [writer.submit("w", lambda: None) for _ in range(3)]
+            await writer.stop()
+            return results, writer.stats()
+
+        results, stats = asyncio.run(scenario())
+        self.assertEqual(results, [True, False, False])
+        self.assertEqual(stats["dropped"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import time
+import unittest
+from backend.app.services.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, GuardedProxy, GuardedCursor, is_connection_error,
+    CLOSED, OPEN, HALF_OPEN
+)
+
+
+class ServerSelectionTimeoutError(ConnectionError):
+    # Stands in for pymongo's (which may not be installed); a ConnectionError counts as unreachable
+    pass
+
+
+class FlakyCollection:
+    def __init__(self, delay=0.0):
+        self.down = True
+        self.delay = delay
+        self.calls = 0
+
+    def find_one(self, query):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.down:
+            raise ServerSelectionTimeoutError("localhost:27017: [Errno 111] Connection refused")
+        return {"_id": query["_id"]}
+
+    def insert_one(self, doc):
+        raise ValueError("duplicate key")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("mongo", failure_threshold=3, reset_seconds=0.2)
+        self.collection = FlakyCollection(delay=0.05)
+        self.guarded = GuardedProxy(self.collection, self.breaker)
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        for _ in range(3):
+            with self.assertRaises(ServerSelectionTimeoutError):
+                self.guarded.find_one({"_id": "a"})
+        self.assertEqual(self.breaker.state, OPEN)
+
+        started = time.perf_counter()
+        with self.assertRaises(CircuitOpenError):
+            self.guarded.find_one({"_id": "a"})
+        self.assertLess(time.perf_counter() - started, 0.01)
+        self.assertEqual(self.collection.calls, 3) # The open circuit never reached the dependency
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_half_open_probe_closes_on_success(self):
+        for _ in range(3):
+            with self.assertRaises(ServerSelectionTimeoutError):
+                self.guarded.find_one({"_id": "a"})
+        time.sleep(0.25)
+        self.collection.down = False
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow()) # Only one probe at a time
+        self.breaker.record_success()
+        self.assertEqual(self.guarded.find_one({"_id": "a"}), {"_id": "a"})
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            with self.assertRaises(ServerSelectionTimeoutError):
+                self.guarded.find_one({"_id": "a"})
+        time.sleep(0.25)
+        with self.assertRaises(ServerSelectionTimeoutError):
+            self.guarded.find_one({"_id": "a"})
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.guarded.find_one({"_id": "a"})
+
+    def test_application_errors_do_not_trip(self):
+        for _ in range(5):
+            with self.assertRaises(ValueError):
+                self.guarded.insert_one({"_id": "a"})
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertFalse(is_connection_error(ValueError("duplicate key")))
+        self.assertTrue(is_connection_error(ConnectionRefusedError()))
+        self.assertTrue(is_connection_error(CircuitOpenError("mongo", 1.0)))
+
+    def test_only_client_connection_errors_count(self):
+        import sqlite3
+        self.assertFalse(is_connection_error(FileNotFoundError("tools/missing.py")))
+        self.assertFalse(is_connection_error(sqlite3.OperationalError("no such table: chunks")))
+        self.assertFalse(is_connection_error(ValueError("Could not connect to tenant default_tenant")))
+        self.assertFalse(is_connection_error(TimeoutError("tool timed out")))
+        try:
+            try:
+                raise ConnectionResetError("reset by peer")
+            except ConnectionResetError as e:
+                raise RuntimeError("query failed") from e
+        except RuntimeError as wrapped:
+            self.assertTrue(is_connection_error(wrapped))
+
+    def test_interrupted_probe_frees_the_half_open_slot(self):
+        for _ in range(3):
+            with self.assertRaises(ServerSelectionTimeoutError):
+                self.guarded.find_one({"_id": "a"})
+        time.sleep(0.25)
+
+        def interrupted():
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.breaker.call(interrupted)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.collection.down = False
+        self.assertEqual(self.guarded.find_one({"_id": "a"}), {"_id": "a"})
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_cursor_iteration_is_guarded(self):
+        def failing_cursor():
+            raise ServerSelectionTimeoutError("no servers")
+            yield
+
+        for _ in range(3):
+            with self.assertRaises(ServerSelectionTimeoutError):
+                list(GuardedCursor(failing_cursor(), self.breaker))
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            list(GuardedCursor(iter([1, 2]), self.breaker))
+
+
+if __name__ == '__main__':
+    unittest.main()
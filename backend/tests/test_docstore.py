@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from backend.app.services.docstore import EmbeddedDocumentClient
+from backend.app.services.llm_usage import LLMUsageRecorder, usage_context
+
+
+class TestEmbeddedDocumentStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "documents.sqlite3")
+        self.client = EmbeddedDocumentClient(self.path)
+        self.chats = self.client["jarvis_db"]["chats"]
+
+    def tearDown(self):
+        self.client.close()
+        shutil.rmtree(self.dir)
+
+    def test_crud_and_queries(self):
+        chat_id = self.chats.insert_one({"user_id": "u1", "mode": "Work", "created_at": "2024-01-02", "messages": []}).inserted_id
+        self.chats.insert_many([
+            {"user_id": "u1", "mode": "Personal", "created_at": "2024-01-03", "messages": []},
+            {"user_id": "u2", "mode": "Work", "created_at": "2024-01-01", "messages": []},
+        ])
+
+        self.assertEqual(self.chats.find_one({"_id": chat_id, "user_id": "u1"})["mode"], "Work")
+        self.assertIsNone(self.chats.find_one({"_id": chat_id, "user_id": "u2"}))
+        self.assertEqual(self.chats.count_documents({"mode": "Work"}), 2)
+        self.assertEqual(sorted(self.chats.distinct("mode")), ["Personal", "Work"])
+
+        newest = list(self.chats.find({}, {"user_id": 1, "_id": 0}).sort("created_at", -1).limit(2))
+        self.assertEqual(newest, [{"user_id": "u1"}, {"user_id": "u1"}])
+        self.assertEqual(len(list(self.chats.find({"user_id": {"$in": ["u2", "u9"]}}))), 1)
+        self.assertEqual(len(list(self.chats.find({"mode": {"$ne": "Work"}}))), 1)
+
+        result = self.chats.update_one({"_id": chat_id}, {"$push": {"messages": {"role": "user", "content": "hi"}}})
+        self.assertEqual(result.modified_count, 1)
+        self.assertEqual(self.chats.find_one({"_id": chat_id})["messages"][0]["content"], "hi")
+        self.assertEqual(self.chats.update_one({"_id": "missing"}, {"$set": {"title": "x"}}).modified_count, 0)
+
+        self.assertEqual(self.chats.delete_many({"user_id": "u1"}).deleted_count, 2)
+        self.assertEqual(self.chats.count_documents({}), 1)
+
+    def test_returned_documents_are_copies(self):
+        doc_id = self.chats.insert_one({"messages": []}).inserted_id
+        doc = self.chats.find_one({"_id": doc_id})
+        doc["messages"].append("mutated")
+        self.assertEqual(self.chats.find_one({"_id": doc_id})["messages"], [])
+
+    def test_regex_and_upsert(self):
+        facts = self.client["jarvis_db"]["facts"]
+        facts.insert_many([{"fact": "Likes Python"}, {"fact": "lives in Paris"}])
+        self.assertEqual(len(list(facts.find({"fact": {"$regex": "PYTHON", "$options": "i"}}))), 1)
+
+        sessions = self.client["jarvis_db"]["session_state"]
+        doc = sessions.find_one_and_update({"_id": "u1"}, {"$set": {"mode": "Personal", "updated_at": datetime(2024, 1, 1)}},
+                                           upsert=True, return_document=True)
+        self.assertEqual(doc, {"_id": "u1", "mode": "Personal", "updated_at": datetime(2024, 1, 1)})
+        before = sessions.find_one_and_update({"_id": "u1"}, {"$set": {"mode": "Work"}}, return_document=False)
+        self.assertEqual(before["mode"], "Personal")
+
+    def test_persistence_and_external_writes(self):
+        doc_id = self.chats.insert_one({"title": "persisted", "created": datetime(2024, 5, 1, 12, 0)}).inserted_id
+
+        other = EmbeddedDocumentClient(self.path) # e.g. a Celery worker process
+        try:
+            doc = other["jarvis_db"]["chats"].find_one({"_id": doc_id})
+            self.assertEqual(doc["title"], "persisted")
+            self.assertEqual(doc["created"], datetime(2024, 5, 1, 12, 0))
+            other["jarvis_db"]["chats"].update_one({"_id": doc_id}, {"$set": {"title": "changed elsewhere"}})
+        finally:
+            other.close()
+        self.assertEqual(self.chats.find_one({"_id": doc_id})["title"], "changed elsewhere")
+
+    def test_llm_usage_aggregates(self):
+        recorder = LLMUsageRecorder(collection=self.client["jarvis_db"]["llm_usage"], batch_size=100, flush_interval=60)
+        usage = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+        with usage_context(user_id="u1", mode="Work", tool="create_tool"):
+            recorder.record("codegen", "m", usage, 1.0)
+            recorder.record("codegen", "m", usage, 3.0)
+        with usage_context(user_id="u1", mode="Work"):
+            recorder.record("chat", "m", None, 0.5, error=TimeoutError("slow"))
+        recorder.flush()
+
+        tools = recorder.top_tools()
+        self.assertEqual(len(tools), 1)
+        self.assertEqual(tools[0]["tool"], "create_tool")
+        self.assertEqual(tools[0]["total_tokens"], 240)
+        self.assertEqual(tools[0]["avg_latency_ms"], 2000.0)
+        days = recorder.usage_by_user_day()
+        self.assertEqual(days[0]["calls"], 3)
+        self.assertEqual(days[0]["errors"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
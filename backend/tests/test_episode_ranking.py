@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime, timedelta
+from backend.app.services.episode_ranking import (
+    DEFAULT_RANKING, importance_score, rank_episodes, resolve_ranking, validate_ranking
+)
+from backend.app.services.hybrid_search import HybridRetriever
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+def hit(document, score, days_old=None, importance=None, distance=None):
+    metadata = {}
+    if days_old is not None:
+        metadata["timestamp"] = (NOW - timedelta(days=days_old)).isoformat()
+    if importance is not None:
+        metadata["importance"] = importance
+    result = {"document": document, "metadata": metadata, "score": score}
+    if distance is not None:
+        result["distance"] = distance
+    return result
+
+
+class FakeEpisodeCollection:
+    """Chroma-like episodic collection with fixed query distances."""
+
+    def __init__(self, episodes):
+        self.episodes = episodes # id -> (document, distance)
+        self.metadata = {"timestamp": (NOW - timedelta(days=3)).isoformat(), "importance": 0.5}
+
+    def count(self):
+        return len(self.episodes)
+
+    def get(self, include=None, limit=None, offset=0):
+        ids = list(self.episodes)[offset:offset + limit]
+        return {"ids": ids, "documents": [self.episodes[i][0] for i in ids], "metadatas": [self.metadata for _ in ids]}
+
+    def query(self, n_results, **kwargs):
+        ids = sorted(self.episodes, key=lambda i: self.episodes[i][1])[:n_results]
+        return {"ids": [ids], "documents": [[self.episodes[i][0] for i in ids]],
+                "metadatas": [[self.metadata for _ in ids]], "distances": [[self.episodes[i][1] for i in ids]]}
+
+
+class TestImportance(unittest.TestCase):
+    def test_memorable_turns_score_above_small_talk(self):
+        small_talk = importance_score("User: thanks!\nJarvis: You're welcome.")
+        preference = importance_score("User: Remember that I prefer meetings after 2pm on Thursday\nJarvis: Noted.")
+        plain = importance_score("User: what is the capital of France\nJarvis: Paris.")
+        self.assertLess(small_talk, plain)
+        self.assertLess(plain, preference)
+        self.assertLessEqual(preference, 1.0)
+
+    def test_only_the_user_part_is_scored(self):
+        # A long or cue-heavy reply doesn't make a throwaway message important
+        self.assertEqual(
+            importance_score("User: hi\nJarvis: I will always remember your important deadline"),
+            importance_score("User: hi\nJarvis: Hello!")
+        )
+
+
+class TestRanking(unittest.TestCase):
+    def test_per_mode_parameters(self):
+        self.assertLess(resolve_ranking("Work")["half_life_days"], resolve_ranking("Personal")["half_life_days"])
+        self.assertEqual(resolve_ranking("Custom")["half_life_days"], DEFAULT_RANKING["half_life_days"])
+        ranking = resolve_ranking("Work", {"half_life_days": 3, "unknown": 1})
+        self.assertEqual(ranking["half_life_days"], 3.0)
+        self.assertNotIn("unknown", ranking)
+
+    def test_recent_episode_beats_slightly_more_similar_old_one(self):
+        ranking = resolve_ranking("Work", {"min_score": 0})
+        ranked = rank_episodes([
+            hit("old", 1.0, days_old=365, importance=0.3),
+            hit("recent", 0.9, days_old=1, importance=0.3),
+            hit("unrelated", 0.0, days_old=1, importance=0.3),
+        ], ranking, now=NOW)
+        self.assertEqual([h["document"] for h in ranked][:2], ["recent", "old"])
+        self.assertAlmostEqual(ranked[0]["recency"], 0.5 ** (1 / ranking["half_life_days"]))
+
+    def test_weak_candidates_are_dropped(self):
+        ranking = resolve_ranking("Work", {"min_score": 0.3})
+        ranked = rank_episodes([
+            hit("match", 1.0, days_old=2, importance=0.5, distance=0.6),
+            hit("stale trivia", 0.1, days_old=400, importance=0.1, distance=1.7),
+            hit("keyword-only E4012_QUOTA match", 0.05, days_old=30, importance=0.4),
+        ], ranking, now=NOW)
+        self.assertEqual([h["document"] for h in ranked], ["match", "keyword-only E4012_QUOTA match"])
+
+    def test_floor_applies_before_normalising(self):
+        ranking = resolve_ranking("Work")
+        # As the only candidate its normalised relevance would be 1.0; its similarity is 0.05
+        old_greeting = hit("User: hi\nJarvis: hello", 0.3, days_old=400, importance=0.1, distance=1.9)
+        self.assertEqual(rank_episodes([old_greeting], ranking, now=NOW), [])
+        # Recency alone doesn't keep an unrelated episode
+        just_now = hit("User: ok\nJarvis: ok", 0.0, days_old=0, importance=0.1, distance=2.0)
+        self.assertEqual(rank_episodes([just_now], ranking, now=NOW), [])
+        related = hit("User: deploy the api to staging\nJarvis: Done.", 0.9, days_old=10, distance=0.8)
+        self.assertEqual([h["document"] for h in rank_episodes([just_now, related], ranking, now=NOW)],
+                         [related["document"]])
+
+    def test_keyword_matches_from_hybrid_search_skip_the_floor(self):
+        retriever = HybridRetriever(FakeEpisodeCollection({
+            "restart": ("User: how do I restart the api\nJarvis: Run make restart.", 0.6),
+            "quota": ("User: deploy failed with E4012_QUOTA\nJarvis: Raise the quota.", 1.5),
+            "weather": ("User: nice weather today\nJarvis: Indeed.", 1.6),
+        }))
+        hits = retriever.search("what was E4012_QUOTA", 3, query_embeddings=[[0.0]])
+        self.assertEqual({h["id"] for h in hits if "keyword_rank" in h}, {"quota"})
+
+        # quota's similarity (0.25) is under the floor, but the exact identifier matched
+        ranked = rank_episodes(hits, resolve_ranking("Work", {"min_score": 0.3}), now=NOW)
+        self.assertEqual(sorted(h["id"] for h in ranked), ["quota", "restart"])
+
+    def test_legacy_episodes_without_importance_or_timestamp(self):
+        ranked = rank_episodes([hit("User: my birthday is on 2024-07-03\nJarvis: Noted.", 1.0)],
+                               resolve_ranking("Work"), now=NOW)
+        self.assertEqual(ranked[0]["recency"], 0.0)
+        self.assertGreater(ranked[0]["importance"], 0.3)
+
+    def test_validate_ranking(self):
+        self.assertIsNone(validate_ranking({"half_life_days": 7, "recency": 1}))
+        self.assertIn("Unknown", validate_ranking({"decay": 2}))
+        self.assertIsNotNone(validate_ranking({"half_life_days": 0}))
+        self.assertIsNotNone(validate_ranking({"recency": "high"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
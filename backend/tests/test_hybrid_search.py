@@ -0,0 +1,135 @@
+import time
+import unittest
+from backend.app.services.hybrid_search import (
+    BM25Index, CrossEncoderReranker, HybridRetriever, reciprocal_rank_fusion, tokenize
+)
+
+
+class FakeCollection:
+    """Chroma-like collection whose 'vector' ranking is fixed by the test."""
+
+    def __init__(self, docs, vector_order=None):
+        self.docs = dict(docs)
+        self.vector_order = vector_order or list(self.docs)
+        self.gets = 0
+
+    def count(self):
+        return len(self.docs)
+
+    def get(self, include=None, limit=None, offset=0):
+        self.gets += 1
+        ids = list(self.docs)[offset:offset + limit]
+        return {"ids": ids, "documents": [self.docs[i] for i in ids], "metadatas": [{"n": i} for i in ids]}
+
+    def query(self, n_results, **kwargs):
+        ids = [i for i in self.vector_order if i in self.docs][:n_results]
+        return {"ids": [ids], "documents": [[self.docs[i] for i in ids]], "metadatas": [[{"n": i} for i in ids]]}
+
+
+class FakeCrossEncoder:
+    def __init__(self, scores, seconds_per_call=0.0):
+        self.scores = scores
+        self.seconds_per_call = seconds_per_call
+        self.calls = 0
+
+    def predict(self, pairs):
+        self.calls += 1
+        time.sleep(self.seconds_per_call)
+        return [self.scores.get(doc, 0.0) for _, doc in pairs]
+
+
+class TestTokenizeAndBM25(unittest.TestCase):
+    def test_identifiers_are_kept_whole_and_split(self):
+        terms = tokenize("Failed with ERR_CONN_RESET in parseConfig reading report_2024.pdf")
+        for term in ["err_conn_reset", "conn", "reset", "parseconfig", "parse", "config", "report_2024.pdf", "2024", "pdf"]:
+            self.assertIn(term, terms)
+        self.assertNotIn("with", terms)
+        self.assertEqual(tokenize("E4012_QUOTA"), ["e4012_quota", "e4012", "quota"])
+
+    def test_rare_exact_term_outranks_common_words(self):
+        index = BM25Index()
+        index.add(["a", "b", "c"], [
+            "deploy failed on staging with a timeout",
+            "deploy failed on staging with E4012_QUOTA",
+            "deploy succeeded on staging",
+        ])
+        self.assertEqual(index.search("what is E4012_QUOTA", 3)[0][0], "b")
+        self.assertEqual(index.search("nothing matches", 3), [])
+
+        index.remove(["b"])
+        self.assertEqual(index.search("E4012_QUOTA", 3), [])
+        self.assertNotIn("e4012_quota", index.postings)
+        self.assertEqual(len(index), 2)
+
+    def test_reciprocal_rank_fusion_rewards_agreement(self):
+        fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]], k=60)
+        self.assertEqual(fused[0][0], "y")
+        self.assertEqual({doc_id for doc_id, _ in fused}, {"w", "x", "y", "z"})
+
+
+class TestHybridRetriever(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection({
+            "1": "we talked about the quarterly budget",
+            "2": "budget review notes",
+            "3": "the build broke with E7781_AUTH on ci-runner-7",
+        }, vector_order=["1", "2", "3"])
+        self.retriever = HybridRetriever(self.collection, sync_interval=0)
+
+    def test_keyword_match_is_fused_into_vector_results(self):
+        # Vector side ranks the exact error last; the keyword side brings it to the top
+        hits = self.retriever.search("why did E7781_AUTH happen", n_results=2)
+        self.assertEqual(hits[0]["id"], "3")
+        self.assertEqual(hits[0]["metadata"], {"n": "3"})
+
+    def test_writes_from_other_processes_trigger_rebuild(self):
+        self.retriever.search("budget", n_results=1)
+        self.assertEqual(self.collection.gets, 1)
+        self.retriever.search("budget", n_results=1)
+        self.assertEqual(self.collection.gets, 1)  # count unchanged, no rebuild
+
+        self.collection.docs["4"] = "E9999_QUOTA hit during upload"  # e.g. written by a Celery worker
+        self.collection.vector_order.append("4")
+        hits = self.retriever.search("E9999_QUOTA", n_results=1)
+        self.assertEqual(self.collection.gets, 2)
+        self.assertEqual(hits[0]["id"], "4")
+
+    def test_own_writes_update_index_without_rebuild(self):
+        self.retriever.search("budget", n_results=1)
+        self.collection.docs["4"] = "notes from roadmap_2025.md"
+        self.collection.vector_order.append("4")
+        self.retriever.add(["4"], ["notes from roadmap_2025.md"])
+        self.assertEqual(self.retriever.search("roadmap_2025.md", n_results=1)[0]["id"], "4")
+        self.assertEqual(self.collection.gets, 1)
+
+    def test_metadata_fields_are_searchable(self):
+        retriever = HybridRetriever(FakeCollection({"a": "chunk text", "b": "other text"}), metadata_fields=("n",))
+        self.assertEqual(retriever.search("b", n_results=1)[0]["id"], "b")
+
+
+class TestCrossEncoderReranker(unittest.TestCase):
+    def hits(self, docs):
+        return [{"id": d, "document": d, "metadata": {}, "score": 0.0} for d in docs]
+
+    def test_reorders_by_cross_encoder_score(self):
+        model = FakeCrossEncoder({"c": 3.0, "a": 1.0, "b": 2.0})
+        reranker = CrossEncoderReranker(lambda: model, budget_ms=1000, top_n=3, batch_size=2)
+        ranked = reranker.rerank("q", self.hits(["a", "b", "c", "d"]))
+        self.assertEqual([h["id"] for h in ranked], ["c", "b", "a", "d"])
+
+    def test_stops_scoring_when_budget_would_be_exceeded(self):
+        model = FakeCrossEncoder({"b": 2.0, "c": 5.0}, seconds_per_call=0.006)
+        reranker = CrossEncoderReranker(lambda: model, budget_ms=10, top_n=4, batch_size=2)
+        reranker.pair_ms = 3.0  # measured earlier; the first batch fits, the second would not
+        ranked = reranker.rerank("q", self.hits(["a", "b", "c", "d"]))
+        self.assertEqual(model.calls, 1)
+        self.assertEqual([h["id"] for h in ranked], ["b", "a", "c", "d"])
+        self.assertEqual(reranker.truncated, 1)
+
+    def test_missing_model_keeps_fused_order(self):
+        reranker = CrossEncoderReranker(lambda: None)
+        self.assertEqual([h["id"] for h in reranker.rerank("q", self.hits(["a", "b"]))], ["a", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
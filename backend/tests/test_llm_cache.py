@@ -0,0 +1,87 @@
+import unittest
+import time
+from types import SimpleNamespace
+from backend.app.services.llm_cache import LLMResponseCache, MemoryCacheStore, cache_key
+
+
+def fake_embedding(texts):
+    # Bag of letters: near-identical phrasings land close together
+    vectors = []
+    for text in texts:
+        v = [0.0] * 26
+        for ch in text.lower():
+            if "a" <= ch <= "z":
+                v[ord(ch) - 97] += 1
+        vectors.append(v)
+    return vectors
+
+
+def response(content, tool_calls=None):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def title_prompt(text):
+    return [{"role": "system", "content": "Generate a concise title."}, {"role": "user", "content": text}]
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    def make_cache(self, **kwargs):
+        return LLMResponseCache(store=MemoryCacheStore(max_entries=kwargs.pop("max_entries", 10)),
+                                tasks=["title", "codegen"], semantic_tasks=["title"],
+                                semantic_threshold=0.99, embedding_function=fake_embedding, **kwargs)
+
+    def test_exact_hit_ignores_whitespace_and_respects_model(self):
+        cache = self.make_cache()
+        cache.store_response("codegen", "m", [{"role": "user", "content": "write  a\nfunction"}], response("def f(): pass"))
+
+        hit = cache.lookup("codegen", "m", [{"role": "user", "content": "write a function "}])
+        self.assertEqual(hit.choices[0].message.content, "def f(): pass")
+        self.assertIsNone(cache.lookup("codegen", "other-model", [{"role": "user", "content": "write a function"}]))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_semantic_hit_only_for_whitelisted_tasks(self):
+        cache = self.make_cache()
+        cache.store_response("title", "m", title_prompt("Plan my trip to Rome"), response("Rome Trip"))
+        cache.store_response("codegen", "m", title_prompt("Plan my trip to Rome"), response("code"))
+
+        hit = cache.lookup("title", "m", title_prompt("plan my trip to rome!"))
+        self.assertEqual(hit.choices[0].message.content, "Rome Trip")
+        self.assertEqual(cache.stats()["semantic_hits"], 1)
+        self.assertIsNone(cache.lookup("codegen", "m", title_prompt("plan my trip to rome!")))
+        self.assertIsNone(cache.lookup("title", "m", title_prompt("Summarise this PDF")))
+
+    def test_ttl_eviction_and_uncacheable_responses(self):
+        cache = self.make_cache(ttl=1, max_entries=2)
+        for i in range(3):
+            cache.store_response("codegen", "m", [{"role": "user", "content": f"tool {i}"}], response(f"code {i}"))
+        self.assertIsNone(cache.lookup("codegen", "m", [{"role": "user", "content": "tool 0"}]))
+        self.assertIsNotNone(cache.lookup("codegen", "m", [{"role": "user", "content": "tool 2"}]))
+
+        cache.store_response("codegen", "m", [{"role": "user", "content": "tools"}], response(None, tool_calls=[{}]))
+        self.assertIsNone(cache.lookup("codegen", "m", [{"role": "user", "content": "tools"}]))
+        self.assertIsNone(cache.lookup("chat", "m", [{"role": "user", "content": "tool 2"}]))
+
+        cache.store.set(cache_key("codegen", "m", [{"role": "user", "content": "old"}]), "stale", ttl=-1)
+        self.assertIsNone(cache.lookup("codegen", "m", [{"role": "user", "content": "old"}]))
+
+    def test_cached_task_returns_without_calling_llm(self):
+        cache = self.make_cache()
+        calls = []
+
+        def slow_llm(messages):
+            calls.append(messages)
+            time.sleep(0.2)
+            return response("Weekly Report")
+
+        for _ in range(3):
+            prompt = title_prompt("Draft my weekly report")
+            hit = cache.lookup("title", "m", prompt)
+            if hit is None:
+                cache.store_response("title", "m", prompt, slow_llm(prompt))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
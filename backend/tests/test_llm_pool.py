@@ -0,0 +1,108 @@
+import unittest
+import asyncio
+import json
+import urllib.request
+from unittest.mock import patch
+from backend.app.services import llm_pool
+from backend.app.services.llm_pool import LLMBackendPool
+from backend.app.services.llm_cache import LLMResponseCache
+from backend.scripts.mock_llm_server import start_mock_server
+
+
+def http_completion(**kwargs):
+    body = json.dumps({"model": kwargs["model"], "messages": kwargs["messages"]}).encode("utf-8")
+    request = urllib.request.Request(f"{kwargs['api_base']}/chat/completions", data=body,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as resp:
+        return json.loads(resp.read())["choices"][0]["message"]["content"]
+
+
+async def http_acompletion(**kwargs):
+    return await asyncio.to_thread(http_completion, **kwargs)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestLLMBackendPool(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def start(self, name, latency_ms=0):
+        server, api_base = start_mock_server(name=name, latency_ms=latency_ms)
+        self.servers.append(server)
+        return api_base
+
+    def make_pool(self, bases, **kwargs):
+        return LLMBackendPool(bases, model="openai/local-model", api_key="x", health_interval=0,
+                              completion_fn=http_completion, acompletion_fn=http_acompletion, **kwargs)
+
+    def test_least_outstanding_routing(self):
+        pool = self.make_pool([self.start("a"), self.start("b")])
+        first = pool.pick()
+        second = pool.pick()
+        self.assertIsNot(first, second)
+        pool._finish(first, ok=True)
+        self.assertIs(pool.pick(), first)
+
+    def test_health_check_and_failover(self):
+        dead = "http://127.0.0.1:9/v1" # Nothing listens on the discard port
+        pool = self.make_pool([dead, self.start("alive")], max_failures=1)
+        pool.check_health(timeout=1)
+        self.assertFalse(pool.backends[0].healthy)
+        self.assertTrue(pool.backends[1].healthy)
+
+        # Even if the dead backend is believed healthy, the call fails over
+        pool.backends[0].healthy = True
+        pool.backends[1].outstanding = 5
+        self.assertIn("[alive]", pool.completion(messages=MESSAGES))
+        self.assertFalse(pool.backends[0].healthy)
+        self.assertEqual(pool.backends[0].failures, 1)
+
+    def test_hedged_request_returns_faster_backend(self):
+        slow, fast = self.start("slow", latency_ms=1500), self.start("fast")
+        pool = self.make_pool([slow, fast], hedge_after_ms=50)
+        reply = asyncio.run(pool.acompletion(messages=MESSAGES))
+        self.assertIn("[fast]", reply)
+        self.assertEqual(pool.hedged_requests, 1)
+        self.assertEqual(pool.hedge_wins, 1)
+        # The cancelled primary is not counted against the slow backend
+        self.assertEqual(pool.backends[0].failures, 0)
+
+    def test_explicit_api_base_bypasses_pool(self):
+        pool = self.make_pool([self.start("pooled")])
+        direct = self.start("direct")
+        self.assertIn("[direct]", pool.completion(messages=MESSAGES, model="m", api_base=direct))
+        self.assertEqual(pool.backends[0].requests, 0)
+
+    def test_task_routing_with_fallback_to_main_pool(self):
+        seen_models = []
+
+        def recording_completion(**kwargs):
+            seen_models.append(kwargs["model"])
+            return http_completion(**kwargs)
+
+        main = LLMBackendPool([self.start("main")], model="big", api_key="x", health_interval=0,
+                              completion_fn=recording_completion)
+        title = LLMBackendPool(["http://127.0.0.1:9/v1"], model="small", api_key="x", health_interval=0,
+                               completion_fn=recording_completion)
+        env = {"LLM_MODEL_TITLE": "small", "LLM_API_BASE_TITLE": "http://127.0.0.1:9/v1"}
+        with patch.dict("os.environ", env), \
+             patch.object(llm_pool, "_default_pool", main), \
+             patch.dict(llm_pool._task_pools, {"title": title}), \
+             patch.object(llm_pool, "get_llm_cache", lambda: LLMResponseCache(tasks=[])):
+            self.assertTrue(llm_pool.has_dedicated_pool("title"))
+            self.assertFalse(llm_pool.has_dedicated_pool("summary"))
+            # Title backend is down: falls back to the main pool and model
+            self.assertIn("[main]", llm_pool.completion(task="title", messages=MESSAGES))
+            self.assertIn("[main]", llm_pool.completion(task="summary", messages=MESSAGES))
+        self.assertEqual(seen_models, ["small", "big", "big"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import asyncio
+from backend.app.services.llm_scheduler import LLMScheduler, SchedulerSaturated
+
+
+class TestLLMScheduler(unittest.TestCase):
+    def test_users_are_served_round_robin_and_interactive_first(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrent=1, max_queue=10)
+            order = []
+
+            async def call(user_id, priority="interactive"):
+                async with scheduler.slot(user_id, priority):
+                    order.append(user_id)
+                    await asyncio.sleep(0)
+
+            # "hog" holds the slot, then queues three more calls before "bob" and a background job
+            await scheduler.acquire("hog")
+            tasks = [asyncio.create_task(call("hog")) for _ in range(3)]
+            tasks.append(asyncio.create_task(call("titles", priority="background")))
+            tasks.append(asyncio.create_task(call("bob")))
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.stats()["queue_depth"], 5)
+            scheduler.release()
+            await asyncio.gather(*tasks)
+            return order
+
+        order = asyncio.run(scenario())
+        self.assertEqual(order, ["hog", "bob", "hog", "hog", "titles"])
+
+    def test_admission_rejects_when_queue_full(self):
+        async def scenario():
+            scheduler = LLMScheduler(max_concurrent=1, max_queue=1)
+            await scheduler.acquire("a")
+            waiter = asyncio.create_task(scheduler.acquire("b"))
+            await asyncio.sleep(0)
+            with self.assertRaises(SchedulerSaturated):
+                scheduler.admit("c")
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            scheduler.admit("c")
+            return scheduler.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["queue_depth"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from backend.app.services.llm_usage import LLMUsageRecorder, usage_context, set_usage_context, get_usage_context
+
+
+class FakeCollection:
+    def __init__(self, fail=False):
+        self.docs = []
+        self.fail = fail
+        self.pipelines = []
+
+    def insert_many(self, docs, ordered=True):
+        if self.fail:
+            raise ConnectionError("mongo down")
+        self.docs.extend(docs)
+
+    def create_index(self, keys):
+        pass
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return [{"_id": {"tool": "create_tool"}, "calls": 2, "cached_calls": 0, "errors": 0, "prompt_tokens": 900,
+                 "completion_tokens": 300, "total_tokens": 1200, "llm_ms": 2500.0, "avg_latency_ms": 1250.0}]
+
+
+class BulkWriteError(Exception):
+    # Shape of pymongo.errors.BulkWriteError
+    def __init__(self, write_errors):
+        super().__init__("batch op errors occurred")
+        self.details = {"writeErrors": write_errors}
+
+
+class UniqueIdCollection(FakeCollection):
+    """Unordered insert_many with a unique _id, like Mongo."""
+
+    def __init__(self):
+        super().__init__()
+        self.lose_reply = False
+        self.reject = set() # _ids failing with a non-duplicate error
+
+    def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["_id"] in self.reject:
+                errors.append({"index": index, "code": 121})
+            elif any(d["_id"] == doc["_id"] for d in self.docs):
+                errors.append({"index": index, "code": 11000})
+            else:
+                self.docs.append(doc)
+        if self.lose_reply:
+            raise ConnectionError("connection reset after the write")
+        if errors:
+            raise BulkWriteError(errors)
+
+
+def response(prompt_tokens, completion_tokens):
+    return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+
+class TestLLMUsage(unittest.TestCase):
+    def test_records_carry_turn_context(self):
+        collection = FakeCollection()
+        recorder = LLMUsageRecorder(collection=collection, batch_size=100, flush_interval=60)
+
+        async def turn():
+            set_usage_context(user_id="u1", chat_id="c1", mode="Work", persona="Coder")
+            with usage_context(turn=1):
+                recorder.record("chat", "m", response(100, 20), 0.5)
+            with usage_context(tool="create_tool"):
+                # Context follows work handed to a thread (e.g. the sync ToolCreator call)
+                await asyncio.to_thread(recorder.record, "codegen", "m", response(400, 200), 2.0)
+
+        asyncio.run(turn())
+        self.assertEqual(get_usage_context(), {})
+        self.assertEqual(recorder.flush(), 2)
+
+        chat, codegen = collection.docs
+        self.assertEqual((chat["user_id"], chat["mode"], chat["persona"], chat["turn"], chat["tool"]),
+                         ("u1", "Work", "Coder", 1, None))
+        self.assertEqual((codegen["tool"], codegen["turn"], codegen["total_tokens"]), ("create_tool", None, 600))
+        self.assertEqual(codegen["latency_ms"], 2000.0)
+
+    def test_failed_flush_keeps_records_within_limit(self):
+        collection = FakeCollection(fail=True)
+        recorder = LLMUsageRecorder(collection=collection, batch_size=100, flush_interval=60, max_buffer=3)
+        for _ in range(5):
+            recorder.record("title", "m", response(10, 5), 0.1)
+        self.assertEqual(recorder.flush(), 0)
+        self.assertEqual(recorder.stats()["pending"], 3)
+        self.assertEqual(recorder.stats()["dropped"], 2)
+
+        collection.fail = False
+        recorder.record("chat", "m", None, 0.1, error=TimeoutError("slow"))
+        self.assertEqual(recorder.flush(), 3)
+        self.assertEqual(collection.docs[-1]["status"], "error")
+        self.assertEqual(collection.docs[-1]["total_tokens"], 0)
+
+    def test_retried_batch_is_not_written_twice(self):
+        collection = UniqueIdCollection()
+        recorder = LLMUsageRecorder(collection=collection, batch_size=100, flush_interval=60)
+        for _ in range(3):
+            recorder.record("chat", "m", response(10, 5), 0.1)
+
+        collection.lose_reply = True
+        self.assertEqual(recorder.flush(), 0)
+        self.assertEqual(recorder.stats()["pending"], 3)
+
+        collection.lose_reply = False
+        recorder.record("chat", "m", response(1, 1), 0.1)
+        rejected = recorder._buffer[-1]["_id"]
+        collection.reject.add(rejected)
+        # The first three were written by the lost attempt; only the rejected record is kept
+        self.assertEqual(recorder.flush(), 3)
+        self.assertEqual(len(collection.docs), 3)
+        self.assertEqual([d["_id"] for d in recorder._buffer], [rejected])
+
+    def test_batch_size_triggers_background_flush(self):
+        collection = FakeCollection()
+        recorder = LLMUsageRecorder(collection=collection, batch_size=2, flush_interval=60)
+        recorder.record("chat", "m", response(1, 1), 0.1)
+        recorder.record("chat", "m", response(1, 1), 0.1)
+        for _ in range(100):
+            if len(collection.docs) == 2:
+                break
+            asyncio.run(asyncio.sleep(0.01))
+        self.assertEqual(len(collection.docs), 2)
+
+    def test_top_tools_aggregate(self):
+        collection = FakeCollection()
+        recorder = LLMUsageRecorder(collection=collection)
+        rows = recorder.top_tools(days=7, limit=5, user_id="u1")
+        self.assertEqual(rows[0]["tool"], "create_tool")
+        self.assertEqual(rows[0]["llm_seconds"], 2.5)
+        match = collection.pipelines[0][0]["$match"]
+        self.assertEqual((match["user_id"], match["tool"]), ("u1", {"$ne": None}))
+        self.assertEqual(collection.pipelines[0][-1], {"$limit": 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
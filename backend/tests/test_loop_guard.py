@@ -0,0 +1,80 @@
+import unittest
+from backend.app.services.loop_guard import ToolLoopGuard
+
+
+class TestToolLoopGuard(unittest.TestCase):
+    def run_turn(self, guard, calls):
+        """Simulates one LLM turn; returns how many tools actually executed."""
+        executed = 0
+        guard.start_turn()
+        for name, raw_args in calls:
+            args, error = guard.parse_arguments(raw_args)
+            if error:
+                guard.record_malformed(name)
+                continue
+            if guard.check(name, args) is None:
+                executed += 1
+                guard.record_result(name, args, f"result of {name}")
+        guard.end_turn()
+        return executed
+
+    def test_repeated_reads_are_served_from_cache_until_stall(self):
+        guard = ToolLoopGuard(max_repeats=5, max_stalled_turns=2)
+        self.assertEqual(self.run_turn(guard, [("read_file", '{"path": "a.txt"}')]), 1)
+        # Same call, argument order differs: reused, no progress
+        self.assertEqual(self.run_turn(guard, [("read_file", '{ "path":"a.txt" }')]), 0)
+        self.assertFalse(guard.should_stop)
+        self.assertEqual(self.run_turn(guard, [("read_file", '{"path": "a.txt"}')]), 0)
+        self.assertTrue(guard.should_stop)
+        self.assertEqual(guard.counters["cache_hits"], 2)
+
+    def test_new_calls_reset_stall_and_writes_invalidate_reads(self):
+        guard = ToolLoopGuard(max_repeats=5, max_stalled_turns=2)
+        self.run_turn(guard, [("read_file", '{"path": "a.txt"}')])
+        self.run_turn(guard, [("read_file", '{"path": "a.txt"}')])
+        self.run_turn(guard, [("write_file", '{"path": "a.txt", "content": "x"}')])
+        self.assertFalse(guard.should_stop)
+        # After the write, the read runs again instead of returning stale content
+        self.assertEqual(self.run_turn(guard, [("read_file", '{"path": "a.txt"}')]), 1)
+
+    def test_malformed_arguments_and_repeat_limit(self):
+        guard = ToolLoopGuard(max_repeats=3, max_stalled_turns=2)
+        args, error = guard.parse_arguments("{not json")
+        self.assertIsNone(args)
+        self.assertIn("Invalid JSON", error)
+
+        self.run_turn(guard, [("search", "{bad")])
+        self.run_turn(guard, [("search", "{bad")])
+        self.assertTrue(guard.should_stop)
+        self.assertEqual(guard.counters["malformed"], 2)
+
+        guard = ToolLoopGuard(max_repeats=3, max_stalled_turns=10)
+        for _ in range(3):
+            self.run_turn(guard, [("write_file", '{"path": "a", "content": "x"}')])
+        self.assertIn("called 3 times", guard.stop_reason)
+
+    def test_unknown_tools_are_not_cached_and_reset_repeats(self):
+        guard = ToolLoopGuard(max_repeats=3, max_stalled_turns=2)
+        # Dynamic/MCP tools are state-changing unless they opt in as read-only
+        for _ in range(2):
+            self.assertEqual(self.run_turn(guard, [("create_csv", '{"rows": 3}')]), 1)
+        self.assertEqual(guard.counters["cache_hits"], 0)
+
+        guard = ToolLoopGuard(max_repeats=3, max_stalled_turns=2, read_only_tools={"lookup"})
+        self.run_turn(guard, [("lookup", '{"q": "x"}')])
+        self.assertEqual(self.run_turn(guard, [("lookup", '{"q": "x"}')]), 0)
+
+    def test_edit_test_loop_and_reread_after_write(self):
+        guard = ToolLoopGuard(max_repeats=3, max_stalled_turns=2)
+        pytest = ("run_shell_command", '{"command": "pytest"}')
+        for i in range(4):
+            self.assertEqual(self.run_turn(guard, [pytest]), 1)
+            self.run_turn(guard, [("write_file", f'{{"path": "a.py", "content": "v{i}"}}')])
+            # Re-reading what was just written is a new call, not a stall
+            self.assertEqual(self.run_turn(guard, [("read_file", '{"path": "a.py"}')]), 1)
+        self.assertFalse(guard.should_stop)
+        self.assertEqual(guard.stalled_turns, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
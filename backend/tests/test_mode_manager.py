@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+from backend.app.services.memory_manager import ModeManager
+
+
+class FakeModesCollection:
+    def __init__(self, modes):
+        self.modes = {m["name"]: dict(m) for m in modes}
+        self.reads = 0
+
+    def find_one(self, query, projection=None):
+        self.reads += 1
+        mode = self.modes.get(query["name"])
+        return dict(mode) if mode else None
+
+    def insert_one(self, doc):
+        self.modes[doc["name"]] = dict(doc)
+
+    def delete_one(self, query):
+        deleted = self.modes.pop(query["name"], None)
+        return type("Result", (), {"deleted_count": int(deleted is not None)})()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+def make_manager(collection, **kwargs):
+    with patch("backend.app.services.memory_manager.get_mongo_client", side_effect=Exception("offline")):
+        manager = ModeManager(**kwargs)
+    manager.collection = collection
+    return manager
+
+
+class TestModeManagerCache(unittest.TestCase):
+    def test_change_on_one_worker_is_seen_by_another(self):
+        collection, redis_client = FakeModesCollection([]), FakeRedis()
+        worker_a = make_manager(collection, redis_client=redis_client)
+        worker_b = make_manager(collection, redis_client=redis_client)
+
+        self.assertIsNone(worker_b.get_allowed_tools("Research"))  # unknown mode: all tools
+        self.assertIsNone(worker_b.get_allowed_tools("Research"))
+        self.assertEqual(collection.reads, 1)
+
+        worker_a.create_mode("Research", "Reading papers", ["read_pdf"], episode_ranking={"half_life_days": 7})
+        self.assertEqual(worker_b.get_allowed_tools("Research"), frozenset({"read_pdf"}))
+        self.assertEqual(worker_b.get_episode_ranking("Research")["half_life_days"], 7)
+
+        worker_a.delete_mode("Research")
+        self.assertIsNone(worker_b.get_allowed_tools("Research"))
+
+    def test_without_redis_entries_expire(self):
+        collection = FakeModesCollection([{"name": "Personal", "allowed_tools": ["save_fact"]}])
+        worker = make_manager(collection, cache_seconds=0)
+        worker.get_allowed_tools("Personal")
+        collection.modes["Personal"]["allowed_tools"] = ["save_fact", "search_web"]
+        self.assertEqual(worker.get_allowed_tools("Personal"), frozenset({"save_fact", "search_web"}))
+
+        cached = make_manager(collection, cache_seconds=60)
+        cached.get_allowed_tools("Personal")
+        cached.get_allowed_tools("Personal")
+        self.assertEqual(collection.reads, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
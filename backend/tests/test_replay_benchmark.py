@@ -0,0 +1,66 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from backend.app.services.session_tape import SessionTape, dump_value
+from backend.scripts.replay_benchmark import build_replay_orchestrator, run, summarize
+
+
+def event(target, name, result=None, key=None, is_async=False):
+    return {"target": target, "name": name, "kind": "call", "key": key, "async": is_async,
+            "latency_ms": 0.0, "result": dump_value(result), "error": None}
+
+
+def llm_event(content=None, tool_calls=None):
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+    return event("orchestrator", "llm_completion", SimpleNamespace(choices=[SimpleNamespace(message=message)]),
+                 key="chat", is_async=True)
+
+
+def small_tape():
+    state = {"mode": "Work", "persona": "Generalist", "tone": "Professional"}
+    tool_call = SimpleNamespace(id="call_1", type="function",
+                                function=SimpleNamespace(name="read_file", arguments='{"path": "notes.md"}'))
+    return SessionTape(turns=[{
+        "user_input": "what is in notes.md?",
+        "user_id": "u1",
+        "chat_id": "c1",
+        "tool_defs": {},
+        "events": [
+            event("prompt_manager", "get_state", state),
+            event("prompt_manager", "get_system_prompt", "You are Jarvis."),
+            event("chat_service", "get_chat", {"_id": "c1", "messages": [{"role": "user", "content": "hi"}]}),
+            event("mode_manager", "get_episode_ranking", {}),
+            event("episodic_memory", "search_episodes", []),
+            event("document_manager", "search_documents", []),
+            event("semantic_memory", "get_all_facts", []),
+            event("file_monitor", "get_monitored_context", ""),
+            event("chat_service", "add_message"),
+            event("mode_manager", "get_allowed_tools", None),
+            event("tool_retriever", "retrieve", []),
+            llm_event(tool_calls=[tool_call]),
+            event("orchestrator", "_execute_tool", "groceries: milk", key="read_file", is_async=True),
+            llm_event(content="It lists milk."),
+            event("prompt_manager", "get_state", state),
+            event("episodic_memory", "add_episode"),
+            event("chat_service", "add_message"),
+        ],
+        "response": "It lists milk.",
+        "elapsed_ms": 10.0
+    }])
+
+
+class TestReplayBenchmark(unittest.TestCase):
+    def test_small_tape_replays_through_the_orchestrator(self):
+        orchestrator = build_replay_orchestrator()
+        self.assertEqual(orchestrator.read_only_mcp_tools, set())
+
+        results = asyncio.run(run(small_tape(), repeat=2, latency_scale=0))
+        self.assertEqual([r["error"] for r in results], [None, None])
+        self.assertTrue(all(r["matches_recording"] for r in results))
+        summary = summarize(results)
+        self.assertEqual(summary["mismatched_turns"], 0)
+        self.assertEqual(summary["llm_calls"], summary["recorded_llm_calls"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from backend.app.services.session_state import SessionStateStore, DEFAULT_SESSION
+
+
+class FakeSessionCollection:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    def find_one(self, query):
+        self.reads += 1
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"]})
+        doc.update(update["$set"])
+        return dict(doc)
+
+    def find(self, query, projection=None):
+        (field, value), = query.items()
+        return [{"_id": d["_id"]} for d in self.docs.values() if d.get(field) == value]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+class TestSessionState(unittest.TestCase):
+    def test_users_are_isolated(self):
+        store = SessionStateStore(collection=FakeSessionCollection())
+        store.update("alice", mode="Personal", persona="Coder")
+        self.assertEqual(store.get("alice"), {"mode": "Personal", "persona": "Coder", "tone": "Professional"})
+        self.assertEqual(store.get("bob"), DEFAULT_SESSION)
+
+    def test_update_on_one_worker_is_seen_by_another(self):
+        collection, redis_client = FakeSessionCollection(), FakeRedis()
+        worker_a = SessionStateStore(collection=collection, redis_client=redis_client, cache_seconds=3600)
+        worker_b = SessionStateStore(collection=collection, redis_client=redis_client, cache_seconds=3600)
+
+        self.assertEqual(worker_b.get("alice")["mode"], "Work")
+        worker_a.update("alice", mode="Personal")
+        self.assertEqual(worker_b.get("alice")["mode"], "Personal")
+
+        # Unchanged state is served from the worker's cache
+        reads = collection.reads
+        for _ in range(5):
+            worker_b.get("alice")
+        self.assertEqual(collection.reads, reads)
+
+    def test_ttl_cache_without_redis(self):
+        collection = FakeSessionCollection()
+        worker_a = SessionStateStore(collection=collection, cache_seconds=0)
+        worker_b = SessionStateStore(collection=collection, cache_seconds=0)
+        worker_b.get("alice")
+        worker_a.update("alice", tone="Casual")
+        self.assertEqual(worker_b.get("alice")["tone"], "Casual")
+
+    def test_reset_value_moves_users_off_deleted_mode(self):
+        redis_client = FakeRedis()
+        store = SessionStateStore(collection=FakeSessionCollection(), redis_client=redis_client)
+        store.update("alice", mode="Research")
+        store.update("bob", mode="Personal")
+        self.assertEqual(store.reset_value("mode", "Research"), 1)
+        self.assertEqual(store.get("alice")["mode"], "Work")
+        self.assertEqual(store.get("bob")["mode"], "Personal")
+
+    def test_memory_fallback_without_mongo(self):
+        store = SessionStateStore()
+        store.update("alice", persona="Architect", unknown="ignored")
+        self.assertEqual(store.get("alice")["persona"], "Architect")
+        self.assertNotIn("unknown", store.get("alice"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from backend.app.services.session_tape import (
+    SessionTape, RecordingProxy, ReplayMismatch, attach_recorder, attach_replay
+)
+
+
+class FakeChatService:
+    def __init__(self):
+        self.mode = "Work"
+
+    def get_chat(self, chat_id):
+        time.sleep(0.02)
+        return {"_id": chat_id, "messages": []}
+
+
+class FakeOrchestrator:
+    def __init__(self):
+        self.chat_service = FakeChatService()
+        self.prompt_manager = SimpleNamespace(mode="Work")
+
+    async def llm_completion(self, task=None, **kwargs):
+        await asyncio.sleep(0.02)
+        message = SimpleNamespace(role="assistant", content=f"{task} answer", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def _execute_tool(self, function_name, function_args, *args):
+        # Nested reads belong to the tool call, not to the tape
+        return f"{function_name} ran in {self.prompt_manager.mode}"
+
+    async def turn(self):
+        chat = self.chat_service.get_chat("c1")
+        mode = self.prompt_manager.mode
+        title = await self.llm_completion(task="title", messages=[])
+        tool = await self._execute_tool("read_file", {"path": "a"})
+        answer = await self.llm_completion(task="chat", messages=[])
+        return f"{chat['_id']}|{mode}|{title.choices[0].message.content}|{tool}|{answer.choices[0].message.content}"
+
+
+class TestSessionTape(unittest.TestCase):
+    def test_record_save_and_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "session.json")
+            orchestrator = FakeOrchestrator()
+            tape = SessionTape(path)
+            attach_recorder(orchestrator, tape)
+            self.assertIsInstance(orchestrator.chat_service, RecordingProxy)
+
+            tape.begin_turn("hello", "u1", "c1")
+            recorded = asyncio.run(orchestrator.turn())
+            tape.end_turn(recorded, 50.0)
+            tape.save()
+
+            events = tape.turns[0]["events"]
+            self.assertEqual([e["name"] for e in events],
+                             ["get_chat", "mode", "llm_completion", "_execute_tool", "llm_completion"])
+
+            replayed = FakeOrchestrator()
+            loaded = SessionTape.load(path)
+            queues = attach_replay(replayed, loaded.turns[0], latency_scale=0)
+            # Calls keyed by task are matched even if made in a different order
+            started = time.perf_counter()
+            self.assertEqual(asyncio.run(replayed.turn()), recorded)
+            self.assertLess(time.perf_counter() - started, 0.02)
+            self.assertEqual(sum(len(q) for q in queues.values()), 0)
+            self.assertIsNone(replayed.session)
+
+            with self.assertRaises(ReplayMismatch):
+                asyncio.run(replayed.llm_completion(task="chat", messages=[]))
+
+    def test_replay_injects_recorded_latency(self):
+        orchestrator = FakeOrchestrator()
+        tape = SessionTape()
+        attach_recorder(orchestrator, tape)
+        tape.begin_turn("hello", "u1", "c1")
+        asyncio.run(orchestrator.turn())
+
+        replayed = FakeOrchestrator()
+        attach_replay(replayed, tape.turns[0], latency_scale=1.0)
+        started = time.perf_counter()
+        asyncio.run(replayed.turn())
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+    def test_concurrent_turns_record_to_their_own_turn(self):
+        orchestrator = FakeOrchestrator()
+        tape = SessionTape()
+        attach_recorder(orchestrator, tape)
+
+        async def chat(user_input, delay):
+            tape.begin_turn(user_input, "u1", user_input)
+            await asyncio.sleep(delay)
+            background = asyncio.create_task(orchestrator.llm_completion(task="title", messages=[]))
+            tape.track_task(background)
+            await orchestrator.llm_completion(task="chat", messages=[])
+            await tape.wait_background()
+            tape.end_turn(user_input, 1.0)
+
+        async def main():
+            await asyncio.gather(chat("first", 0), chat("second", 0.01))
+            # Outside any turn nothing is recorded
+            await orchestrator.llm_completion(task="chat", messages=[])
+
+        asyncio.run(main())
+        for turn in tape.turns:
+            self.assertEqual(turn["response"], turn["user_input"])
+            self.assertEqual(sorted(e["key"] for e in turn["events"]), ["chat", "title"])
+
+
+if __name__ == "__main__":
+    unittest.main()
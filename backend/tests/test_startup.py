@@ -0,0 +1,70 @@
+import time
+import threading
+import unittest
+from backend.app.services import clients
+from backend.app.services.startup import StartupProfile, STARTING, UP, WARM
+
+
+class TestStartupProfile(unittest.TestCase):
+    def test_phases_and_state(self):
+        profile = StartupProfile()
+        self.assertEqual(profile.state, STARTING)
+        with profile.phase("init:a"):
+            time.sleep(0.02)
+        with self.assertRaises(ValueError):
+            profile.run("init:b", int, "not a number")
+        profile.mark(UP)
+        profile.mark(WARM)
+
+        report = profile.report()
+        self.assertEqual([p["name"] for p in report["phases"]], ["init:a", "init:b"])
+        self.assertGreaterEqual(report["phases"][0]["duration_s"], 0.02)
+        self.assertIn("ValueError", report["phases"][1]["error"])
+        self.assertEqual(report["state"], WARM)
+        self.assertLessEqual(report["up_after_s"], report["warm_after_s"])
+
+    def test_import_timing_recorded_once(self):
+        profile = StartupProfile()
+        module = profile.import_module("json.tool")
+        self.assertEqual(module.__name__, "json.tool")
+        profile.import_module("json.tool")
+        self.assertLessEqual(len(profile.imports), 1)
+
+
+class TestSharedClients(unittest.TestCase):
+    def setUp(self):
+        self._saved = dict(clients._clients)
+        clients._clients.pop("mongo", None)
+
+    def tearDown(self):
+        clients._clients.clear()
+        clients._clients.update(self._saved)
+
+    def test_concurrent_callers_share_one_instance(self):
+        built = []
+
+        def factory():
+            time.sleep(0.05)
+            built.append(object())
+            return built[-1]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(clients._shared("mongo", factory))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(built), 1)
+        self.assertTrue(all(r is built[0] for r in results))
+
+    def test_failed_factory_is_retried(self):
+        def failing():
+            raise ConnectionError("down")
+
+        with self.assertRaises(ConnectionError):
+            clients._shared("mongo", failing)
+        self.assertEqual(clients._shared("mongo", lambda: "client"), "client")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from backend.app.services.tool_executor import ToolProcessPool, resource
+
+
+class TestToolProcessPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tools_dir = Path(self.tmp.name)
+        with open(self.tools_dir / "echo_tool.py", "w") as f:
+            f.write("import os\n\ndef echo_tool(input):\n    return f'{os.getpid()}:{input}'\n")
+        with open(self.tools_dir / "crash_tool.py", "w") as f:
+            f.write("import os\n\ndef crash_tool(input):\n    os._exit(1)\n")
+        with open(self.tools_dir / "big_tool.py", "w") as f:
+            f.write("def big_tool(input):\n    return len(bytearray(int(input) * 1024 * 1024))\n")
+        with open(self.tools_dir / "slow_tool.py", "w") as f:
+            f.write("import time\n\ndef slow_tool(input):\n    time.sleep(30)\n    return input\n")
+        self.defs = {
+            "echo_tool": {"name": "echo_tool", "description": "Echo", "filename": "echo_tool.py",
+                          "inputSchema": {"type": "object", "properties": {}}},
+            "slow_tool": {"name": "slow_tool", "description": "Sleeps", "filename": "slow_tool.py",
+                          "inputSchema": {"type": "object", "properties": {}}, "timeout": 0.5},
+            "crash_tool": {"name": "crash_tool", "description": "Dies", "filename": "crash_tool.py",
+                           "inputSchema": {"type": "object", "properties": {}}},
+            "big_tool": {"name": "big_tool", "description": "Allocates", "filename": "big_tool.py",
+                         "inputSchema": {"type": "object", "properties": {}}},
+        }
+        self.defs_file = self.tools_dir / "tool_definitions.json"
+        with open(self.defs_file, "w") as f:
+            json.dump(list(self.defs.values()), f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_runs_out_of_process_and_times_out(self):
+        async def scenario():
+            pool = ToolProcessPool(self.defs_file, self.tools_dir, size=1, memory_limit_mb=0)
+            await pool.start()
+            try:
+                echoed = await pool.run("echo_tool", self.defs["echo_tool"], {"input": "hi"})
+                timed_out = await pool.run("slow_tool", self.defs["slow_tool"], {"input": "x"})
+                # The hung worker was replaced, so the pool still serves calls
+                echoed_again = await pool.run("echo_tool", self.defs["echo_tool"], {"input": "again"})
+                return echoed, timed_out, echoed_again, pool.stats()
+            finally:
+                await pool.stop()
+
+        echoed, timed_out, echoed_again, stats = asyncio.run(scenario())
+        self.assertTrue(echoed.endswith(":hi"))
+        self.assertIn("timed out", timed_out)
+        self.assertTrue(echoed_again.endswith(":again"))
+        self.assertNotEqual(echoed.split(":")[0], echoed_again.split(":")[0])
+        self.assertEqual(stats["timeouts"], 1)
+
+    def test_crashed_worker_is_replaced(self):
+        async def scenario():
+            pool = ToolProcessPool(self.defs_file, self.tools_dir, size=1, memory_limit_mb=0)
+            await pool.start()
+            try:
+                crashed = await pool.run("crash_tool", self.defs["crash_tool"], {"input": "x"})
+                echoed = await pool.run("echo_tool", self.defs["echo_tool"], {"input": "after"})
+                return crashed, echoed, pool.stats(), len(pool._replacements)
+            finally:
+                await pool.stop()
+
+        crashed, echoed, stats, pending = asyncio.run(scenario())
+        self.assertIn("worker process terminated", crashed)
+        self.assertTrue(echoed.endswith(":after"))
+        self.assertEqual(stats["crashed"], 1)
+        self.assertEqual(stats["workers"], 1)
+        self.assertEqual(pending, 0)
+
+    def test_failed_replacement_errors_instead_of_hanging_and_is_refilled(self):
+        async def scenario():
+            pool = ToolProcessPool(self.defs_file, self.tools_dir, size=1, memory_limit_mb=0,
+                                   acquire_timeout=0.5, respawn_attempts=2, respawn_backoff=0)
+            await pool.start()
+            spawn = pool._spawn_worker
+            try:
+                def failing_spawn():
+                    raise OSError("Resource temporarily unavailable")
+                pool._spawn_worker = failing_spawn
+                await pool.run("crash_tool", self.defs["crash_tool"], {"input": "x"})
+                await asyncio.gather(*pool._replacements)
+                empty_stats = pool.stats()
+                no_worker = await pool.run("echo_tool", self.defs["echo_tool"], {"input": "x"})
+
+                # Spawning works again: the next call refills the empty slot
+                pool._spawn_worker = spawn
+                pool.acquire_timeout = 60
+                echoed = await pool.run("echo_tool", self.defs["echo_tool"], {"input": "back"})
+                return empty_stats, no_worker, echoed, pool.stats()
+            finally:
+                await pool.stop()
+
+        empty_stats, no_worker, echoed, stats = asyncio.run(scenario())
+        self.assertEqual((empty_stats["workers"], empty_stats["missing"]), (0, 1))
+        self.assertIn("no worker available", no_worker)
+        self.assertTrue(echoed.endswith(":back"))
+        # The call that found no worker retried the slot too (still failing then)
+        self.assertEqual((stats["workers"], stats["missing"], stats["replace_failed"], stats["no_worker"]), (1, 0, 2, 1))
+
+    def test_cancellation_stops_waiting_immediately(self):
+        async def scenario():
+            pool = ToolProcessPool(self.defs_file, self.tools_dir, size=1, memory_limit_mb=0)
+            await pool.start()
+            try:
+                call = asyncio.create_task(pool.run("slow_tool", self.defs["slow_tool"], {"input": "x"}, timeout=30))
+                await asyncio.sleep(0.2)
+                started = time.perf_counter()
+                call.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await call
+                cancel_seconds = time.perf_counter() - started
+                echoed = await pool.run("echo_tool", self.defs["echo_tool"], {"input": "next"})
+                return cancel_seconds, echoed, pool.stats()
+            finally:
+                await pool.stop()
+
+        cancel_seconds, echoed, stats = asyncio.run(scenario())
+        self.assertLess(cancel_seconds, 2)
+        self.assertTrue(echoed.endswith(":next"))
+        self.assertEqual(stats["cancelled"], 1)
+
+    @unittest.skipIf(resource is None, "resource limits are Unix only")
+    def test_memory_limit_caps_virtual_memory(self):
+        async def scenario():
+            pool = ToolProcessPool(self.defs_file, self.tools_dir, size=1, memory_limit_mb=1024)
+            await pool.start()
+            try:
+                small = await pool.run("big_tool", self.defs["big_tool"], {"input": "16"})
+                too_big = await pool.run("big_tool", self.defs["big_tool"], {"input": "2048"})
+                return small, too_big
+            finally:
+                await pool.stop()
+
+        small, too_big = asyncio.run(scenario())
+        self.assertEqual(small, str(16 * 1024 * 1024))
+        self.assertIn("out of memory", too_big)
+
+
+if __name__ == "__main__":
+    unittest.main()
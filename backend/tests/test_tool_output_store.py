@@ -0,0 +1,64 @@
+import unittest
+import re
+from backend.app.services.llm_cache import MemoryCacheStore
+from backend.app.services.tool_output_store import ToolOutputStore
+
+
+class TestToolOutputStore(unittest.TestCase):
+    def make_store(self, **kwargs):
+        return ToolOutputStore(store=MemoryCacheStore(max_entries=10), spill_chars=100, preview_chars=40,
+                               max_page_chars=50, **kwargs)
+
+    def test_small_outputs_pass_through(self):
+        store = self.make_store()
+        self.assertEqual(store.maybe_spill("chat1", "read_file", "short"), "short")
+        self.assertEqual(store.stats()["spilled"], 0)
+
+    def test_large_output_is_previewed_and_paged(self):
+        store = self.make_store()
+        content = "".join(f"line {i}\n" for i in range(100))
+        message = store.maybe_spill("chat1", "git_diff", content)
+
+        self.assertTrue(message.startswith(content[:40]))
+        self.assertLess(len(message), 300)
+        handle = re.search(r"handle '([^']+)'", message).group(1)
+
+        # Page through everything in bounded chunks
+        offset, pages = 0, []
+        while True:
+            page = store.read("chat1", handle, offset=offset, length=1000)
+            header, body = page.split("\n", 1)
+            self.assertLessEqual(len(body), 50)
+            pages.append(body)
+            next_offset = re.search(r"continue with offset=(\d+)", header)
+            if not next_offset:
+                break
+            offset = int(next_offset.group(1))
+        self.assertEqual("".join(pages), content)
+
+    def test_bad_offset_or_length_returns_error_text(self):
+        store = self.make_store()
+        message = store.maybe_spill("chat1", "git_diff", "x" * 200)
+        handle = re.search(r"handle '([^']+)'", message).group(1)
+
+        self.assertIn("must be integers", store.read("chat1", handle, offset="ten"))
+        self.assertIn("must be integers", store.read("chat1", handle, length=[5]))
+        # A negative length still advances through the output
+        header = store.read("chat1", handle, offset=10, length=-5).split("\n", 1)[0]
+        self.assertIn("characters 10-11", header)
+
+    def test_handles_are_scoped_to_chat_and_expire(self):
+        store = self.make_store(ttl=-1)
+        message = store.maybe_spill("chat1", "read_file", "x" * 500)
+        handle = re.search(r"handle '([^']+)'", message).group(1)
+        self.assertIn("No stored output", store.read("chat1", handle))
+
+        store = self.make_store()
+        message = store.maybe_spill("chat1", "read_file", "x" * 500)
+        handle = re.search(r"handle '([^']+)'", message).group(1)
+        self.assertIn("No stored output", store.read("chat2", handle))
+        self.assertIn("characters 0-50", store.read("chat1", handle))
+
+
+if __name__ == "__main__":
+    unittest.main()
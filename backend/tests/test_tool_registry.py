@@ -0,0 +1,123 @@
+import unittest
+import json
+import tempfile
+from pathlib import Path
+from backend.app.services.tool_registry import ToolRegistry, ToolLoadError, sync_tool_index, tool_content_hash
+
+
+class TestToolRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tools_dir = Path(self.tmp.name)
+        self.defs_file = self.tools_dir / "tool_definitions.json"
+
+        with open(self.tools_dir / "reverse_text.py", "w") as f:
+            f.write("CALLS = []\n\ndef reverse_text(input):\n    return input[::-1]\n")
+        with open(self.tools_dir / "broken_tool.py", "w") as f:
+            f.write("import module_that_does_not_exist\n\ndef broken_tool(input):\n    return input\n")
+
+        defs = [
+            {"name": "reverse_text", "description": "Reverses text", "filename": "reverse_text.py",
+             "inputSchema": {"type": "object", "properties": {"input": {"type": "string"}}}},
+            {"name": "broken_tool", "description": "Cannot import", "filename": "broken_tool.py",
+             "inputSchema": {"type": "object", "properties": {}}},
+            {"name": "missing_file", "description": "No file", "filename": "missing_file.py",
+             "inputSchema": {"type": "object", "properties": {}}},
+        ]
+        with open(self.defs_file, "w") as f:
+            json.dump(defs, f)
+
+        self.registry = ToolRegistry(self.defs_file, self.tools_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_registers_without_importing(self):
+        self.registry.load_definitions()
+        self.assertIn("reverse_text", self.registry)
+        self.assertIn("broken_tool", self.registry)
+        self.assertNotIn("missing_file", self.registry)
+        self.assertFalse(self.registry.is_loaded("reverse_text"))
+        names = [d["function"]["name"] for d in self.registry.definitions]
+        self.assertEqual(sorted(names), ["broken_tool", "reverse_text"])
+
+    def test_imports_on_first_call_and_caches(self):
+        self.registry.load_definitions()
+        func = self.registry.get_function("reverse_text")
+        self.assertEqual(func(input="abc"), "cba")
+        self.assertTrue(self.registry.is_loaded("reverse_text"))
+        self.assertIs(self.registry.get_function("reverse_text"), func)
+
+    def test_import_failure_reported_at_call_time(self):
+        self.registry.load_definitions()
+        with self.assertRaises(ToolLoadError):
+            self.registry.get_function("broken_tool")
+
+
+class FakeCollection:
+    """Minimal stand-in for a Chroma collection that records embedding work."""
+
+    def __init__(self):
+        self.entries = {}
+        self.upsert_calls = 0
+
+    def get(self, include=None):
+        ids = list(self.entries)
+        return {"ids": ids, "metadatas": [self.entries[i] for i in ids]}
+
+    def upsert(self, ids, documents, metadatas):
+        self.upsert_calls += 1
+        for tool_id, meta in zip(ids, metadatas):
+            self.entries[tool_id] = meta
+
+    def delete(self, ids):
+        for tool_id in ids:
+            self.entries.pop(tool_id, None)
+
+
+class TestSyncToolIndex(unittest.TestCase):
+    def _tool(self, name, description="desc"):
+        return {"name": name, "description": description, "filename": f"{name}.py",
+                "inputSchema": {"type": "object", "properties": {}}}
+
+    def test_only_changed_tools_are_upserted_in_one_batch(self):
+        collection = FakeCollection()
+        stats = sync_tool_index(collection, [self._tool("a"), self._tool("b")])
+        self.assertEqual(stats, {"upserted": 2, "deleted": 0, "unchanged": 0})
+        self.assertEqual(collection.upsert_calls, 1)
+
+        stats = sync_tool_index(collection, [self._tool("a"), self._tool("b")])
+        self.assertEqual(stats, {"upserted": 0, "deleted": 0, "unchanged": 2})
+        self.assertEqual(collection.upsert_calls, 1)
+
+        stats = sync_tool_index(collection, [self._tool("a", "new desc"), self._tool("b")])
+        self.assertEqual(stats["upserted"], 1)
+
+    def test_removed_tools_are_deleted_per_source(self):
+        collection = FakeCollection()
+        sync_tool_index(collection, [self._tool("dummy")], source="dummy")
+        sync_tool_index(collection, [self._tool("a"), self._tool("b")])
+
+        stats = sync_tool_index(collection, [self._tool("a")])
+        self.assertEqual(stats["deleted"], 1)
+        self.assertEqual(sorted(collection.entries), ["a", "dummy"])
+
+    def test_entries_without_source_are_adopted_not_pruned(self):
+        collection = FakeCollection()
+        # Indexed before sources were recorded (same content, so only the tag is missing)
+        kept = self._tool("kept")
+        collection.entries = {"kept": {"name": "kept", "hash": tool_content_hash(kept)},
+                              "unknown": {"name": "unknown"}}
+
+        stats = sync_tool_index(collection, [kept])
+        self.assertEqual(stats, {"upserted": 1, "deleted": 0, "unchanged": 0})
+        self.assertEqual(collection.entries["kept"]["source"], "definitions")
+        # Not defined by this source, so it is left for the sync that owns it
+        self.assertIn("unknown", collection.entries)
+
+        stats = sync_tool_index(collection, [kept])
+        self.assertEqual(stats, {"upserted": 0, "deleted": 0, "unchanged": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import json
+from backend.app.services.tool_retrieval import ToolRetriever
+
+
+class FakeToolCollection:
+    def __init__(self, names):
+        self.names = names
+        self.queries = []
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.queries.append(where)
+        names = self.names
+        if where:
+            names = [n for n in names if n in where["name"]["$in"]]
+        names = names[:n_results]
+        return {"ids": [names], "metadatas": [[{"json": json.dumps({"name": n})} for n in names]]}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+def fake_embedding(texts):
+    # Character histogram: near-identical strings get near-identical vectors
+    vectors = []
+    for text in texts:
+        vec = [0.0] * 26
+        for ch in text.lower():
+            if "a" <= ch <= "z":
+                vec[ord(ch) - ord("a")] += 1.0
+        vectors.append(vec)
+    return vectors
+
+
+class TestToolRetriever(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeToolCollection(["calculator", "read_url", "web_search"])
+        self.retriever = ToolRetriever(self.collection, embedding_function=fake_embedding)
+
+    def test_mode_restriction_is_pushed_into_query(self):
+        results = self.retriever.retrieve("search the web", allowed_tools={"web_search"})
+        self.assertEqual([d["name"] for d in results], ["web_search"])
+        self.assertEqual(self.collection.queries[-1], {"name": {"$in": ["web_search"]}})
+
+    def test_empty_allowed_set_skips_query(self):
+        self.assertEqual(self.retriever.retrieve("anything", allowed_tools=frozenset()), [])
+        self.assertEqual(self.collection.queries, [])
+
+    def test_repeated_query_hits_cache_until_index_changes(self):
+        self.retriever.retrieve("list files in docs")
+        self.retriever.retrieve("list files in docs")
+        self.assertEqual(len(self.collection.queries), 1)
+        self.assertEqual(self.retriever.cache.stats()["hits"], 1)
+
+        self.retriever.invalidate()
+        self.retriever.retrieve("list files in docs")
+        self.assertEqual(len(self.collection.queries), 2)
+
+    def test_index_change_on_one_worker_drops_cache_on_another(self):
+        redis_client = FakeRedis()
+        worker_a = ToolRetriever(self.collection, embedding_function=fake_embedding, redis_client=redis_client)
+        worker_b = ToolRetriever(self.collection, embedding_function=fake_embedding, redis_client=redis_client)
+
+        worker_b.retrieve("list files in docs")
+        worker_b.retrieve("list files in docs")
+        self.assertEqual(len(self.collection.queries), 1)
+
+        worker_a.invalidate()
+        worker_b.retrieve("list files in docs")
+        self.assertEqual(len(self.collection.queries), 2)
+        self.assertEqual(worker_b.cache.stats()["index_version"], 1)
+
+        # worker_a's own bump does not drop the entry it caches afterwards
+        worker_a.retrieve("list files in docs")
+        worker_a.retrieve("list files in docs")
+        self.assertEqual(len(self.collection.queries), 3)
+
+    def test_cache_is_partitioned_by_allowed_tools(self):
+        self.retriever.retrieve("weather today")
+        self.retriever.retrieve("weather today", allowed_tools={"calculator"})
+        self.assertEqual(len(self.collection.queries), 2)
+
+    def test_suggest_uses_usage_prior(self):
+        self.assertEqual(self.retriever.suggest("anything", n_results=1, prior_weight=0), ["calculator"])
+        for _ in range(5):
+            self.retriever.record_usage("web_search")
+        self.assertEqual(self.retriever.suggest("anything", n_results=1, prior_weight=1.0), ["web_search"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from backend.app.services import tracing
+
+
+class TestTracing(unittest.TestCase):
+    def test_spans_nest_inside_a_trace_across_tasks_and_threads(self):
+        async def turn():
+            with tracing.trace("test_turn", user_id="u1") as t:
+                with tracing.span("history_load"):
+                    await asyncio.sleep(0)
+                with tracing.span("llm_call", task="chat") as llm_span:
+                    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+                    tracing.record_llm_response(llm_span, "chat", response)
+                    # Context (and so the trace) follows work handed to a thread
+                    context = await asyncio.to_thread(tracing.current_trace_context)
+                return t, llm_span, context
+
+        t, llm_span, context = asyncio.run(turn())
+        data = t.to_dict()
+        self.assertEqual([s["name"] for s in data["spans"]], ["history_load", "llm_call"])
+        self.assertEqual(data["spans"][0]["parent_id"], t.root.span_id)
+        self.assertEqual(llm_span.attrs["prompt_tokens"], 120)
+        self.assertEqual(context, (t.trace_id, llm_span.span_id))
+        self.assertIsNone(tracing.current_trace())
+        self.assertEqual(tracing.recent_traces(limit=1)[0]["trace_id"], t.trace_id)
+
+    def test_use_trace_attaches_late_spans(self):
+        with tracing.trace("queued_turn") as t:
+            pass
+        with tracing.use_trace(t), tracing.span("persistence", job="chat_message"):
+            pass
+        self.assertEqual(t.to_dict()["spans"][0]["attrs"], {"job": "chat_message"})
+
+    def test_recent_traces_can_be_scoped_to_a_user(self):
+        with tracing.trace("chat_turn", user_id="alice") as mine:
+            pass
+        with tracing.trace("chat_turn", user_id="bob"):
+            pass
+        with tracing.trace("celery:store_episode"):
+            pass
+        ids = [t["trace_id"] for t in tracing.recent_traces(limit=50, user_id="alice")]
+        self.assertIn(mine.trace_id, ids)
+        self.assertTrue(all(t["attrs"]["user_id"] == "alice" for t in tracing.recent_traces(limit=50, user_id="alice")))
+        self.assertEqual(len(tracing.recent_traces(limit=3)), 3)
+
+    def test_prometheus_rendering(self):
+        histogram = tracing.HistogramMetric("test_seconds", "Test", labels=("phase",), buckets=(0.1, 1))
+        histogram.observe(0.05, phase="a")
+        histogram.observe(0.5, phase="a")
+        counter = tracing.CounterMetric("test_total", "Test", labels=("path",))
+        counter.inc(path='/x"y')
+
+        lines = histogram.render() + counter.render()
+        self.assertIn('test_seconds_bucket{phase="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{phase="a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{phase="a",le="+Inf"} 2', lines)
+        self.assertIn('test_seconds_count{phase="a"} 2', lines)
+        self.assertIn('test_total{path="/x\\"y"} 1', lines)
+
+        tracing.register_gauge("test_gauge", "Test", lambda: 3)
+        self.assertIn("test_gauge 3", tracing.render_metrics())
+        self.assertIn("# TYPE jarvis_phase_seconds histogram", tracing.render_metrics())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import asyncio
+from backend.app.services.turn_events import TurnEventPublisher, TurnSubscription, turn_channel
+
+
+class FakeBroker:
+    """
+    Stands in for Redis: a synchronous publisher (worker side) and asyncio pubsub (API side).
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+
+    def publish(self, channel, data):
+        for queue in self.subscribers.get(channel, []):
+            queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(self.subscribers.get(channel, []))
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+        self.broker.subscribers.setdefault(channel, []).append(self.queue)
+
+    async def unsubscribe(self):
+        for channel in self.channels:
+            self.broker.subscribers[channel].remove(self.queue)
+
+    async def reset(self):
+        pass
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class TestTurnEvents(unittest.TestCase):
+    def test_events_stream_until_final(self):
+        broker = FakeBroker()
+
+        async def scenario():
+            async with TurnSubscription(broker, "t1") as subscription:
+                publisher = TurnEventPublisher(broker, "t1")
+                publisher.publish("started", worker="w1")
+                publisher.listener("tool_start", {"tool": "read_file"})
+                publisher.publish("final", response="done", current_mode="Work")
+                publisher.publish("started") # After the terminal event; not read
+                events = [e async for e in subscription.events(timeout=1)]
+            return events
+
+        events = asyncio.run(scenario())
+        self.assertEqual([e["event"] for e in events], ["started", "tool_start", "final"])
+        self.assertEqual(events[1]["tool"], "read_file")
+        self.assertEqual(events[2]["response"], "done")
+        self.assertEqual(broker.subscribers[turn_channel("t1")], [])
+
+    def test_timeout_yields_error(self):
+        broker = FakeBroker()
+
+        async def scenario():
+            async with TurnSubscription(broker, "t2") as subscription:
+                return [e async for e in subscription.events(timeout=0.05)]
+
+        events = asyncio.run(scenario())
+        self.assertEqual(events[-1]["event"], "error")
+        self.assertEqual(events[-1]["status"], 504)
+
+    def test_publish_failure_does_not_raise(self):
+        class DownRedis:
+            def publish(self, channel, data):
+                raise ConnectionError("redis down")
+
+        # Logged, not raised: a broken event channel must not fail the turn
+        TurnEventPublisher(DownRedis(), "t3").publish("final", response="x")
+
+
+if __name__ == "__main__":
+    unittest.main()
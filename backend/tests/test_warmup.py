@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from backend.app.services.warmup import run_warmup
+
+
+class FakeWarmable:
+    def __init__(self, touched=1):
+        self.touched = touched
+        self.sessions = None
+
+    def warm_up(self, sessions=None):
+        self.sessions = sessions
+        return self.touched
+
+
+def make_orchestrator(llm_delay=0.0, llm_error=None):
+    calls = []
+
+    async def llm_completion(task=None, **kwargs):
+        calls.append((task, kwargs))
+        await asyncio.sleep(llm_delay)
+        if llm_error:
+            raise llm_error
+        return SimpleNamespace()
+
+    async def list_tools():
+        return SimpleNamespace(tools=[object(), object()])
+
+    orch = SimpleNamespace(
+        tool_retriever=FakeWarmable(),
+        document_manager=FakeWarmable(),
+        episodic_memory=FakeWarmable(touched=2),
+        chat_service=SimpleNamespace(recent_sessions=lambda limit: [("alice", "Work")]),
+        llm_completion=llm_completion,
+        session=SimpleNamespace(list_tools=list_tools)
+    )
+    return orch, calls
+
+
+class TestWarmup(unittest.TestCase):
+    def test_steps_run_and_report(self):
+        orch, calls = make_orchestrator()
+        results = asyncio.run(run_warmup(orch, steps=["chroma", "llm", "mcp"]))
+        self.assertEqual(results["chroma"]["status"], "ok")
+        self.assertEqual(results["chroma"]["collections"], 4)
+        self.assertEqual(orch.episodic_memory.sessions, [("alice", "Work")])
+        self.assertEqual(results["mcp"]["tools"], 2)
+        self.assertEqual(calls[0][0], "chat")
+        self.assertEqual(calls[0][1]["max_tokens"], 1)
+
+    def test_failures_and_timeouts_are_reported_not_raised(self):
+        orch, _ = make_orchestrator(llm_error=ConnectionError("LLM down"))
+        results = asyncio.run(run_warmup(orch, steps=["llm", "mcp"]))
+        self.assertEqual(results["llm"]["status"], "error")
+        self.assertIn("LLM down", results["llm"]["error"])
+        self.assertEqual(results["mcp"]["status"], "ok")
+
+        orch, _ = make_orchestrator(llm_delay=1.0)
+        results = asyncio.run(run_warmup(orch, steps=["llm"], timeout=0.05))
+        self.assertEqual(results["llm"]["status"], "error")
+        self.assertLess(results["llm"]["seconds"], 0.5)
+
+    def test_no_steps_and_unknown_steps(self):
+        orch, _ = make_orchestrator()
+        self.assertEqual(asyncio.run(run_warmup(orch, steps=[])), {})
+        self.assertEqual(asyncio.run(run_warmup(orch, steps=["bogus"])), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,14 @@
 import base64
 import os
 from pathlib import Path
-from litellm import completion
+
+try:
+    # Routed through the shared LLM pool (and recorded in the usage log) when running inside Jarvis
+    from backend.app.services.llm_pool import completion
+    USE_LLM_POOL = True
+except ImportError:
+    from litellm import completion
+    USE_LLM_POOL = False
 
 def analyze_image(image_path: str, prompt: str = "Describe this image in detail."):
     """
@@ -45,12 +52,16 @@ def analyze_image(image_path: str, prompt: str = "Describe this image in detail.
         # or default to localhost.
         print(f"DEBUG: Sending image analysis request for {path.name}...")
         
-        response = completion(
-            model=os.getenv("LLM_MODEL", "openai/local-model"),
-            api_base=os.getenv("LLM_API_BASE", "http://localhost:1234/v1"),
-            api_key=os.getenv("LLM_API_KEY", "lm-studio"),
-            messages=messages,
-        )
+        if USE_LLM_POOL:
+            # LLM_MODEL_VISION / LLM_API_BASE_VISION can point at a dedicated vision model
+            response = completion(task="vision", messages=messages)
+        else:
+            response = completion(
+                model=os.getenv("LLM_MODEL", "openai/local-model"),
+                api_base=os.getenv("LLM_API_BASE", "http://localhost:1234/v1"),
+                api_key=os.getenv("LLM_API_KEY", "lm-studio"),
+                messages=messages,
+            )
         
         return response.choices[0].message.content
         